@@ -7,6 +7,20 @@ from flask import Flask
 from config import Config
 from models import db
 from utils.mail_helper import init_mail
+from utils.mail_queue import init_mail_queue
+from utils.cache import init_cache
+from utils.image_jobs import init_image_jobs
+from utils.patient_index import init_patient_index
+from utils.lab_rules import init_lab_rules
+from utils.replicas import init_replicas
+from utils.query_stats import init_query_stats
+from utils.metrics import init_metrics
+from utils.file_handlers import UploadRequest
+from services.counter_service import register_counter_events
+from services.blob_service import register_blob_events
+from services.search_service import register_search_events
+from services.lab_service import register_lab_events
+from commands import register_commands
 
 # Import all blueprints
 from routes.auth import auth_bp
@@ -18,23 +32,39 @@ from routes.lab_results import lab_results_bp
 from routes.radiology import radiology_bp
 from routes.doctor import doctor_bp
 from routes.medical_history import medical_history_bp
+from routes.search import search_bp
 
 
 def create_app():
     """Application factory pattern for creating Flask app."""
     app = Flask(__name__)
     app.config.from_object(Config)
+    # Stream uploads to disk with hashing and an early size-limit abort
+    app.request_class = UploadRequest
 
     # Ensure secret key is configured for sessions
     if not app.config.get("SECRET_KEY"):
         app.config["SECRET_KEY"] = secrets.token_hex(32)
         print(
-            "Warning: Using auto-generated secret key. Set SECRET_KEY in .env for production."
+            "Warning: Using auto-generated secret key. Set SECRET_KEY in .env for production "
+            "(gunicorn refuses to start without it)."
         )
 
     # Initialize extensions
     db.init_app(app)
+    init_replicas(app)
+    init_query_stats(app)
+    init_metrics(app)
     init_mail(app)
+    init_mail_queue(app)
+    init_cache(app)
+    init_image_jobs(app)
+    init_patient_index(app)
+    init_lab_rules(app)
+    register_counter_events()
+    register_blob_events()
+    register_search_events()
+    register_lab_events()
 
     # Register blueprints
     app.register_blueprint(auth_bp)
@@ -45,6 +75,10 @@ def create_app():
     app.register_blueprint(radiology_bp)
     app.register_blueprint(doctor_bp)
     app.register_blueprint(medical_history_bp)
+    app.register_blueprint(search_bp)
+
+    # CLI commands
+    register_commands(app)
 
     return app
 
@@ -58,5 +92,8 @@ if __name__ == "__main__":
     port = int(os.getenv("FLASK_PORT", 5000))  # container port
     host_port = os.getenv("HOST_PORT", str(port))  # host port for logging
 
+    debug = os.getenv("FLASK_DEBUG", "False").lower() == "true"  # reloader and debugger
+
+    # Development server only; production runs wsgi:app on gunicorn (see gunicorn.conf.py)
     print(f" * Flask app running at http://127.0.0.1:{host_port} (access via host)")
-    app.run(host=host, port=port, debug=True)
+    app.run(host=host, port=port, debug=debug)
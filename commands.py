@@ -0,0 +1,240 @@
+"""
+Flask CLI commands for the EHR system.
+"""
+
+import os
+
+import click
+from services.blob_service import BlobService
+from services.counter_service import CounterService
+from services.email_service import EmailService
+from services.lab_import_service import LabImportService
+from services.lab_service import LabService
+from services.patient_transfer_service import PatientTransferService
+from services.reminder_service import ReminderService
+from services.search_service import SearchService
+from models import db, EmailDeadLetter
+from utils.image_jobs import image_jobs
+from utils.mail_queue import mail_queue
+
+
+def register_commands(app):
+    """Register maintenance commands on the Flask CLI."""
+
+    @app.cli.command("reconcile-counters")
+    def reconcile_counters():
+        """Recount system-wide totals shown on the About Us page."""
+        counts = CounterService.reconcile()
+        for name, value in counts.items():
+            click.echo(f"{name}: {value}")
+
+    @app.cli.command("resend-dead-letters")
+    @click.option(
+        "--base-url",
+        required=True,
+        help="Public URL of the app for links in the emails, e.g. https://ehr.example.com",
+    )
+    def resend_dead_letters(base_url):
+        """Queue emails the mail queue gave up on again and remove them from
+        email_dead_letter. Token emails are rendered anew with new tokens."""
+        resent = failed = 0
+        with app.test_request_context(base_url=base_url):
+            for dead_letter in EmailDeadLetter.query.order_by(EmailDeadLetter.id).all():
+                if EmailService.resend_dead_letter(dead_letter):
+                    db.session.delete(dead_letter)
+                    resent += 1
+                else:
+                    failed += 1
+            db.session.commit()
+        mail_queue.shutdown(timeout=60)
+        click.echo(f"Resent {resent} emails, {failed} could not be resent")
+
+    @app.cli.command("send-appointment-reminders")
+    @click.option(
+        "--date",
+        "day",
+        type=click.DateTime(formats=["%Y-%m-%d"]),
+        default=None,
+        help="Appointment day to remind about (default: tomorrow).",
+    )
+    @click.option(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Appointments fetched and emailed per batch.",
+    )
+    def send_appointment_reminders(day, batch_size):
+        """Email patients about their scheduled appointments. Safe to re-run:
+        appointments already reminded for that date are skipped."""
+        report = ReminderService.send_appointment_reminders(
+            day=day.date() if day else None, batch_size=batch_size
+        )
+        click.echo(
+            f"Sent {len(report.sent)} reminders in {report.batches} batches "
+            f"({report.messages_per_second:.1f} messages/second)"
+        )
+        for recipient, error in report.failed:
+            click.echo(f"Failed: {recipient}: {error}", err=True)
+
+    @app.cli.command("retry-image-jobs")
+    @click.option(
+        "--stale-minutes",
+        type=int,
+        default=10,
+        help="Requeue jobs that have been processing for longer than this.",
+    )
+    @click.option("--failed", is_flag=True, help="Also retry failed jobs.")
+    def retry_image_jobs(stale_minutes, failed):
+        """Re-run radiology image jobs left unfinished by a restarted worker."""
+        count = image_jobs.requeue_stale(stale_minutes * 60, include_failed=failed)
+        image_jobs.shutdown(wait=True)
+        click.echo(f"Requeued {count} image jobs")
+
+    @app.cli.command("index-dicom")
+    def index_dicom():
+        """Parse modality, study and series from DICOM uploads not yet indexed."""
+        count = image_jobs.index_dicom()
+        image_jobs.shutdown(wait=True)
+        click.echo(f"Submitted {count} DICOM images for indexing")
+
+    @app.cli.command("migrate-radiology-blobs")
+    @click.option("--batch-size", type=int, default=100)
+    def migrate_radiology_blobs(batch_size):
+        """Move uploads stored under uuid names into the deduplicating blob store."""
+        stats = BlobService.migrate_legacy_files(batch_size)
+        click.echo(
+            f"Migrated {stats['migrated']} images "
+            f"({stats['deduplicated']} were duplicates), "
+            f"{stats['missing']} files missing"
+        )
+
+    @app.cli.command("gc-radiology-blobs")
+    @click.option(
+        "--grace-hours",
+        type=float,
+        default=24,
+        help="Keep anything modified more recently than this.",
+    )
+    def gc_radiology_blobs(grace_hours):
+        """Recount blob references and delete files no record uses."""
+        fixed = BlobService.reconcile_ref_counts()
+        stats = BlobService.collect_garbage(int(grace_hours * 3600))
+        click.echo(
+            f"Fixed {fixed} reference counts; removed {stats['blobs']} blobs, "
+            f"{stats['orphan_files']} orphaned files and "
+            f"{stats['partial_uploads']} partial uploads "
+            f"({stats['bytes'] / (1024 * 1024):.1f} MB)"
+        )
+
+    @app.cli.command("rebuild-search-index")
+    @click.option("--batch-size", type=int, default=500)
+    def rebuild_search_index(batch_size):
+        """Re-index all patients, lab results, medical history and imaging."""
+        counts = SearchService.rebuild(batch_size)
+        for entity_type, count in counts.items():
+            click.echo(f"{entity_type}: {count}")
+
+    @app.cli.command("backfill-lab-values")
+    @click.option("--batch-size", type=int, default=1000)
+    def backfill_lab_values(batch_size):
+        """Parse numeric values, reference bounds and units of existing lab results."""
+        count = LabService.backfill_parsed_values(batch_size)
+        click.echo(f"Parsed {count} lab results")
+
+    @app.cli.command("import-lab-results")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option(
+        "--doctor-id", type=int, required=True, help="Doctor whose patients to match."
+    )
+    @click.option("--batch-size", type=int, default=None)
+    @click.option("--format", "file_format", type=click.Choice(["csv", "hl7"]))
+    @click.option(
+        "--rejects",
+        type=click.Path(dir_okay=False),
+        help="Rejected-rows report (default: PATH.rejected.csv).",
+    )
+    def import_lab_results(path, doctor_id, batch_size, file_format, rejects):
+        """Import lab results from a CSV or HL7 file."""
+        rejects = rejects or f"{path}.rejected.csv"
+        with open(path, encoding="utf-8-sig", errors="replace", newline="") as lines:
+            with open(rejects, "w", newline="", encoding="utf-8") as report:
+                stats = LabImportService.import_lines(
+                    lines,
+                    doctor_id,
+                    batch_size or app.config["LAB_IMPORT_BATCH_SIZE"],
+                    report,
+                    file_format,
+                )
+        click.echo(
+            f"Imported {stats['imported']} of {stats['read']} lab results in "
+            f"{stats['batches']} batches, {stats['seconds']}s "
+            f"({stats['rows_per_second']} rows/s)"
+        )
+        if stats["rejected"]:
+            click.echo(f"Rejected {stats['rejected']} rows, see {rejects}")
+        else:
+            os.remove(rejects)
+
+    @app.cli.command("import-patients")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--doctor-id", type=int, required=True)
+    @click.option("--batch-size", type=int, default=None)
+    @click.option("--format", "file_format", type=click.Choice(["csv", "ndjson"]))
+    @click.option(
+        "--rejects",
+        type=click.Path(dir_okay=False),
+        help="Rejected-rows report (default: PATH.rejected.csv).",
+    )
+    def import_patients(path, doctor_id, batch_size, file_format, rejects):
+        """Create patients for a doctor from a CSV or NDJSON file."""
+        rejects = rejects or f"{path}.rejected.csv"
+        with open(path, encoding="utf-8-sig", errors="replace", newline="") as lines:
+            with open(rejects, "w", newline="", encoding="utf-8") as report:
+                stats = PatientTransferService.import_lines(
+                    lines,
+                    doctor_id,
+                    batch_size or app.config["PATIENT_IMPORT_BATCH_SIZE"],
+                    report,
+                    file_format,
+                )
+        click.echo(
+            f"Imported {stats['imported']} of {stats['read']} patients in "
+            f"{stats['batches']} batches, {stats['seconds']}s "
+            f"({stats['rows_per_second']} rows/s)"
+        )
+        if stats["rejected"]:
+            click.echo(f"Rejected {stats['rejected']} rows, see {rejects}")
+        else:
+            os.remove(rejects)
+
+    @app.cli.command("export-patients")
+    @click.option("--doctor-id", type=int, required=True)
+    @click.option(
+        "--format", "file_format", type=click.Choice(["csv", "ndjson"]), default="csv"
+    )
+    @click.option("--output", "-o", type=click.File("w"), default="-")
+    def export_patients(doctor_id, file_format, output):
+        """Write a doctor's patients as CSV or NDJSON (to stdout by default)."""
+        rows = PatientTransferService.export_rows(
+            doctor_id, app.config["EXPORT_BATCH_SIZE"]
+        )
+        if file_format == "ndjson":
+            chunks = PatientTransferService.export_ndjson(rows)
+        else:
+            chunks = PatientTransferService.export_csv(rows)
+        for chunk in chunks:
+            output.write(chunk)
+
+    @app.cli.command("reclassify-lab-results")
+    @click.option("--batch-size", type=int, default=1000)
+    @click.option(
+        "--override-manual",
+        is_flag=True,
+        help="Also reclassify statuses chosen by hand and make them automatic.",
+    )
+    def reclassify_lab_results(batch_size, override_manual):
+        """Re-run the lab status rules over existing lab results."""
+        stats = LabService.reclassify_statuses(batch_size, override_manual)
+        click.echo(
+            f"Scanned {stats['scanned']} lab results, updated {stats['updated']}"
+        )
@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from sqlalchemy.engine import URL, make_url
 
 load_dotenv()
 
@@ -8,6 +9,13 @@ class Config:
     # Database configuration
     # If DB_HOST is set (e.g., in Docker Compose), construct URI from components
     # Otherwise, use SQLALCHEMY_DATABASE_URI from .env file
+    # DB_DRIVER picks the MySQL driver for either: "mysqlconnector" (default,
+    # decoding rows in its C extension), "mysqlclient" (pip install mysqlclient,
+    # needs the MySQL client library) or "pymysql" (pip install pymysql)
+    DB_DRIVERS = {"mysqlconnector": "mysqlconnector", "mysqlclient": "mysqldb", "pymysql": "pymysql"}
+    DB_DRIVER = os.getenv("DB_DRIVER", "mysqlconnector").lower()
+    if DB_DRIVER not in DB_DRIVERS:
+        raise ValueError(f"DB_DRIVER must be one of {', '.join(DB_DRIVERS)}, not {DB_DRIVER!r}")
     DB_HOST = os.getenv("DB_HOST")
     DB_PORT = os.getenv("DB_PORT", "3306")
     DB_NAME = os.getenv("DB_NAME") or os.getenv("MYSQL_DATABASE")
@@ -16,15 +24,64 @@ class Config:
 
     if DB_HOST:
         # Construct database URI for Docker Compose (using service name 'db')
-        SQLALCHEMY_DATABASE_URI = (
-            f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-        )
+        # (URL.create escapes special characters in the password)
+        SQLALCHEMY_DATABASE_URI = URL.create(
+            f"mysql+{DB_DRIVERS[DB_DRIVER]}",
+            username=DB_USER,
+            password=DB_PASSWORD,
+            host=DB_HOST,
+            port=int(DB_PORT),
+            database=DB_NAME,
+        ).render_as_string(hide_password=False)
     else:
         # Use existing SQLALCHEMY_DATABASE_URI from .env (for local development)
         SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
+        if SQLALCHEMY_DATABASE_URI and os.getenv("DB_DRIVER"):
+            # An explicit DB_DRIVER also replaces the driver of a MySQL URI
+            _url = make_url(SQLALCHEMY_DATABASE_URI)
+            if _url.get_backend_name() == "mysql":
+                SQLALCHEMY_DATABASE_URI = _url.set(
+                    drivername=f"mysql+{DB_DRIVERS[DB_DRIVER]}"
+                ).render_as_string(hide_password=False)
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Read replicas (comma-separated URIs): GET requests to list and dashboard
+    # views read from them round-robin, everything else uses the primary above
+    DB_REPLICA_URIS = [
+        uri.strip() for uri in os.getenv("DB_REPLICA_URIS", "").split(",") if uri.strip()
+    ]
+    SQLALCHEMY_BINDS = {f"replica{i}": uri for i, uri in enumerate(DB_REPLICA_URIS, 1)}
+    REPLICA_HEALTH_INTERVAL = int(os.getenv("REPLICA_HEALTH_INTERVAL", 10))  # seconds
+    # A doctor's requests read from the primary for this many seconds after they
+    # write, so they see their own changes while the replicas catch up
+    REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+
+    # Production serving (gunicorn.conf.py, wsgi.py): worker processes
+    # (0 = 2 per CPU + 1) and request threads per worker
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", 0)) or 2 * (os.cpu_count() or 1) + 1
+    WEB_THREADS = int(os.getenv("WEB_THREADS", 4))
+
+    # Connection pool of each worker process: one connection per request thread
+    # plus one for background jobs, checked with a ping on checkout and replaced
+    # before MySQL's wait_timeout drops it. SQLite keeps SQLAlchemy's own pool.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_pre_ping": True,
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),  # seconds
+    }
+    if SQLALCHEMY_DATABASE_URI and not SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", 0)) or WEB_THREADS + 1,
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 2)),
+            pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", 10)),  # seconds
+        )
+    if SQLALCHEMY_DATABASE_URI and SQLALCHEMY_DATABASE_URI.startswith("mysql+mysqlconnector"):
+        # Decode rows in the C extension, failing at connect if it is missing,
+        # unless DB_USE_PURE asks for the pure-Python implementation
+        SQLALCHEMY_ENGINE_OPTIONS["connect_args"] = {
+            "use_pure": os.getenv("DB_USE_PURE", "False").lower() == "true"
+        }
+
     SECRET_KEY = os.getenv("SECRET_KEY")
     SECURITY_PASSWORD_SALT = os.getenv("SECURITY_PASSWORD_SALT")
 
@@ -36,10 +93,101 @@ class Config:
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
     MAIL_DEFAULT_SENDER = os.getenv("MAIL_DEFAULT_SENDER")
 
+    # Background mail queue (set MAIL_QUEUE_ENABLED=False to send inline)
+    MAIL_QUEUE_ENABLED = os.getenv("MAIL_QUEUE_ENABLED", "True").lower() == "true"
+    MAIL_QUEUE_WORKERS = int(os.getenv("MAIL_QUEUE_WORKERS", 2))
+    MAIL_QUEUE_MAXSIZE = int(os.getenv("MAIL_QUEUE_MAXSIZE", 1000))
+    MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 5))
+    MAIL_RETRY_BASE_DELAY = float(os.getenv("MAIL_RETRY_BASE_DELAY", 2))  # seconds
+    MAIL_RETRY_MAX_DELAY = float(os.getenv("MAIL_RETRY_MAX_DELAY", 60))
+    MAIL_CONNECTION_IDLE_TIMEOUT = 30  # seconds before an idle SMTP session closes
+
+    # Bulk notifications: messages per SMTP session, and messages/second (0 = no limit)
+    MAIL_BULK_BATCH_SIZE = int(os.getenv("MAIL_BULK_BATCH_SIZE", 100))
+    MAIL_BULK_RATE_LIMIT = float(os.getenv("MAIL_BULK_RATE_LIMIT", 0))
+
     # File upload configuration
     ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "bmp", "tiff", "dcm", "dicom"}
     UPLOAD_FOLDER = "static/uploads/radiology"
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+    # Whole-request cap enforced by Werkzeug (file plus form fields); bulk
+    # imports use their *_IMPORT_MAX_SIZE instead (utils/file_handlers.py)
+    MAX_CONTENT_LENGTH = MAX_FILE_SIZE + 1024 * 1024
+    UPLOAD_CHUNK_SIZE = 64 * 1024
+
+    # Radiology previews: longest edge in pixels per size, "WEBP" or "JPEG"
+    PREVIEW_FOLDER = "static/uploads/previews"
+    IMAGE_PREVIEW_SIZES = {"thumb": 160, "preview": 640, "large": 1600}
+    IMAGE_PREVIEW_FORMAT = os.getenv("IMAGE_PREVIEW_FORMAT", "WEBP").upper()
+    IMAGE_PREVIEW_QUALITY = int(os.getenv("IMAGE_PREVIEW_QUALITY", 80))
+
+    # Radiology uploads are processed on a process pool (0 workers = one per CPU)
+    IMAGE_JOBS_ENABLED = os.getenv("IMAGE_JOBS_ENABLED", "True").lower() == "true"
+    IMAGE_JOB_WORKERS = int(os.getenv("IMAGE_JOB_WORKERS", 0))
+
+    # Radiology image serving. Hashed (content-addressed) images are immutable
+    # and cached privately by browsers; ownership checks are cached briefly.
+    IMAGE_CACHE_MAX_AGE = 365 * 24 * 3600
+    IMAGE_ACCESS_CACHE_TTL = int(os.getenv("IMAGE_ACCESS_CACHE_TTL", 60))
+    # "" (serve from Flask), "x-sendfile" (Apache/lighttpd) or "x-accel-redirect"
+    # (nginx; map IMAGE_ACCEL_REDIRECT_PREFIX to UPLOAD_FOLDER as an internal location)
+    IMAGE_SENDFILE_MODE = os.getenv("IMAGE_SENDFILE_MODE", "").lower()
+    IMAGE_ACCEL_REDIRECT_PREFIX = os.getenv(
+        "IMAGE_ACCEL_REDIRECT_PREFIX", "/protected/radiology/"
+    )
+    USE_X_SENDFILE = IMAGE_SENDFILE_MODE == "x-sendfile"
+
+    # List view pagination
+    PER_PAGE = int(os.getenv("PER_PAGE", 25))
+    MAX_PER_PAGE = 100
+
+    # Full-text search: ranked results are paged by offset up to this many
+    SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", 500))
+
+    # Patient typeahead: per-process prefix indexes are rebuilt after this
+    # many seconds to pick up edits made by other workers
+    PATIENT_INDEX_TTL = int(os.getenv("PATIENT_INDEX_TTL", 300))
+    PATIENT_LOOKUP_LIMIT = 20  # maximum matches returned per lookup
+
+    # Lab status rules are cached per process and reloaded after this many
+    # seconds to pick up rules edited by other workers
+    LAB_RULES_TTL = int(os.getenv("LAB_RULES_TTL", 300))
+
+    # Bulk imports: rows per batch/transaction and accepted upload extensions
+    LAB_IMPORT_BATCH_SIZE = int(os.getenv("LAB_IMPORT_BATCH_SIZE", 1000))
+    LAB_IMPORT_EXTENSIONS = {"csv", "txt", "hl7"}
+    PATIENT_IMPORT_BATCH_SIZE = int(os.getenv("PATIENT_IMPORT_BATCH_SIZE", 500))
+    PATIENT_IMPORT_EXTENSIONS = {"csv", "ndjson", "jsonl"}
+    # Rejected-rows reports of web imports are kept here for download
+    IMPORT_REPORT_FOLDER = os.getenv("IMPORT_REPORT_FOLDER", "instance/import_reports")
+    # Web import uploads are spooled here, up to their own size limits
+    IMPORT_UPLOAD_FOLDER = os.getenv("IMPORT_UPLOAD_FOLDER", "instance/import_uploads")
+    LAB_IMPORT_MAX_SIZE = int(os.getenv("LAB_IMPORT_MAX_SIZE", 200 * 1024 * 1024))
+    PATIENT_IMPORT_MAX_SIZE = int(
+        os.getenv("PATIENT_IMPORT_MAX_SIZE", 100 * 1024 * 1024)
+    )
+    # Rows fetched per query by streaming exports
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+    # Cache configuration ("memory", "redis" or "null")
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", 60))  # seconds
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+    # SQL instrumentation: statements slower than SLOW_QUERY_MS are logged (0 = off),
+    # a statement repeated SQL_N_PLUS_ONE_THRESHOLD times in one request is flagged
+    # as a likely N+1, and SQL_STATS_HEADER adds per-request query counts and time
+    # to responses (always on in debug mode). Totals per endpoint: /sql_stats
+    SQL_STATS_ENABLED = os.getenv("SQL_STATS_ENABLED", "True").lower() == "true"
+    SQL_STATS_HEADER = os.getenv("SQL_STATS_HEADER", "False").lower() == "true"
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 500))
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+
+    # Prometheus metrics on /metrics; when METRICS_TOKEN is set, scrapers must
+    # send it as "Authorization: Bearer <token>"
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
     # Token configuration
     MAX_AGE_SECONDS = 86400  # 24 hours
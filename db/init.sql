@@ -77,6 +77,25 @@ INSERT INTO `appointment` VALUES (2,3,1,'CHECK_UP','2025-12-24 16:30:00','2025-1
 /*!40000 ALTER TABLE `appointment` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `appointment_reminder`
+--
+
+DROP TABLE IF EXISTS `appointment_reminder`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `appointment_reminder` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `appointment_id` int NOT NULL,
+  `appointment_date` datetime NOT NULL,
+  `recipient` varchar(120) NOT NULL,
+  `sent_at` datetime NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_reminder_appointment_date` (`appointment_id`,`appointment_date`),
+  CONSTRAINT `appointment_reminder_ibfk_1` FOREIGN KEY (`appointment_id`) REFERENCES `appointment` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `demographic_info`
 --
@@ -169,6 +188,69 @@ INSERT INTO `doctor_specialty` VALUES (1,1),(2,1),(3,2),(4,3);
 /*!40000 ALTER TABLE `doctor_specialty` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `email_dead_letter`
+--
+
+DROP TABLE IF EXISTS `email_dead_letter`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `email_dead_letter` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `subject` varchar(255) NOT NULL,
+  `recipients` text NOT NULL,
+  `template` varchar(255) DEFAULT NULL,
+  `html` text,
+  `error` varchar(1000) DEFAULT NULL,
+  `attempts` int NOT NULL,
+  `created_at` datetime NOT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `image_blob`
+--
+
+DROP TABLE IF EXISTS `image_blob`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `image_blob` (
+  `sha256` varchar(64) NOT NULL,
+  `size` bigint NOT NULL,
+  `ref_count` int NOT NULL,
+  `created_at` datetime NOT NULL,
+  `updated_at` datetime NOT NULL,
+  PRIMARY KEY (`sha256`),
+  KEY `ix_image_blob_ref_count` (`ref_count`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `image_job`
+--
+
+DROP TABLE IF EXISTS `image_job`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `image_job` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `radiology_imaging_id` int NOT NULL,
+  `image_filename` varchar(255) NOT NULL,
+  `status` enum('PROCESSING','READY','FAILED') NOT NULL,
+  `error` varchar(500) DEFAULT NULL,
+  `width` int DEFAULT NULL,
+  `height` int DEFAULT NULL,
+  `attempts` int NOT NULL,
+  `created_at` datetime NOT NULL,
+  `updated_at` datetime NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `radiology_imaging_id` (`radiology_imaging_id`),
+  KEY `ix_image_job_status` (`status`),
+  CONSTRAINT `image_job_ibfk_1` FOREIGN KEY (`radiology_imaging_id`) REFERENCES `radiology_imaging` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `laboratory_result`
 --
@@ -188,9 +270,16 @@ CREATE TABLE `laboratory_result` (
   `created_at` datetime NOT NULL,
   `updated_at` datetime NOT NULL,
   `notes` text,
+  `value_numeric` double DEFAULT NULL,
+  `reference_low` double DEFAULT NULL,
+  `reference_high` double DEFAULT NULL,
+  `unit_normalized` varchar(20) DEFAULT NULL,
+  `parse_version` smallint DEFAULT NULL,
+  `status_auto` tinyint(1) NOT NULL DEFAULT '0',
   PRIMARY KEY (`id`),
   KEY `patient_id` (`patient_id`),
   KEY `ix_laboratory_result_date` (`date`),
+  KEY `ix_lab_result_patient_test_date` (`patient_id`,`test_name`,`date`),
   CONSTRAINT `laboratory_result_ibfk_1` FOREIGN KEY (`patient_id`) REFERENCES `patient` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=9 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -201,10 +290,41 @@ CREATE TABLE `laboratory_result` (
 
 LOCK TABLES `laboratory_result` WRITE;
 /*!40000 ALTER TABLE `laboratory_result` DISABLE KEYS */;
-INSERT INTO `laboratory_result` VALUES (1,3,'Hemoglobin A1c (HbA1c)','2025-12-04 14:30:00','13.2 Normal',NULL,'10-17','NORMAL','2025-12-09 16:24:07','2026-01-10 21:04:12','Patient managed to raise her Hemoglobin'),(3,7,'Hemoglobin A1c (HbA1c)','2025-12-09 15:29:00','13.2',NULL,NULL,'NORMAL','2025-12-25 14:30:01','2025-12-25 14:30:01',NULL),(4,5,'Albumin','2025-12-24 08:19:00','Normal',NULL,NULL,NULL,'2026-01-06 13:24:02','2026-01-06 13:24:02',NULL);
+INSERT INTO `laboratory_result` VALUES (1,3,'Hemoglobin A1c (HbA1c)','2025-12-04 14:30:00','13.2 Normal',NULL,'10-17','NORMAL','2025-12-09 16:24:07','2026-01-10 21:04:12','Patient managed to raise her Hemoglobin',NULL,NULL,NULL,NULL,NULL,0),(3,7,'Hemoglobin A1c (HbA1c)','2025-12-09 15:29:00','13.2',NULL,NULL,'NORMAL','2025-12-25 14:30:01','2025-12-25 14:30:01',NULL,NULL,NULL,NULL,NULL,NULL,0),(4,5,'Albumin','2025-12-24 08:19:00','Normal',NULL,NULL,NULL,'2026-01-06 13:24:02','2026-01-06 13:24:02',NULL,NULL,NULL,NULL,NULL,NULL,0);
 /*!40000 ALTER TABLE `laboratory_result` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `lab_status_rule`
+--
+
+DROP TABLE IF EXISTS `lab_status_rule`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `lab_status_rule` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `test_name` varchar(100) NOT NULL,
+  `unit` varchar(20) DEFAULT NULL,
+  `low` double DEFAULT NULL,
+  `high` double DEFAULT NULL,
+  `critical_low` double DEFAULT NULL,
+  `critical_high` double DEFAULT NULL,
+  `updated_at` datetime NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `test_name` (`test_name`)
+) ENGINE=InnoDB AUTO_INCREMENT=11 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `lab_status_rule`
+--
+
+LOCK TABLES `lab_status_rule` WRITE;
+/*!40000 ALTER TABLE `lab_status_rule` DISABLE KEYS */;
+INSERT INTO `lab_status_rule` VALUES (1,'Blood Glucose','mg/dL',70,100,40,500,'2026-01-12 00:00:00'),(2,'Potassium','mmol/L',3.5,5,2.5,6.5,'2026-01-12 00:00:00'),(3,'Sodium','mmol/L',135,145,120,160,'2026-01-12 00:00:00'),(4,'Calcium','mg/dL',8.5,10.5,6,13,'2026-01-12 00:00:00'),(5,'Magnesium','mg/dL',1.7,2.2,1,4.7,'2026-01-12 00:00:00'),(6,'Phosphorus','mg/dL',2.5,4.5,1,NULL,'2026-01-12 00:00:00'),(7,'Albumin','g/dL',3.5,5,NULL,NULL,'2026-01-12 00:00:00'),(8,'Hemoglobin A1c (HbA1c)','%',4,5.6,NULL,NULL,'2026-01-12 00:00:00'),(9,'Thyroid Stimulating Hormone (TSH)','mU/L',0.4,4,NULL,NULL,'2026-01-12 00:00:00'),(10,'Hemoglobin','g/dL',NULL,NULL,7,20,'2026-01-12 00:00:00');
+/*!40000 ALTER TABLE `lab_status_rule` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `medical_history`
 --
@@ -261,6 +381,7 @@ CREATE TABLE `patient` (
   KEY `ix_patient_email` (`email`),
   KEY `ix_patient_last_name` (`last_name`),
   KEY `ix_patient_first_name` (`first_name`),
+  KEY `ix_patient_doctor_name` (`doctor_id`,`last_name`,`first_name`),
   CONSTRAINT `patient_ibfk_1` FOREIGN KEY (`doctor_id`) REFERENCES `doctor` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=8 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -320,9 +441,18 @@ CREATE TABLE `radiology_imaging` (
   `image_filename` varchar(255) DEFAULT NULL,
   `created_at` datetime NOT NULL,
   `updated_at` datetime NOT NULL,
+  `modality` varchar(16) DEFAULT NULL,
+  `study_instance_uid` varchar(64) DEFAULT NULL,
+  `series_instance_uid` varchar(64) DEFAULT NULL,
+  `image_rows` int DEFAULT NULL,
+  `image_columns` int DEFAULT NULL,
   PRIMARY KEY (`id`),
   KEY `patient_id` (`patient_id`),
   KEY `ix_radiology_imaging_date` (`date`),
+  KEY `ix_radiology_imaging_image_filename` (`image_filename`),
+  KEY `ix_radiology_imaging_modality` (`modality`),
+  KEY `ix_radiology_imaging_study_instance_uid` (`study_instance_uid`),
+  KEY `ix_radiology_imaging_series_instance_uid` (`series_instance_uid`),
   CONSTRAINT `radiology_imaging_ibfk_1` FOREIGN KEY (`patient_id`) REFERENCES `patient` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=9 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -333,10 +463,34 @@ CREATE TABLE `radiology_imaging` (
 
 LOCK TABLES `radiology_imaging` WRITE;
 /*!40000 ALTER TABLE `radiology_imaging` DISABLE KEYS */;
-INSERT INTO `radiology_imaging` VALUES (3,1,'XRAY','2025-12-11 01:52:00','patient_1/d5ed01cd-c8c2-446b-8ab1-d29d9a43b225.png','2025-12-12 00:52:29','2025-12-12 00:52:29'),(5,7,'XRAY','2026-01-06 18:25:00','patient_7/4dcdccb7-8b91-470c-b99c-d324994cc258.png','2026-01-06 15:56:31','2026-01-11 06:50:59'),(8,3,'XRAY','2026-01-10 21:37:00','patient_3/b8836ffb-03bc-489f-a498-3352deecefe6.png','2026-01-10 20:37:37','2026-01-10 20:55:41');
+INSERT INTO `radiology_imaging` VALUES (3,1,'XRAY','2025-12-11 01:52:00','patient_1/d5ed01cd-c8c2-446b-8ab1-d29d9a43b225.png','2025-12-12 00:52:29','2025-12-12 00:52:29',NULL,NULL,NULL,NULL,NULL),(5,7,'XRAY','2026-01-06 18:25:00','patient_7/4dcdccb7-8b91-470c-b99c-d324994cc258.png','2026-01-06 15:56:31','2026-01-11 06:50:59',NULL,NULL,NULL,NULL,NULL),(8,3,'XRAY','2026-01-10 21:37:00','patient_3/b8836ffb-03bc-489f-a498-3352deecefe6.png','2026-01-10 20:37:37','2026-01-10 20:55:41',NULL,NULL,NULL,NULL,NULL);
 /*!40000 ALTER TABLE `radiology_imaging` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `search_document`
+--
+
+DROP TABLE IF EXISTS `search_document`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `search_document` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `entity_type` varchar(20) NOT NULL,
+  `entity_id` int NOT NULL,
+  `patient_id` int NOT NULL,
+  `title` varchar(255) NOT NULL,
+  `body` text,
+  `date` datetime DEFAULT NULL,
+  `updated_at` datetime NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_search_entity` (`entity_type`,`entity_id`),
+  KEY `ix_search_document_patient_id` (`patient_id`),
+  FULLTEXT KEY `ix_search_document_fulltext` (`title`,`body`),
+  CONSTRAINT `search_document_ibfk_1` FOREIGN KEY (`patient_id`) REFERENCES `patient` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `social_history`
 --
@@ -391,6 +545,32 @@ LOCK TABLES `specialty` WRITE;
 INSERT INTO `specialty` VALUES (3,'Dermatology'),(1,'General Practitioner'),(2,'Neurology');
 /*!40000 ALTER TABLE `specialty` ENABLE KEYS */;
 UNLOCK TABLES;
+
+--
+-- Table structure for table `system_counter`
+--
+
+DROP TABLE IF EXISTS `system_counter`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `system_counter` (
+  `name` varchar(50) NOT NULL,
+  `value` bigint NOT NULL,
+  `reconciled_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Seeding data for table `system_counter` from the tables dumped above
+--
+
+INSERT INTO `system_counter` (`name`, `value`, `reconciled_at`)
+SELECT 'patient', COUNT(*), UTC_TIMESTAMP() FROM `patient`
+UNION ALL SELECT 'appointment', COUNT(*), UTC_TIMESTAMP() FROM `appointment`
+UNION ALL SELECT 'laboratory_result', COUNT(*), UTC_TIMESTAMP() FROM `laboratory_result`
+UNION ALL SELECT 'radiology_imaging', COUNT(*), UTC_TIMESTAMP() FROM `radiology_imaging`
+UNION ALL SELECT 'doctor', COUNT(*), UTC_TIMESTAMP() FROM `doctor`;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
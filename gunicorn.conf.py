@@ -0,0 +1,81 @@
+"""
+Gunicorn settings for production serving:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The master forks WEB_WORKERS processes (default 2 per CPU + 1) that each
+serve WEB_THREADS requests at once, so requests run on every core instead of
+sharing one interpreter lock. The application is imported in each worker
+after the fork, never in the master, so database connection pools, mail
+worker threads and image process pools are never shared between workers.
+"""
+
+import glob
+import os
+import tempfile
+
+# Workers write Prometheus metrics here, so /metrics on any of them reports
+# the totals of all (utils/metrics.py)
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "vitaltrack-metrics"),
+)
+
+# Every web worker starts its own radiology image pool; with a web worker per
+# CPU already, one image process each keeps the machine from oversubscribing
+os.environ.setdefault("IMAGE_JOB_WORKERS", "1")
+
+from config import Config  # noqa: E402
+
+# Every worker imports the app on its own, so a key generated at startup
+# (app.py does so when none is set) would differ between workers and each
+# would reject the session cookies signed by the others
+if not Config.SECRET_KEY:
+    raise RuntimeError(
+        "SECRET_KEY is not set; generate one with scripts/generate_secrets.py"
+    )
+
+# Workers share no memory: with more than one, a write handled by one worker
+# would only drop its own cached dashboards and image access checks, and the
+# others would serve stale ones until CACHE_DEFAULT_TTL, so default to the
+# Redis cache they all share
+if Config.WEB_WORKERS > 1 and "CACHE_BACKEND" not in os.environ:
+    Config.CACHE_BACKEND = "redis"
+elif Config.WEB_WORKERS > 1 and Config.CACHE_BACKEND == "memory":
+    print("Warning: CACHE_BACKEND=memory with several workers serves stale pages.")
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', '5000')}"
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+worker_class = "gthread"
+preload_app = False
+
+timeout = int(os.getenv("WEB_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Restart workers after this many requests, staggered, to bound memory growth
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+
+# Worker heartbeats on tmpfs: Docker's overlay filesystem can stall them
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    # Start from empty metrics: files left by a previous run would be summed in
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    # Drop the live gauges (in-flight requests, connections) of a dead worker
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
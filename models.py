@@ -3,7 +3,9 @@ import enum
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Enum
 
-db = SQLAlchemy()
+from utils.replicas import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 # --- Association table for many-to-many: Doctor <-> Specialty
 doctor_specialty = db.Table(
@@ -122,9 +124,20 @@ class LabResultStatusEnum(enum.Enum):
     PENDING = "pending"
 
 
+class ImageJobStatusEnum(enum.Enum):
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+
 class Patient(db.Model):
     __tablename__ = "patient"
 
+    __table_args__ = (
+        # Serves the per-doctor roster ordered by name (keyset pagination)
+        db.Index("ix_patient_doctor_name", "doctor_id", "last_name", "first_name"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(100), nullable=False, index=True)
     last_name = db.Column(db.String(100), nullable=False, index=True)
@@ -227,6 +240,11 @@ class Appointment(db.Model):
 
     patient = db.relationship("Patient", back_populates="appointments")
     doctor = db.relationship("Doctor", back_populates="appointments")
+    reminders = db.relationship(
+        "AppointmentReminder",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
 
     def __repr__(self):
         return f"<Appointment id={self.id} on {self.date:%Y-%m-%d %H:%M}>"
@@ -308,6 +326,11 @@ class Allergy(db.Model):
 class LaboratoryResult(db.Model):
     __tablename__ = "laboratory_result"
 
+    __table_args__ = (
+        # Serves a patient's time series for one test (trend analytics)
+        db.Index("ix_lab_result_patient_test_date", "patient_id", "test_name", "date"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey("patient.id"), nullable=False)
     test_name = db.Column(db.String(100), nullable=False)
@@ -316,11 +339,21 @@ class LaboratoryResult(db.Model):
     unit = db.Column(db.String(50), nullable=True)
     reference_range = db.Column(db.String(100), nullable=True)
     status = db.Column(Enum(LabResultStatusEnum, name="lab_status_enum"), nullable=True)
+    # True when status was derived by the lab rule engine rather than chosen
+    # by the clinician; only such results are reclassified automatically
+    status_auto = db.Column(db.Boolean, nullable=False, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
     )
     notes = db.Column(db.Text, nullable=True)
+    # Parsed from result / reference_range / unit whenever they are saved
+    # (see services/lab_service.py); NULL where the text is not numeric
+    value_numeric = db.Column(db.Float, nullable=True)
+    reference_low = db.Column(db.Float, nullable=True)
+    reference_high = db.Column(db.Float, nullable=True)
+    unit_normalized = db.Column(db.String(20), nullable=True)
+    parse_version = db.Column(db.SmallInteger, nullable=True)
 
     patient = db.relationship("Patient", back_populates="laboratory_results")
 
@@ -336,19 +369,115 @@ class RadiologyImaging(db.Model):
     name = db.Column(db.String(100), nullable=False)
     date = db.Column(db.DateTime, nullable=False, index=True)
     image_filename = db.Column(
-        db.String(255), nullable=False
+        db.String(255), nullable=False, index=True
     )  # Store uploaded image filename
+    # Parsed once from DICOM headers by the image job; NULL for other formats
+    modality = db.Column(db.String(16), index=True)
+    study_instance_uid = db.Column(db.String(64), index=True)
+    series_instance_uid = db.Column(db.String(64), index=True)
+    image_rows = db.Column(db.Integer)
+    image_columns = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
     )
 
     patient = db.relationship("Patient", back_populates="radiology_imaging")
+    # Preview processing state for the current image file
+    image_job = db.relationship(
+        "ImageJob",
+        uselist=False,
+        lazy="joined",
+        back_populates="radiology_imaging",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+    @property
+    def is_processing(self) -> bool:
+        return (
+            self.image_job is not None
+            and self.image_job.status == ImageJobStatusEnum.PROCESSING
+        )
 
     def __repr__(self):
         return f"<RadiologyImaging id={self.id} name={self.name}>"
 
 
+class LabStatusRule(db.Model):
+    """Thresholds used to classify results of one test. low/high override
+    the result's own reference range; critical_low/critical_high mark
+    CRITICAL values. unit, when set, must match the result's normalized unit."""
+
+    __tablename__ = "lab_status_rule"
+
+    id = db.Column(db.Integer, primary_key=True)
+    test_name = db.Column(db.String(100), nullable=False, unique=True)
+    unit = db.Column(db.String(20), nullable=True)
+    low = db.Column(db.Float, nullable=True)
+    high = db.Column(db.Float, nullable=True)
+    critical_low = db.Column(db.Float, nullable=True)
+    critical_high = db.Column(db.Float, nullable=True)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    def __repr__(self):
+        return f"<LabStatusRule {self.test_name}>"
+
+
+class ImageBlob(db.Model):
+    """Content-addressed radiology file, shared by every record whose
+    image_filename carries its SHA-256; ref_count tracks those records."""
+
+    __tablename__ = "image_blob"
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False, default=0)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    def __repr__(self):
+        return f"<ImageBlob {self.sha256[:12]} refs={self.ref_count}>"
+
+
+class ImageJob(db.Model):
+    """Background decoding/preview job for a radiology upload (one per record)."""
+
+    __tablename__ = "image_job"
+
+    id = db.Column(db.Integer, primary_key=True)
+    radiology_imaging_id = db.Column(
+        db.Integer,
+        db.ForeignKey("radiology_imaging.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,
+    )
+    image_filename = db.Column(db.String(255), nullable=False)
+    status = db.Column(
+        Enum(ImageJobStatusEnum, name="image_job_status_enum"),
+        nullable=False,
+        default=ImageJobStatusEnum.PROCESSING,
+        index=True,
+    )
+    error = db.Column(db.String(500), nullable=True)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    radiology_imaging = db.relationship("RadiologyImaging", back_populates="image_job")
+
+    def __repr__(self):
+        return f"<ImageJob id={self.id} status={self.status.value}>"
+
+
 class Prescription(db.Model):
     __tablename__ = "prescription"
 
@@ -364,3 +493,95 @@ class Prescription(db.Model):
 
     def __repr__(self):
         return f"<Prescription id={self.id} {self.medication_name}>"
+
+
+class SearchDocument(db.Model):
+    """Full-text search entry for one searchable record (patient, lab result,
+    medical history or imaging), kept current by model events. MySQL indexes
+    title/body with FULLTEXT; SQLite mirrors them into an FTS5 table."""
+
+    __tablename__ = "search_document"
+
+    __table_args__ = (
+        db.UniqueConstraint("entity_type", "entity_id", name="uq_search_entity"),
+        db.Index(
+            "ix_search_document_fulltext", "title", "body", mysql_prefix="FULLTEXT"
+        ).ddl_if(dialect="mysql"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    patient_id = db.Column(
+        db.Integer,
+        db.ForeignKey("patient.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    title = db.Column(db.String(255), nullable=False, default="")
+    body = db.Column(db.Text, nullable=True)
+    date = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    patient = db.relationship("Patient")
+
+    def __repr__(self):
+        return f"<SearchDocument {self.entity_type}:{self.entity_id}>"
+
+
+class SystemCounter(db.Model):
+    """Precomputed row count for a table, kept current by model events."""
+
+    __tablename__ = "system_counter"
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<SystemCounter {self.name}={self.value}>"
+
+
+class AppointmentReminder(db.Model):
+    """Reminder email sent for an appointment; makes the reminder job idempotent.
+    Keyed on the appointment date too, so a rescheduled appointment is reminded again."""
+
+    __tablename__ = "appointment_reminder"
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "appointment_id", "appointment_date", name="uq_reminder_appointment_date"
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    appointment_id = db.Column(
+        db.Integer, db.ForeignKey("appointment.id", ondelete="CASCADE"), nullable=False
+    )
+    appointment_date = db.Column(db.DateTime, nullable=False)
+    recipient = db.Column(db.String(120), nullable=False)
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<AppointmentReminder appointment_id={self.appointment_id}>"
+
+
+class EmailDeadLetter(db.Model):
+    """Outbound email the mail queue gave up on, kept for inspection or resend."""
+
+    __tablename__ = "email_dead_letter"
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)
+    template = db.Column(db.String(255), nullable=True)
+    # NULL for emails carrying a token (confirmation, password reset)
+    html = db.Column(db.Text, nullable=True)
+    error = db.Column(db.String(1000), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<EmailDeadLetter id={self.id} to={self.recipients}>"
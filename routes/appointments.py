@@ -3,62 +3,98 @@ Appointment management routes for the EHR system.
 """
 
 from flask import Blueprint, request, redirect, url_for, flash, render_template, session
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy.orm import contains_eager
 from models import db, Appointment, Patient, AppointmentStatusEnum, AppointmentTypeEnum
 from utils.auth_decorators import login_required
+from utils.replicas import use_replica
+from utils.pagination import KeysetSort, paginate_keyset
 from services.patient_service import PatientService
+from services.dashboard_service import DashboardService
+from services.stats_service import StatsService
 
 appointments_bp = Blueprint("appointments", __name__)
 
+APPOINTMENT_SORTS = {
+    "newest": KeysetSort(
+        "Newest first", (Appointment.date, Appointment.id), descending=True
+    ),
+    "oldest": KeysetSort("Oldest first", (Appointment.date, Appointment.id)),
+}
+
+# Time filter choices -> how far ahead upcoming appointments are shown
+APPOINTMENT_TIME_WINDOWS = {
+    "week": timedelta(days=7),
+    "month": timedelta(days=30),
+}
+
 
 @appointments_bp.route("/view_appointments")
 @login_required
+@use_replica
 def view_appointments():
-    """Display all appointments."""
+    """Display one page of appointments with statistics."""
     doctor_id = session.get("doctor_id")
 
+    # Get search parameters
+    search = request.args.get("search", "").strip()
+    status_filter = request.args.get("status", "")
+    time_filter = request.args.get("time", "")
+
     try:
-        # Get all appointments for this doctor
-        appointments = (
-            Appointment.query.filter_by(doctor_id=doctor_id)
-            .join(Patient)
-            .order_by(Appointment.date.desc())
-            .all()
+        # Get one page of appointments for this doctor
+        appointments_query = Appointment.query.filter_by(doctor_id=doctor_id).join(
+            Patient
         )
 
-        # Get statistics
-        total_appointments = len(appointments)
-        upcoming_appointments = len(
-            [a for a in appointments if a.date > datetime.now()]
-        )
-        completed_appointments = len(
-            [a for a in appointments if a.status == AppointmentStatusEnum.COMPLETED]
-        )
+        # Apply filters in SQL so they cover every page, not just this one
+        if search:
+            appointments_query = appointments_query.filter(
+                db.or_(
+                    Patient.first_name.ilike(f"%{search}%"),
+                    Patient.last_name.ilike(f"%{search}%"),
+                )
+            )
 
-        # Get appointments by status
-        scheduled = len(
-            [a for a in appointments if a.status == AppointmentStatusEnum.SCHEDULED]
-        )
-        cancelled = len(
-            [a for a in appointments if a.status == AppointmentStatusEnum.CANCELLED]
-        )
-        no_show = len(
-            [a for a in appointments if a.status == AppointmentStatusEnum.NO_SHOW]
+        if status_filter in {status.value for status in AppointmentStatusEnum}:
+            appointments_query = appointments_query.filter(
+                Appointment.status == AppointmentStatusEnum(status_filter)
+            )
+
+        now = datetime.now()
+        if time_filter == "upcoming":
+            appointments_query = appointments_query.filter(Appointment.date > now)
+        elif time_filter == "past":
+            appointments_query = appointments_query.filter(Appointment.date <= now)
+        elif time_filter == "today":
+            start = datetime.combine(now.date(), datetime.min.time())
+            appointments_query = appointments_query.filter(
+                Appointment.date >= start, Appointment.date < start + timedelta(days=1)
+            )
+        elif time_filter in APPOINTMENT_TIME_WINDOWS:
+            appointments_query = appointments_query.filter(
+                Appointment.date >= now,
+                Appointment.date <= now + APPOINTMENT_TIME_WINDOWS[time_filter],
+            )
+
+        page = paginate_keyset(
+            appointments_query.options(contains_eager(Appointment.patient)),
+            APPOINTMENT_SORTS,
         )
+        appointments = page.items
 
-        stats = {
-            "total_appointments": total_appointments,
-            "upcoming_appointments": upcoming_appointments,
-            "completed_appointments": completed_appointments,
-            "scheduled_appointments": scheduled,
-            "cancelled_appointments": cancelled,
-            "no_show_appointments": no_show,
-        }
+        # Statistics cover every appointment and are aggregated in SQL
+        stats = StatsService.appointment_stats(doctor_id)
 
         return render_template(
             "appointment/appointments.html",
             appointments=appointments,
+            page=page,
+            sort_options=APPOINTMENT_SORTS,
             stats=stats,
+            search=search,
+            status_filter=status_filter,
+            time_filter=time_filter,
             datetime=datetime,
         )
 
@@ -105,13 +141,12 @@ def schedule_appointment():
             if errors:
                 for error in errors:
                     flash(error, "error")
-                patients = (
-                    Patient.query.filter_by(doctor_id=doctor_id)
-                    .order_by(Patient.last_name)
-                    .all()
+                selected_patient = PatientService.get_selected_patient(
+                    request.values.get("patient_id"), doctor_id
                 )
                 return render_template(
-                    "appointment/schedule_appointment.html", patients=patients
+                    "appointment/schedule_appointment.html",
+                    selected_patient=selected_patient,
                 )
 
             appointment_datetime = datetime.strptime(
@@ -125,13 +160,12 @@ def schedule_appointment():
 
             if existing_appointment:
                 flash("You already have an appointment at this date and time.", "error")
-                patients = (
-                    Patient.query.filter_by(doctor_id=doctor_id)
-                    .order_by(Patient.last_name)
-                    .all()
+                selected_patient = PatientService.get_selected_patient(
+                    request.values.get("patient_id"), doctor_id
                 )
                 return render_template(
-                    "appointment/schedule_appointment.html", patients=patients
+                    "appointment/schedule_appointment.html",
+                    selected_patient=selected_patient,
                 )
 
             # Create new appointment
@@ -148,6 +182,7 @@ def schedule_appointment():
 
             db.session.add(new_appointment)
             db.session.commit()
+            DashboardService.invalidate(doctor_id)
 
             patient = Patient.query.get(patient_id)
             flash(
@@ -163,25 +198,22 @@ def schedule_appointment():
         except Exception as e:
             db.session.rollback()
             flash(f"Error scheduling appointment: {str(e)}", "error")
-            patients = (
-                Patient.query.filter_by(doctor_id=doctor_id)
-                .order_by(Patient.last_name)
-                .all()
+            selected_patient = PatientService.get_selected_patient(
+                request.values.get("patient_id"), doctor_id
             )
             return render_template(
-                "appointment/schedule_appointment.html", patients=patients
+                "appointment/schedule_appointment.html",
+                selected_patient=selected_patient,
             )
 
-    # Get patients for dropdown
-    patients = (
-        Patient.query.filter_by(doctor_id=doctor_id).order_by(Patient.last_name).all()
+    # Only the pre-selected patient (from the URL) is loaded; the picker
+    # looks up others through /patients/lookup
+    selected_patient = PatientService.get_selected_patient(
+        request.values.get("patient_id"), doctor_id
     )
-    # Get pre-selected patient ID from URL parameter
-    selected_patient_id = request.args.get("patient_id")
     return render_template(
         "appointment/schedule_appointment.html",
-        patients=patients,
-        selected_patient_id=selected_patient_id,
+        selected_patient=selected_patient,
     )
 
 
@@ -259,15 +291,9 @@ def edit_appointment(appointment_id):
             if errors:
                 for error in errors:
                     flash(error, "error")
-                patients = (
-                    Patient.query.filter_by(doctor_id=doctor_id)
-                    .order_by(Patient.last_name)
-                    .all()
-                )
                 return render_template(
                     "appointment/edit_appointment.html",
                     appointment=appointment,
-                    patients=patients,
                     datetime=datetime,
                 )
 
@@ -290,15 +316,9 @@ def edit_appointment(appointment_id):
                     "You already have another appointment at this date and time.",
                     "error",
                 )
-                patients = (
-                    Patient.query.filter_by(doctor_id=doctor_id)
-                    .order_by(Patient.last_name)
-                    .all()
-                )
                 return render_template(
                     "appointment/edit_appointment.html",
                     appointment=appointment,
-                    patients=patients,
                     datetime=datetime,
                 )
 
@@ -314,6 +334,7 @@ def edit_appointment(appointment_id):
             )
             appointment.notes = notes if notes else None
             db.session.commit()
+            DashboardService.invalidate(doctor_id)
 
             flash(
                 f"Appointment updated successfully for "
@@ -323,15 +344,9 @@ def edit_appointment(appointment_id):
             return redirect(url_for("appointments.view_appointments"))
 
         # GET request - show edit form
-        patients = (
-            Patient.query.filter_by(doctor_id=doctor_id)
-            .order_by(Patient.last_name)
-            .all()
-        )
         return render_template(
             "appointment/edit_appointment.html",
             appointment=appointment,
-            patients=patients,
             datetime=datetime,
         )
 
@@ -367,6 +382,7 @@ def delete_appointment(appointment_id):
         # Delete the appointment
         db.session.delete(appointment)
         db.session.commit()
+        DashboardService.invalidate(doctor_id)
 
         flash(
             f"Appointment for {patient_name} has been deleted successfully.", "success"
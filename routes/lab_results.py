@@ -2,52 +2,114 @@
 Laboratory results management routes for the EHR system.
 """
 
-from flask import Blueprint, request, redirect, url_for, flash, render_template, session
-from datetime import datetime
+from flask import (
+    Blueprint,
+    request,
+    redirect,
+    url_for,
+    flash,
+    render_template,
+    session,
+    jsonify,
+    current_app,
+)
+from datetime import datetime, timedelta
 from models import db, LaboratoryResult, Patient, LabResultStatusEnum
+from utils.import_reports import (
+    discard_report,
+    new_report,
+    read_report_preview,
+    report_path,
+    send_report,
+    upload_lines,
+)
 from utils.auth_decorators import login_required
+from utils.replicas import use_replica
+from utils.pagination import KeysetSort, paginate_keyset
 from services.patient_service import PatientService
+from services.dashboard_service import DashboardService
+from services.lab_import_service import LabImportService
+from services.lab_service import LabService
+from services.stats_service import StatsService
 
 lab_results_bp = Blueprint("lab_results", __name__)
 
+LAB_RESULT_SORTS = {
+    "newest": KeysetSort(
+        "Newest first", (LaboratoryResult.date, LaboratoryResult.id), descending=True
+    ),
+    "oldest": KeysetSort("Oldest first", (LaboratoryResult.date, LaboratoryResult.id)),
+}
+
+# Date filter choices -> how far back results are shown
+LAB_RESULT_DATE_WINDOWS = {
+    "week": timedelta(days=7),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+}
+
 
 @lab_results_bp.route("/view_lab_results")
 @login_required
+@use_replica
 def view_lab_results():
-    """Display all lab results."""
+    """Display one page of lab results with statistics."""
     doctor_id = session.get("doctor_id")
 
+    # Get search parameters
+    search = request.args.get("search", "").strip()
+    test_filter = request.args.get("test", "").strip()
+    date_filter = request.args.get("date", "")
+
     try:
-        # Get all lab results for patients of this doctor
+        # Get one page of lab results for patients of this doctor
         lab_results_query = (
             db.session.query(LaboratoryResult, Patient)
             .join(Patient, LaboratoryResult.patient_id == Patient.id)
             .filter(Patient.doctor_id == doctor_id)
-            .order_by(LaboratoryResult.date.desc())
         )
 
-        lab_results = lab_results_query.all()
+        # Apply filters in SQL so they cover every page, not just this one
+        if search:
+            lab_results_query = lab_results_query.filter(
+                db.or_(
+                    Patient.first_name.ilike(f"%{search}%"),
+                    Patient.last_name.ilike(f"%{search}%"),
+                    LaboratoryResult.test_name.ilike(f"%{search}%"),
+                )
+            )
+
+        if test_filter:
+            lab_results_query = lab_results_query.filter(
+                LaboratoryResult.test_name == test_filter
+            )
 
-        # Get statistics
-        total_results = len(lab_results)
-        recent_results = len(
-            [lr for lr, p in lab_results if (datetime.now() - lr.date).days <= 7]
-        )
+        if date_filter == "today":
+            lab_results_query = lab_results_query.filter(
+                LaboratoryResult.date
+                >= datetime.combine(datetime.now().date(), datetime.min.time())
+            )
+        elif date_filter in LAB_RESULT_DATE_WINDOWS:
+            lab_results_query = lab_results_query.filter(
+                LaboratoryResult.date
+                >= datetime.now() - LAB_RESULT_DATE_WINDOWS[date_filter]
+            )
 
-        # Get unique test types
-        test_types = set([lr.test_name for lr, p in lab_results])
+        page = paginate_keyset(lab_results_query, LAB_RESULT_SORTS)
+        lab_results = page.items
 
-        stats = {
-            "total_results": total_results,
-            "recent_results": recent_results,
-            "test_types_count": len(test_types),
-            "test_types": sorted(list(test_types)),
-        }
+        # Statistics cover every result and are aggregated in SQL
+        stats = StatsService.lab_result_stats(doctor_id)
 
         return render_template(
             "lab/lab_results.html",
             lab_results=lab_results,
+            page=page,
+            sort_options=LAB_RESULT_SORTS,
             stats=stats,
+            search=search,
+            test_filter=test_filter,
+            date_filter=date_filter,
             datetime=datetime,
         )
 
@@ -92,12 +154,12 @@ def add_lab_result():
             if errors:
                 for error in errors:
                     flash(error, "error")
-                patients = (
-                    Patient.query.filter_by(doctor_id=doctor_id)
-                    .order_by(Patient.last_name)
-                    .all()
+                selected_patient = PatientService.get_selected_patient(
+                    request.values.get("patient_id"), doctor_id
+                )
+                return render_template(
+                    "lab/add_lab_result.html", selected_patient=selected_patient
                 )
-                return render_template("lab/add_lab_result.html", patients=patients)
 
             # Create lab_test datetime
             try:
@@ -111,12 +173,12 @@ def add_lab_result():
                     errors.append("Invalid date format")
                     for error in errors:
                         flash(error, "error")
-                    patients = (
-                        Patient.query.filter_by(doctor_id=doctor_id)
-                        .order_by(Patient.last_name)
-                        .all()
+                    selected_patient = PatientService.get_selected_patient(
+                        request.values.get("patient_id"), doctor_id
+                    )
+                    return render_template(
+                        "lab/add_lab_result.html", selected_patient=selected_patient
                     )
-                    return render_template("lab/add_lab_result.html", patients=patients)
 
             # Create new lab result
             new_lab_result = LaboratoryResult(
@@ -126,12 +188,15 @@ def add_lab_result():
                 result=result,
                 unit=unit if unit else None,
                 reference_range=reference_range if reference_range else None,
+                # No status chosen: classify from the value and reference range
                 status=LabResultStatusEnum(status) if status else None,
+                status_auto=not status,
                 notes=notes if notes else None,
             )
 
             db.session.add(new_lab_result)
             db.session.commit()
+            DashboardService.invalidate(doctor_id)
 
             patient = Patient.query.get(patient_id)
             flash(
@@ -143,26 +208,106 @@ def add_lab_result():
         except Exception as e:
             db.session.rollback()
             flash(f"Error adding lab result: {str(e)}", "error")
-            patients = (
-                Patient.query.filter_by(doctor_id=doctor_id)
-                .order_by(Patient.last_name)
-                .all()
+            selected_patient = PatientService.get_selected_patient(
+                request.values.get("patient_id"), doctor_id
+            )
+            return render_template(
+                "lab/add_lab_result.html", selected_patient=selected_patient
             )
-            return render_template("lab/add_lab_result.html", patients=patients)
 
-    # Get patients for dropdown
-    patients = (
-        Patient.query.filter_by(doctor_id=doctor_id).order_by(Patient.last_name).all()
+    # Only the pre-selected patient (from the URL) is loaded; the picker
+    # looks up others through /patients/lookup
+    selected_patient = PatientService.get_selected_patient(
+        request.values.get("patient_id"), doctor_id
     )
-    # Get pre-selected patient ID from URL parameter
-    selected_patient_id = request.args.get("patient_id")
     return render_template(
         "lab/add_lab_result.html",
-        patients=patients,
-        selected_patient_id=selected_patient_id,
+        selected_patient=selected_patient,
     )
 
 
+@lab_results_bp.route("/lab_results/import", methods=["GET", "POST"])
+@login_required
+def import_lab_results():
+    """Import lab results for the doctor's patients from an uploaded CSV or
+    HL7 file, and offer the rejected rows as a downloadable report."""
+    doctor_id = session.get("doctor_id")
+    if request.method == "GET":
+        return render_template("lab/import_lab_results.html", stats=None)
+
+    file = request.files.get("file")
+    extension = file.filename.rsplit(".", 1)[-1].lower() if file else ""
+    if not file or extension not in current_app.config["LAB_IMPORT_EXTENSIONS"]:
+        flash("Please choose a .csv or .hl7 file to import.", "error")
+        return redirect(url_for("lab_results.import_lab_results"))
+
+    report_name = new_report("lab", doctor_id)
+    lines = upload_lines(file)
+    try:
+        with open(
+            report_path(report_name), "w", newline="", encoding="utf-8"
+        ) as rejects:
+            stats = LabImportService.import_lines(
+                lines,
+                doctor_id,
+                current_app.config["LAB_IMPORT_BATCH_SIZE"],
+                rejects,
+            )
+    except Exception as e:
+        db.session.rollback()
+        discard_report(report_name)
+        flash(f"Error importing lab results: {str(e)}", "error")
+        return redirect(url_for("lab_results.import_lab_results"))
+    finally:
+        lines.detach()
+
+    rejected_rows = []
+    if stats["rejected"]:
+        rejected_rows = read_report_preview(report_name)
+    else:
+        discard_report(report_name)
+        report_name = None
+
+    flash(
+        f"Imported {stats['imported']} of {stats['read']} lab results "
+        f"({stats['rows_per_second']} rows/s).",
+        "success" if not stats["rejected"] else "error",
+    )
+    return render_template(
+        "lab/import_lab_results.html",
+        stats=stats,
+        report_name=report_name,
+        rejected_rows=rejected_rows,
+    )
+
+
+@lab_results_bp.route("/lab_results/import/reports/<report_name>")
+@login_required
+def download_import_report(report_name):
+    """Download a rejected-rows report from one of the doctor's imports."""
+    return send_report("lab", session.get("doctor_id"), report_name)
+
+
+@lab_results_bp.route("/lab_results/trend/<int:patient_id>")
+@login_required
+def lab_result_trend(patient_id):
+    """Return a patient's numeric series for one test (?test=) as JSON, with
+    deltas, a rolling mean over ?window= points and out-of-range flags."""
+    doctor_id = session.get("doctor_id")
+    if not PatientService.find_patient_by_id(patient_id, doctor_id):
+        return jsonify(error="Patient not found"), 404
+
+    test_name = request.args.get("test", "").strip()
+    if not test_name:
+        return jsonify(error="The test parameter is required"), 400
+    try:
+        window = max(1, min(int(request.args.get("window", 3)), 50))
+    except ValueError:
+        window = 3
+
+    return jsonify(LabService.get_trend(patient_id, test_name, window))
+
+
 @lab_results_bp.route("/edit_lab_result/<int:lab_result_id>", methods=["GET", "POST"])
 @login_required
 def edit_lab_result(lab_result_id):
@@ -202,15 +347,9 @@ def edit_lab_result(lab_result_id):
             if errors:
                 for error in errors:
                     flash(error, "error")
-                patients = (
-                    Patient.query.filter_by(doctor_id=doctor_id)
-                    .order_by(Patient.last_name)
-                    .all()
-                )
                 return render_template(
                     "lab/edit_lab_result.html",
                     lab_result=lab_result,
-                    patients=patients,
                     datetime=datetime,
                 )
 
@@ -231,9 +370,11 @@ def edit_lab_result(lab_result_id):
             lab_result.unit = unit if unit else None
             lab_result.reference_range = reference_range if reference_range else None
             lab_result.status = LabResultStatusEnum(status) if status else None
+            lab_result.status_auto = not status
             lab_result.notes = notes if notes else None
 
             db.session.commit()
+            DashboardService.invalidate(doctor_id)
 
             flash(
                 f"Lab result for {lab_result.patient.first_name} "
@@ -243,15 +384,9 @@ def edit_lab_result(lab_result_id):
             return redirect(url_for("lab_results.view_lab_results"))
 
         # GET request - show edit form
-        patients = (
-            Patient.query.filter_by(doctor_id=doctor_id)
-            .order_by(Patient.last_name)
-            .all()
-        )
         return render_template(
             "lab/edit_lab_result.html",
             lab_result=lab_result,
-            patients=patients,
             datetime=datetime,
         )
 
@@ -287,6 +422,7 @@ def delete_lab_result(lab_result_id):
         # Delete the lab result
         db.session.delete(lab_result)
         db.session.commit()
+        DashboardService.invalidate(doctor_id)
 
         flash(
             f"Lab result '{test_name}' for {patient_name} has been deleted successfully.",
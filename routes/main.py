@@ -2,10 +2,22 @@
 Main navigation and dashboard routes for the EHR system.
 """
 
-from flask import Blueprint, redirect, url_for, flash, render_template, session
+import hmac
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    redirect,
+    request,
+    url_for,
+    flash,
+    render_template,
+    session,
+    jsonify,
+    current_app,
+)
 from datetime import datetime
 from models import (
-    db,
     Doctor,
     Patient,
     LaboratoryResult,
@@ -13,6 +25,12 @@ from models import (
     RadiologyImaging
 )
 from utils.auth_decorators import login_required
+from utils.replicas import use_replica
+from utils.cache import cache
+from utils.query_stats import query_stats
+from utils.metrics import render_metrics
+from services.dashboard_service import DashboardService
+from services.counter_service import CounterService
 
 main_bp = Blueprint("main", __name__)
 
@@ -27,6 +45,7 @@ def index():
 
 @main_bp.route("/dashboard")
 @login_required
+@use_replica
 def dashboard():
     """Display the main dashboard with recent data."""
     doctor_id = session.get("doctor_id")
@@ -37,28 +56,13 @@ def dashboard():
         return redirect(url_for("auth.logout"))
 
     try:
-        lab_results = (
-            db.session.query(LaboratoryResult, Patient)
-            .join(Patient, LaboratoryResult.patient_id == Patient.id)
-            .filter(Patient.doctor_id == doctor_id)
-            .order_by(LaboratoryResult.date.desc())
-            .limit(10)
-            .all()
-        )
+        # Latest lab results and appointments, cached per doctor
+        dashboard_data = DashboardService.get_dashboard_data(doctor_id)
+        lab_results = dashboard_data["lab_results"]
+        appointments = dashboard_data["appointments"]
     except Exception as e:
-        print(f"Error fetching lab results: {e}")
+        print(f"Error fetching dashboard data: {e}")
         lab_results = []
-
-    try:
-        # Get upcoming appointments for this doctor
-        appointments = (
-            Appointment.query.filter_by(doctor_id=doctor_id)
-            .order_by(Appointment.date.desc())
-            .limit(10)
-            .all()
-        )
-    except Exception as e:
-        print(f"Error fetching appointments: {e}")
         appointments = []
 
     return render_template(
@@ -69,22 +73,50 @@ def dashboard():
     )
 
 
+@main_bp.route("/cache_stats")
+@login_required
+def cache_stats():
+    """Return cache hit/miss counters for this worker process as JSON."""
+    return jsonify(cache.get_stats())
+
+
+@main_bp.route("/sql_stats")
+@login_required
+def sql_stats():
+    """Return SQL query counts, time and likely N+1 statements per endpoint
+    for this worker process as JSON."""
+    return jsonify(query_stats.snapshot())
+
+
+@main_bp.route("/metrics")
+def metrics():
+    """Prometheus metrics in text format. Scrapers do not log in; when
+    METRICS_TOKEN is set they must send it as a bearer token."""
+    if not current_app.config["METRICS_ENABLED"]:
+        abort(404)
+    token = current_app.config.get("METRICS_TOKEN")
+    if token and not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        abort(401)
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
 @main_bp.route("/about_us")
+@use_replica
 def about_us():
     """Display about us page with system statistics."""
     try:
-        total_patients = Patient.query.count()
-        total_appointments = Appointment.query.count()
-        total_lab_results = LaboratoryResult.query.count()
-        total_imagings = RadiologyImaging.query.count()
-        total_doctors = Doctor.query.count()
+        # Precomputed counters instead of COUNT(*) over every table
+        counts = CounterService.get_counts()
 
         system_stats = {
-            "total_patients": total_patients,
-            "total_appointments": total_appointments,
-            "total_lab_results": total_lab_results,
-            "total_imagings": total_imagings,
-            "total_doctors": total_doctors,
+            "total_patients": counts[Patient.__tablename__],
+            "total_appointments": counts[Appointment.__tablename__],
+            "total_lab_results": counts[LaboratoryResult.__tablename__],
+            "total_imagings": counts[RadiologyImaging.__tablename__],
+            "total_doctors": counts[Doctor.__tablename__],
         }
 
         return render_template(
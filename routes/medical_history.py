@@ -43,15 +43,13 @@ def add_medical_history():
             if errors:
                 for error in errors:
                     flash(error, "error")
-                patients = (
-                    Patient.query.filter_by(doctor_id=doctor_id)
-                    .order_by(Patient.last_name)
-                    .all()
+                selected_patient = PatientService.get_selected_patient(
+                    request.values.get("patient_id"), doctor_id
                 )
                 allergies = Allergy.query.order_by(Allergy.name).all()
                 return render_template(
                     "medical_history/add_medical_history.html",
-                    patients=patients,
+                    selected_patient=selected_patient,
                     allergies=allergies,
                 )
 
@@ -91,21 +89,20 @@ def add_medical_history():
         except Exception as e:
             db.session.rollback()
             flash(f"Error adding medical history: {str(e)}", "error")
-            patients = (
-                Patient.query.filter_by(doctor_id=doctor_id)
-                .order_by(Patient.last_name)
-                .all()
+            selected_patient = PatientService.get_selected_patient(
+                request.values.get("patient_id"), doctor_id
             )
             allergies = Allergy.query.order_by(Allergy.name).all()
             return render_template(
                 "medical_history/add_medical_history.html",
-                patients=patients,
+                selected_patient=selected_patient,
                 allergies=allergies,
             )
 
-    # Get patients and allergies for dropdowns
-    patients = (
-        Patient.query.filter_by(doctor_id=doctor_id).order_by(Patient.last_name).all()
+    # Only the pre-selected patient (from the URL) is loaded; the picker
+    # looks up others through /patients/lookup
+    selected_patient = PatientService.get_selected_patient(
+        request.values.get("patient_id"), doctor_id
     )
 
     allergies = Allergy.query.order_by(Allergy.name).all()
@@ -148,13 +145,10 @@ def add_medical_history():
             db.session.rollback()
             flash(f"Error creating allergies: {str(e)}", "error")
 
-    # Get pre-selected patient ID from URL parameter
-    selected_patient_id = request.args.get("patient_id")
     return render_template(
         "medical_history/add_medical_history.html",
-        patients=patients,
+        selected_patient=selected_patient,
         allergies=allergies,
-        selected_patient_id=selected_patient_id,
     )
 
 
@@ -207,17 +201,11 @@ def edit_medical_history(medical_history_id):
             if errors:
                 for error in errors:
                     flash(error, "error")
-                patients = (
-                    Patient.query.filter_by(doctor_id=doctor_id)
-                    .order_by(Patient.last_name)
-                    .all()
-                )
                 allergies = Allergy.query.order_by(Allergy.name).all()
                 return render_template(
                     "medical_history/edit_medical_history.html",
                     medical_history=history_record,
                     allergy=allergy_record,
-                    patients=patients,
                     allergies=allergies,
                 )
 
@@ -254,31 +242,21 @@ def edit_medical_history(medical_history_id):
         except Exception as e:
             db.session.rollback()
             flash(f"Error updating medical history: {str(e)}", "error")
-            patients = (
-                Patient.query.filter_by(doctor_id=doctor_id)
-                .order_by(Patient.last_name)
-                .all()
-            )
             allergies = Allergy.query.order_by(Allergy.name).all()
             return render_template(
                 "medical_history/edit_medical_history.html",
                 medical_history=history_record,
                 allergy=allergy_record,
-                patients=patients,
                 allergies=allergies,
             )
 
     # GET request - display form with existing data
-    patients = (
-        Patient.query.filter_by(doctor_id=doctor_id).order_by(Patient.last_name).all()
-    )
     allergies = Allergy.query.order_by(Allergy.name).all()
 
     return render_template(
         "medical_history/edit_medical_history.html",
         medical_history=history_record,
         allergy=allergy_record,
-        patients=patients,
         allergies=allergies,
     )
 
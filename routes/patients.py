@@ -2,11 +2,24 @@
 Patient management routes for the EHR system.
 """
 
-from flask import Blueprint, request, redirect, url_for, flash, render_template, session
+from flask import (
+    Blueprint,
+    request,
+    redirect,
+    url_for,
+    flash,
+    render_template,
+    session,
+    jsonify,
+    current_app,
+    Response,
+    stream_with_context,
+)
+from datetime import date
 from models import (
     db,
-    Patient,
     GenderEnum,
+    Patient,
     MedicalHistory,
     Allergy,
     Appointment,
@@ -15,84 +28,224 @@ from models import (
     SocialHistory,
 )
 from utils.auth_decorators import login_required
+from utils.cache import cache
+from utils.file_handlers import delete_image_file, image_access_key
+from utils.replicas import use_replica
+from utils.import_reports import (
+    discard_report,
+    new_report,
+    read_report_preview,
+    report_path,
+    send_report,
+    upload_lines,
+)
+from utils.pagination import KeysetSort, paginate_keyset
+from utils.patient_index import patient_index
 from services.patient_service import PatientService
-from datetime import date
+from services.patient_transfer_service import PatientTransferService
+from services.dashboard_service import DashboardService
+from services.stats_service import StatsService
 
 patients_bp = Blueprint("patients", __name__)
 
+PATIENT_SORTS = {
+    "name": KeysetSort(
+        "Name (A-Z)", (Patient.last_name, Patient.first_name, Patient.id)
+    ),
+    "name_desc": KeysetSort(
+        "Name (Z-A)",
+        (Patient.last_name, Patient.first_name, Patient.id),
+        descending=True,
+    ),
+}
+
+# Age filter choices -> (min, max) age in whole years, max None for open-ended
+PATIENT_AGE_GROUPS = {
+    "0-18": (0, 18),
+    "19-35": (19, 35),
+    "36-50": (36, 50),
+    "51-65": (51, 65),
+    "65+": (66, None),
+}
+
+
+def _years_before(day: date, years: int) -> date:
+    """The same calendar day `years` earlier (Feb 29 becomes Feb 28)."""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
 
 @patients_bp.route("/patients")
 @login_required
+@use_replica
 def view_all_patients():
-    """Display all patients in a table with statistics."""
+    """Display one page of patients in a table with statistics."""
     doctor_id = session.get("doctor_id")
+
+    # Get search parameters
+    search = request.args.get("search", "").strip()
+    gender_filter = request.args.get("gender", "")
+    age_filter = request.args.get("age", "")
+
     try:
-        patients_query = Patient.query.filter_by(doctor_id=doctor_id).order_by(
-            Patient.last_name, Patient.first_name
-        )
-        patients = patients_query.all()
-        total_patients = len(patients)
-        male_patients = sum(1 for p in patients if p.gender == GenderEnum.MALE)
-        female_patients = sum(1 for p in patients if p.gender == GenderEnum.FEMALE)
-        other_patients = total_patients - male_patients - female_patients
-        current_date = date.today()
-        age_groups = {"0-18": 0, "19-35": 0, "36-50": 0, "51-65": 0, "65+": 0}
-
-        for patient in patients:
-            if patient.date_of_birth:
-                age = (current_date - patient.date_of_birth).days // 365
-                if age <= 18:
-                    age_groups["0-18"] += 1
-                elif age <= 35:
-                    age_groups["19-35"] += 1
-                elif age <= 50:
-                    age_groups["36-50"] += 1
-                elif age <= 65:
-                    age_groups["51-65"] += 1
-                else:
-                    age_groups["65+"] += 1
-
-            # Get counts for each patient
-            patient.appointment_count = Appointment.query.filter_by(
-                patient_id=patient.id
-            ).count()
-            patient.lab_result_count = LaboratoryResult.query.filter_by(
-                patient_id=patient.id
-            ).count()
-            patient.radiology_result_count = RadiologyImaging.query.filter_by(
-                patient_id=patient.id
-            ).count()
-            patient.medical_history_count = MedicalHistory.query.filter_by(
-                patient_id=patient.id
-            ).count()
-
-            # Get recent medical histories with allergy information
-            patient.recent_medical_histories = (
-                db.session.query(MedicalHistory, Allergy)
-                .join(Allergy, MedicalHistory.allergy_id == Allergy.id)
-                .filter(MedicalHistory.patient_id == patient.id)
-                .order_by(MedicalHistory.date.desc())
-                .limit(3)
-                .all()
+        patients_query = Patient.query.filter_by(doctor_id=doctor_id)
+
+        # Apply filters in SQL so they cover every page, not just this one;
+        # each word of the search must match the first or last name
+        for word in search.split():
+            patients_query = patients_query.filter(
+                db.or_(
+                    Patient.first_name.ilike(f"%{word}%"),
+                    Patient.last_name.ilike(f"%{word}%"),
+                )
+            )
+
+        if gender_filter in {gender.value for gender in GenderEnum}:
+            patients_query = patients_query.filter(
+                Patient.gender == GenderEnum(gender_filter)
             )
 
-        patients_with_history = sum(1 for p in patients if p.medical_history_count > 0)
+        if age_filter in PATIENT_AGE_GROUPS:
+            min_age, max_age = PATIENT_AGE_GROUPS[age_filter]
+            today = date.today()
+            patients_query = patients_query.filter(
+                Patient.date_of_birth <= _years_before(today, min_age)
+            )
+            if max_age is not None:
+                patients_query = patients_query.filter(
+                    Patient.date_of_birth > _years_before(today, max_age + 1)
+                )
+
+        page = paginate_keyset(patients_query, PATIENT_SORTS)
+        patients = page.items
+
+        # Record counts and recent histories for this page in constant queries
+        PatientService.attach_record_summaries(patients)
 
-        stats = {
-            "total_patients": total_patients,
-            "male_patients": male_patients,
-            "female_patients": female_patients,
-            "other_patients": other_patients,
-            "age_groups": age_groups,
-            "patients_with_history": patients_with_history,
-        }
+        # Statistics cover every patient and are aggregated in SQL
+        stats = StatsService.patient_stats(doctor_id)
 
-        return render_template("patient/patients.html", patients=patients, stats=stats)
+        return render_template(
+            "patient/patients.html",
+            patients=patients,
+            page=page,
+            sort_options=PATIENT_SORTS,
+            stats=stats,
+            search=search,
+            gender_filter=gender_filter,
+            age_filter=age_filter,
+            age_groups=PATIENT_AGE_GROUPS,
+        )
     except Exception as e:
         flash(f"Error loading patients: {str(e)}", "error")
         return redirect(url_for("main.dashboard"))
 
 
+@patients_bp.route("/patients/lookup")
+@login_required
+def lookup_patients():
+    """Return the doctor's patients whose name starts with ?q= as JSON, for
+    the typeahead patient picker on add/edit forms."""
+    doctor_id = session.get("doctor_id")
+    query_text = request.args.get("q", "")
+    max_limit = current_app.config["PATIENT_LOOKUP_LIMIT"]
+    try:
+        limit = max(1, min(int(request.args.get("limit", 10)), max_limit))
+    except ValueError:
+        limit = 10
+    return jsonify(patients=patient_index.search(doctor_id, query_text, limit))
+
+
+@patients_bp.route("/patients/import", methods=["GET", "POST"])
+@login_required
+def import_patients():
+    """Create patients from an uploaded CSV or NDJSON file (e.g. an export
+    from another EHR), and offer the rejected rows as a downloadable report."""
+    doctor_id = session.get("doctor_id")
+    if request.method == "GET":
+        return render_template("patient/import_patients.html", stats=None)
+
+    file = request.files.get("file")
+    extension = file.filename.rsplit(".", 1)[-1].lower() if file else ""
+    if not file or extension not in current_app.config["PATIENT_IMPORT_EXTENSIONS"]:
+        flash("Please choose a .csv or .ndjson file to import.", "error")
+        return redirect(url_for("patients.import_patients"))
+
+    report_name = new_report("patient", doctor_id)
+    lines = upload_lines(file)
+    try:
+        with open(
+            report_path(report_name), "w", newline="", encoding="utf-8"
+        ) as rejects:
+            stats = PatientTransferService.import_lines(
+                lines,
+                doctor_id,
+                current_app.config["PATIENT_IMPORT_BATCH_SIZE"],
+                rejects,
+            )
+    except Exception as e:
+        db.session.rollback()
+        discard_report(report_name)
+        flash(f"Error importing patients: {str(e)}", "error")
+        return redirect(url_for("patients.import_patients"))
+    finally:
+        lines.detach()
+
+    rejected_rows = []
+    if stats["rejected"]:
+        rejected_rows = read_report_preview(report_name)
+    else:
+        discard_report(report_name)
+        report_name = None
+
+    flash(
+        f"Imported {stats['imported']} of {stats['read']} patients "
+        f"({stats['rows_per_second']} rows/s).",
+        "success" if not stats["rejected"] else "error",
+    )
+    return render_template(
+        "patient/import_patients.html",
+        stats=stats,
+        report_name=report_name,
+        rejected_rows=rejected_rows,
+    )
+
+
+@patients_bp.route("/patients/import/reports/<report_name>")
+@login_required
+def download_import_report(report_name):
+    """Download a rejected-rows report from one of the doctor's imports."""
+    return send_report("patient", session.get("doctor_id"), report_name)
+
+
+@patients_bp.route("/patients/export")
+@login_required
+def export_patients():
+    """Stream all of the doctor's patients as CSV (default) or NDJSON
+    (?format=ndjson), generated row by row as the response is sent."""
+    doctor_id = session.get("doctor_id")
+    file_format = request.args.get("format", "csv")
+    rows = PatientTransferService.export_rows(
+        doctor_id, current_app.config["EXPORT_BATCH_SIZE"]
+    )
+    if file_format == "ndjson":
+        body, mimetype = (
+            PatientTransferService.export_ndjson(rows),
+            "application/x-ndjson",
+        )
+    else:
+        file_format = "csv"
+        body, mimetype = PatientTransferService.export_csv(rows), "text/csv"
+    filename = f"patients-{date.today().isoformat()}.{file_format}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
 @patients_bp.route("/add_patient", methods=["GET", "POST"])
 @login_required
 def add_patient():
@@ -104,6 +257,7 @@ def add_patient():
             for e in errors:
                 flash(e, "error")
             return render_template("patient/add_patient.html")
+        DashboardService.invalidate(doctor_id)
         flash(
             f"Patient {patient.first_name} {patient.last_name} added successfully!",
             "success",
@@ -176,6 +330,7 @@ def edit_patient(patient_id):
             for e in errors:
                 flash(e, "error")
             return render_template("patient/edit_patient.html", patient=patient)
+        DashboardService.invalidate(doctor_id)
         flash(
             f"Patient {updated_patient.first_name} {updated_patient.last_name} updated successfully!",
             "success",
@@ -203,11 +358,21 @@ def delete_patient(patient_id):
         LaboratoryResult.query.filter_by(patient_id=patient.id).delete()
         MedicalHistory.query.filter_by(patient_id=patient.id).delete()
         SocialHistory.query.filter_by(patient_id=patient.id).delete()
-        RadiologyImaging.query.filter_by(patient_id=patient.id).delete()
+
+        # Imaging records are deleted one by one, not in bulk, so their
+        # delete events release the image blobs they reference
+        image_filenames = []
+        for imaging in RadiologyImaging.query.filter_by(patient_id=patient.id):
+            image_filenames.append(imaging.image_filename)
+            db.session.delete(imaging)
 
         # Delete patient
         db.session.delete(patient)
         db.session.commit()
+        DashboardService.invalidate(doctor_id)
+        for image_filename in image_filenames:
+            delete_image_file(image_filename)
+            cache.delete(image_access_key(doctor_id, image_filename))
 
         flash(
             f"Patient {patient_name} and all related records deleted successfully!",
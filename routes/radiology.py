@@ -10,21 +10,45 @@ from flask import (
     flash,
     render_template,
     session,
-    send_from_directory,
+    send_file,
     current_app,
+    abort,
 )
 from datetime import datetime
+import mimetypes
 import os
+from sqlalchemy.orm import contains_eager
 from models import db, RadiologyImaging, Patient
 from utils.auth_decorators import login_required
-from utils.file_handlers import save_uploaded_file, allowed_file, delete_image_file
+from utils.replicas import use_replica
+from utils.file_handlers import (
+    save_uploaded_file,
+    allowed_file,
+    delete_image_file,
+    image_access_key,
+)
+from utils.blob_store import content_hash, image_path
+from utils.cache import cache
+from utils.dicom import DICOM_COLUMNS, DICOM_MODALITIES
+from utils.image_previews import get_preview
+from utils.image_jobs import submit_image_job
+from utils.pagination import KeysetSort, paginate_keyset
 from services.patient_service import PatientService
+from services.dashboard_service import DashboardService
 
 radiology_bp = Blueprint("radiology", __name__)
 
+RADIOLOGY_SORTS = {
+    "newest": KeysetSort(
+        "Newest first", (RadiologyImaging.date, RadiologyImaging.id), descending=True
+    ),
+    "oldest": KeysetSort("Oldest first", (RadiologyImaging.date, RadiologyImaging.id)),
+}
+
 
 @radiology_bp.route("/view_radiology_imaging")
 @login_required
+@use_replica
 def view_radiology_imaging():
     """View all radiology imaging records."""
     doctor_id = session.get("doctor_id")
@@ -32,6 +56,8 @@ def view_radiology_imaging():
     # Get search parameters
     search_patient = request.args.get("search_patient", "").strip()
     search_imaging = request.args.get("search_imaging", "").strip()
+    search_modality = request.args.get("search_modality", "").strip().upper()
+    search_study = request.args.get("search_study", "").strip()
 
     query = (
         db.session.query(RadiologyImaging)
@@ -51,14 +77,30 @@ def view_radiology_imaging():
     if search_imaging:
         query = query.filter(RadiologyImaging.name.ilike(f"%{search_imaging}%"))
 
-    # Execute query and order results
-    radiology_imaging = query.order_by(RadiologyImaging.date.desc()).all()
+    # DICOM header fields are indexed columns, so these are equality lookups
+    if search_modality:
+        query = query.filter(RadiologyImaging.modality == search_modality)
+
+    if search_study:
+        query = query.filter(RadiologyImaging.study_instance_uid == search_study)
+
+    # Execute query for one page of results
+    page = paginate_keyset(
+        query.options(contains_eager(RadiologyImaging.patient)), RADIOLOGY_SORTS
+    )
+    total_records = query.order_by(None).count()
 
     return render_template(
         "radiology/view_radiology_imaging.html",
-        radiology_imaging=radiology_imaging,
+        radiology_imaging=page.items,
+        page=page,
+        sort_options=RADIOLOGY_SORTS,
+        total_records=total_records,
         search_patient=search_patient,
         search_imaging=search_imaging,
+        search_modality=search_modality,
+        search_study=search_study,
+        modalities=DICOM_MODALITIES,
     )
 
 
@@ -102,13 +144,12 @@ def add_radiology_imaging():
             if errors:
                 for error in errors:
                     flash(error, "error")
-                patients = (
-                    Patient.query.filter_by(doctor_id=doctor_id)
-                    .order_by(Patient.last_name)
-                    .all()
+                selected_patient = PatientService.get_selected_patient(
+                    request.values.get("patient_id"), doctor_id
                 )
                 return render_template(
-                    "radiology/add_radiology_imaging.html", patients=patients
+                    "radiology/add_radiology_imaging.html",
+                    selected_patient=selected_patient,
                 )
 
             # Create imaging datetime
@@ -123,13 +164,12 @@ def add_radiology_imaging():
                     errors.append("Invalid date format")
                     for error in errors:
                         flash(error, "error")
-                    patients = (
-                        Patient.query.filter_by(doctor_id=doctor_id)
-                        .order_by(Patient.last_name)
-                        .all()
+                    selected_patient = PatientService.get_selected_patient(
+                        request.values.get("patient_id"), doctor_id
                     )
                     return render_template(
-                        "radiology/add_radiology_imaging.html", patients=patients
+                        "radiology/add_radiology_imaging.html",
+                        selected_patient=selected_patient,
                     )
             # Handle file upload if present
             image_filename = None
@@ -139,13 +179,12 @@ def add_radiology_imaging():
                     errors.append("Failed to save uploaded image")
                     for error in errors:
                         flash(error, "error")
-                    patients = (
-                        Patient.query.filter_by(doctor_id=doctor_id)
-                        .order_by(Patient.last_name)
-                        .all()
+                    selected_patient = PatientService.get_selected_patient(
+                        request.values.get("patient_id"), doctor_id
                     )
                     return render_template(
-                        "radiology/add_radiology_imaging.html", patients=patients
+                        "radiology/add_radiology_imaging.html",
+                        selected_patient=selected_patient,
                     )
 
             # Create new radiology imaging record
@@ -158,6 +197,11 @@ def add_radiology_imaging():
 
             db.session.add(new_imaging)
             db.session.commit()
+            DashboardService.invalidate(doctor_id)
+
+            # Decode and build previews on the process pool; the list shows
+            # the record as processing until the job finishes
+            submit_image_job(new_imaging)
 
             patient = Patient.query.get(patient_id)
             flash(
@@ -171,40 +215,94 @@ def add_radiology_imaging():
             flash(f"Error adding radiology imaging: {str(e)}", "error")
 
     # GET request - show form
-    patients = (
-        Patient.query.filter_by(doctor_id=doctor_id).order_by(Patient.last_name).all()
+    selected_patient = PatientService.get_selected_patient(
+        request.values.get("patient_id"), doctor_id
     )
-    selected_patient_id = request.args.get("patient_id", "")
     return render_template(
         "radiology/add_radiology_imaging.html",
-        patients=patients,
-        selected_patient_id=selected_patient_id,
+        selected_patient=selected_patient,
+    )
+
+
+def _owns_image(filename):
+    """True if filename is the image of one of the logged-in doctor's
+    radiology records. Hashed names point into a blob store shared by every
+    doctor, so access is granted per record, never by the patient folder
+    in the URL. The answer is cached briefly per doctor and filename."""
+    doctor_id = session.get("doctor_id")
+    return cache.get_or_set(
+        image_access_key(doctor_id, filename),
+        lambda: db.session.query(
+            RadiologyImaging.query.join(Patient)
+            .filter(
+                RadiologyImaging.image_filename == filename,
+                Patient.doctor_id == doctor_id,
+            )
+            .exists()
+        ).scalar(),
+        ttl=current_app.config["IMAGE_ACCESS_CACHE_TTL"],
     )
 
 
+def _send_image(path, filename, etag=None, accel_path=None):
+    """Send an image file with validators and private caching headers.
+
+    `etag` is the content hash when known; content behind a hashed name
+    never changes, so it may be cached for IMAGE_CACHE_MAX_AGE. Conditional
+    (304) and Range (206) requests are answered here, unless
+    IMAGE_SENDFILE_MODE hands the bytes to the front proxy: "x-sendfile"
+    uses Flask's USE_X_SENDFILE, "x-accel-redirect" redirects nginx to
+    IMAGE_ACCEL_REDIRECT_PREFIX + accel_path.
+    """
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    accel_prefix = current_app.config["IMAGE_ACCEL_REDIRECT_PREFIX"]
+
+    if accel_path and current_app.config["IMAGE_SENDFILE_MODE"] == "x-accel-redirect":
+        stat = os.stat(path)
+        response = current_app.response_class(mimetype=mimetype)
+        response.set_etag(etag or f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+        response.last_modified = stat.st_mtime
+        response.make_conditional(request)
+        if response.status_code != 304:
+            response.headers["X-Accel-Redirect"] = accel_prefix + accel_path
+    else:
+        response = send_file(
+            path, mimetype=mimetype, conditional=True, etag=etag or True
+        )
+
+    if etag:
+        response.headers["Cache-Control"] = (
+            f"private, max-age={current_app.config['IMAGE_CACHE_MAX_AGE']}, immutable"
+        )
+    else:
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @radiology_bp.route("/radiology_image/<path:filename>")
 @login_required
 def radiology_image(filename):
     """Serve radiology images securely."""
-    doctor_id = session.get("doctor_id")
-
     # Extract patient ID from filename path (format: patient_X/filename.ext)
     try:
         if "/" in filename:
-            patient_folder, image_name = filename.split("/", 1)
-            patient_id = int(patient_folder.replace("patient_", ""))
-
-            # Verify that this patient belongs to the logged-in doctor
-            patient = PatientService.find_patient_by_id(patient_id, doctor_id)
-            if not patient:
+            # Verify that this image belongs to one of the doctor's records
+            if not _owns_image(filename):
                 flash("Access denied to this image.", "error")
                 return redirect(url_for("radiology.view_radiology_imaging"))
 
-            # Serve the file
-            return send_from_directory(
-                os.path.join(current_app.config["UPLOAD_FOLDER"], patient_folder),
-                image_name,
-                )
+            # Serve the file (from the shared blob store for hashed names)
+            path = image_path(filename)
+            if not path or not os.path.isfile(path):
+                abort(404)
+            return _send_image(
+                path,
+                filename,
+                etag=content_hash(filename),
+                accel_path=os.path.relpath(
+                    path, current_app.config["UPLOAD_FOLDER"]
+                ).replace(os.sep, "/"),
+            )
         else:
             flash("Invalid image path.", "error")
             return redirect(url_for("radiology.view_radiology_imaging"))
@@ -214,6 +312,31 @@ def radiology_image(filename):
         return redirect(url_for("radiology.view_radiology_imaging"))
 
 
+@radiology_bp.route("/radiology_preview/<size>/<path:filename>")
+@login_required
+def radiology_preview(size, filename):
+    """Serve a downscaled preview of a radiology image, building it on first
+    request. Falls back to the original if no preview can be made."""
+    try:
+        if "/" not in filename or not _owns_image(filename):
+            flash("Access denied to this image.", "error")
+            return redirect(url_for("radiology.view_radiology_imaging"))
+    except ValueError:
+        flash("Invalid image path.", "error")
+        return redirect(url_for("radiology.view_radiology_imaging"))
+
+    preview = get_preview(filename, size)
+    if not preview:
+        return redirect(url_for("radiology.radiology_image", filename=filename))
+
+    sha256 = content_hash(filename)
+    return _send_image(
+        os.path.join(current_app.config["PREVIEW_FOLDER"], preview),
+        preview,
+        etag=f"{sha256}-{size}" if sha256 else None,
+    )
+
+
 @radiology_bp.route("/edit_radiology_imaging/<int:imaging_id>", methods=["GET", "POST"])
 @login_required
 def edit_radiology_imaging(imaging_id):
@@ -254,15 +377,9 @@ def edit_radiology_imaging(imaging_id):
             if errors:
                 for error in errors:
                     flash(error, "error")
-                patients = (
-                    Patient.query.filter_by(doctor_id=doctor_id)
-                    .order_by(Patient.last_name)
-                    .all()
-                )
                 return render_template(
                     "radiology/edit_radiology_imaging.html",
                     imaging_record=imaging_record,
-                    patients=patients,
                     datetime=datetime,
                 )
 
@@ -277,15 +394,9 @@ def edit_radiology_imaging(imaging_id):
                     imaging_record.date = datetime.strptime(imaging_date, "%Y-%m-%d")
                 except ValueError:
                     flash("Invalid date format", "error")
-                    patients = (
-                        Patient.query.filter_by(doctor_id=doctor_id)
-                        .order_by(Patient.last_name)
-                        .all()
-                    )
                     return render_template(
                         "radiology/edit_radiology_imaging.html",
                         imaging_record=imaging_record,
-                        patients=patients,
                         datetime=datetime,
                     )
 
@@ -300,21 +411,23 @@ def edit_radiology_imaging(imaging_id):
                 new_filename = save_uploaded_file(image_file, imaging_record.patient_id)
                 if new_filename:
                     imaging_record.image_filename = new_filename
+                    # The old file's DICOM header no longer describes the
+                    # record; the image job fills these in again for DICOM
+                    for column in DICOM_COLUMNS:
+                        setattr(imaging_record, column, None)
                 else:
                     flash("Failed to save uploaded image", "error")
-                    patients = (
-                        Patient.query.filter_by(doctor_id=doctor_id)
-                        .order_by(Patient.last_name)
-                        .all()
-                    )
                     return render_template(
                         "radiology/edit_radiology_imaging.html",
                         imaging_record=imaging_record,
-                        patients=patients,
                         datetime=datetime,
                     )
 
             db.session.commit()
+            DashboardService.invalidate(doctor_id)
+            if image_file and image_file.filename != "":
+                cache.delete(image_access_key(doctor_id, old_filename))
+                submit_image_job(imaging_record)
 
             flash(
                 f"Radiology imaging record for {imaging_record.patient.first_name} "
@@ -324,15 +437,9 @@ def edit_radiology_imaging(imaging_id):
             return redirect(url_for("radiology.view_radiology_imaging"))
 
         # GET request - show edit form
-        patients = (
-            Patient.query.filter_by(doctor_id=doctor_id)
-            .order_by(Patient.last_name)
-            .all()
-        )
         return render_template(
             "radiology/edit_radiology_imaging.html",
             imaging_record=imaging_record,
-            patients=patients,
             datetime=datetime,
         )
 
@@ -372,8 +479,11 @@ def delete_radiology_imaging(imaging_id):
         if imaging_record.image_filename:
             if delete_image_file(imaging_record.image_filename):
                 # Delete the imaging record
+                image_filename = imaging_record.image_filename
                 db.session.delete(imaging_record)
                 db.session.commit()
+                DashboardService.invalidate(doctor_id)
+                cache.delete(image_access_key(doctor_id, image_filename))
                 flash(
                     f"Radiology imaging record '{imaging_name}' "
                     f"for {patient_name} has been deleted successfully.",
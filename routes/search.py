@@ -0,0 +1,61 @@
+"""
+Full-text search routes for the EHR system.
+"""
+
+from flask import (
+    Blueprint,
+    request,
+    flash,
+    render_template,
+    session,
+    current_app,
+)
+from models import SearchDocument
+from utils.auth_decorators import login_required
+from utils.pagination import KeysetSort, paginate_offset
+from services.search_service import SearchService, ENTITY_TYPES
+
+search_bp = Blueprint("search", __name__)
+
+
+@search_bp.route("/search")
+@login_required
+def search():
+    """Search the doctor's patients, lab results, medical history and imaging."""
+    doctor_id = session.get("doctor_id")
+    query_text = request.args.get("q", "").strip()
+    entity_type = request.args.get("type", "")
+    if entity_type not in ENTITY_TYPES:
+        entity_type = ""
+
+    page, sorts = None, {}
+    terms = SearchService.terms(query_text)
+    if terms:
+        try:
+            query, score = SearchService.search(doctor_id, terms, entity_type or None)
+            sorts = {
+                "relevance": KeysetSort(
+                    "Best match", (score, SearchDocument.id), descending=True
+                ),
+                "newest": KeysetSort(
+                    "Newest first",
+                    (SearchDocument.date, SearchDocument.id),
+                    descending=True,
+                ),
+            }
+            page = paginate_offset(
+                query, sorts, current_app.config["SEARCH_MAX_RESULTS"]
+            )
+        except Exception as e:
+            print(f"Error running search: {e}")
+            flash("Search is currently unavailable. Please try again.", "error")
+            page = None
+
+    return render_template(
+        "main/search.html",
+        query_text=query_text,
+        entity_type=entity_type,
+        entity_types=ENTITY_TYPES,
+        page=page,
+        sort_options=sorts,
+    )
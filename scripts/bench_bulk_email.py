@@ -0,0 +1,54 @@
+"""
+Measure bulk email throughput against the configured SMTP server.
+
+Run a local sink first, e.g. `python -m aiosmtpd -n -l localhost:1025`, and set
+MAIL_SERVER=localhost, MAIL_PORT=1025, MAIL_USE_TLS=False. Then:
+
+    python3 scripts/bench_bulk_email.py --count 2000 --batch-size 100
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from utils.mail_helper import send_bulk_email  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    args = parser.parse_args()
+
+    messages = (
+        (
+            f"patient{i}@example.com",
+            {"last_name": f"Patient{i}", "confirm_url": "http://localhost/"},
+        )
+        for i in range(args.count)
+    )
+
+    with app.test_request_context():
+        report = send_bulk_email(
+            "VitalTrack bulk send benchmark",
+            "email/email_confirmation.html",
+            messages,
+            batch_size=args.batch_size,
+            rate_limit=args.rate_limit,
+        )
+
+    print(f"sent:       {len(report.sent)}")
+    print(f"failed:     {len(report.failed)}")
+    print(f"batches:    {report.batches}")
+    print(f"elapsed:    {report.elapsed_seconds:.2f}s")
+    print(f"throughput: {report.messages_per_second:.1f} messages/second")
+    for recipient, error in report.failed[:10]:
+        print(f"  {recipient}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 from app import app
 from models import db
+from services.counter_service import CounterService
 
 with app.app_context():
     db.create_all()
+    # Seed the About Us counters, which pages only read
+    CounterService.reconcile()
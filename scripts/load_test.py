@@ -0,0 +1,184 @@
+"""
+Measure request throughput of the production server as workers are added.
+
+Starts gunicorn (gunicorn.conf.py) with each worker count in turn, drives it
+with concurrent keep-alive clients, each in its own process so the load
+generator is not limited by one interpreter lock, and prints requests per
+second and latency percentiles:
+
+    python3 scripts/load_test.py --workers 1,2,4 --concurrency 4,8,16
+
+Pages behind the login need --username and --password. To load an already
+running server (e.g. `python wsgi.py`) instead, pass --url and no --workers.
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def login(base_url: str, username: str, password: str) -> str:
+    """Log in and return the session Cookie header value."""
+    jar = CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    data = urllib.parse.urlencode({"username": username, "password": password})
+    opener.open(f"{base_url}/login", data.encode())
+    cookies = "; ".join(f"{cookie.name}={cookie.value}" for cookie in jar)
+    if "session=" not in cookies:
+        raise SystemExit("login failed: no session cookie")
+    return cookies
+
+
+def client(base_url, paths, cookie, duration, results):
+    """Request paths round-robin over one keep-alive connection for duration
+    seconds; put (latencies, errors) on results."""
+    url = urllib.parse.urlsplit(base_url)
+    headers = {"Cookie": cookie} if cookie else {}
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    count = 0
+    while time.perf_counter() < deadline:
+        path = paths[count % len(paths)]
+        count += 1
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            continue
+        if response.status >= 400:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    results.put((latencies, errors))
+
+
+def run_load(base_url, paths, cookie, concurrency, duration):
+    results = multiprocessing.Queue()
+    clients = [
+        multiprocessing.Process(
+            target=client, args=(base_url, paths, cookie, duration, results)
+        )
+        for _ in range(concurrency)
+    ]
+    for process in clients:
+        process.start()
+    latencies, errors = [], 0
+    for _ in clients:
+        client_latencies, client_errors = results.get()
+        latencies.extend(client_latencies)
+        errors += client_errors
+    for process in clients:
+        process.join()
+
+    latencies.sort()
+
+    def percentile(p):
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / duration,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+    }
+
+
+def start_server(workers: int, threads: int, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        WEB_WORKERS=str(workers),
+        WEB_THREADS=str(threads),
+        FLASK_HOST="127.0.0.1",
+        FLASK_PORT=str(port),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"gunicorn exited with status {server.returncode}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except urllib.error.HTTPError:
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("gunicorn did not start within 60 seconds")
+
+
+def _counts(text: str):
+    return [int(n) for n in text.split(",") if n.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=_counts, default=None)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--concurrency", type=_counts, default=[4, 8, 16])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--path", action="append", dest="paths")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+    paths = args.paths or ["/about_us"]
+
+    print(f"CPUs: {os.cpu_count()}  paths: {', '.join(paths)}")
+    print(
+        f"{'workers':>7} {'clients':>7} {'requests':>9} {'errors':>6} "
+        f"{'req/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}"
+    )
+    for workers in args.workers or [None]:
+        server = None
+        if workers is not None:
+            server = start_server(workers, args.threads, args.port)
+        if server is not None or not args.url:
+            base_url = f"http://127.0.0.1:{args.port}"
+        else:
+            base_url = args.url.rstrip("/")
+        try:
+            cookie = ""
+            if args.username:
+                cookie = login(base_url, args.username, args.password or "")
+            for concurrency in args.concurrency:
+                result = run_load(base_url, paths, cookie, concurrency, args.duration)
+                print(
+                    f"{workers or '-':>7} {concurrency:>7} {result['requests']:>9} "
+                    f"{result['errors']:>6} {result['rps']:>8.1f} {result['p50']:>7.1f} "
+                    f"{result['p95']:>7.1f} {result['p99']:>7.1f}"
+                )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
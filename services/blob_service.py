@@ -0,0 +1,254 @@
+"""
+Blob service maintaining reference counts for the radiology blob store.
+
+Each RadiologyImaging whose image_filename carries a content hash holds one
+reference on the matching image_blob row. References are adjusted inside the
+same transaction as the insert, update or delete of the record (like the
+system counters), and the garbage collector removes blobs nobody references.
+"""
+
+import hashlib
+import os
+import shutil
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from flask import current_app
+from sqlalchemy import event, inspect, insert, update
+
+from models import db, ImageBlob, RadiologyImaging
+from utils.blob_store import (
+    BLOB_DIR,
+    blob_path,
+    content_hash,
+    hashed_filename,
+    image_path,
+)
+from utils.file_handlers import INCOMING_DIR
+from utils.image_previews import delete_blob_previews, delete_previews
+
+_blob_table = ImageBlob.__table__
+
+
+class BlobService:
+    """Service class for blob store reference counting and cleanup."""
+
+    @staticmethod
+    def acquire(connection, sha256: Optional[str]):
+        """Add a reference to a blob, creating its row on first use."""
+        if not sha256:
+            return
+        now = datetime.utcnow()
+        result = connection.execute(
+            update(_blob_table)
+            .where(_blob_table.c.sha256 == sha256)
+            .values(ref_count=_blob_table.c.ref_count + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            try:
+                size = os.path.getsize(blob_path(sha256))
+            except OSError:
+                size = 0
+            connection.execute(
+                insert(_blob_table).values(
+                    sha256=sha256,
+                    size=size,
+                    ref_count=1,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+
+    @staticmethod
+    def release(connection, sha256: Optional[str]):
+        """Drop a reference to a blob; the file stays until garbage collection."""
+        if sha256:
+            connection.execute(
+                update(_blob_table)
+                .where(_blob_table.c.sha256 == sha256)
+                .values(
+                    ref_count=_blob_table.c.ref_count - 1,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+
+    @staticmethod
+    def reconcile_ref_counts() -> int:
+        """Recount references from radiology_imaging and fix any drift.
+        Returns the number of blob rows changed."""
+        counts = Counter()
+        rows = db.session.execute(
+            db.select(RadiologyImaging.image_filename).execution_options(yield_per=1000)
+        )
+        for (image_filename,) in rows:
+            sha256 = content_hash(image_filename)
+            if sha256:
+                counts[sha256] += 1
+
+        changed = 0
+        for blob in ImageBlob.query.all():
+            actual = counts.pop(blob.sha256, 0)
+            if blob.ref_count != actual:
+                blob.ref_count = actual
+                changed += 1
+        # Referenced blobs that have no row yet
+        for sha256, actual in counts.items():
+            db.session.add(
+                ImageBlob(
+                    sha256=sha256,
+                    size=BlobService._file_size(blob_path(sha256)),
+                    ref_count=actual,
+                )
+            )
+            changed += 1
+        db.session.commit()
+        return changed
+
+    @staticmethod
+    def collect_garbage(grace_seconds: int) -> Dict[str, int]:
+        """Delete unreferenced blobs (and their previews), orphaned blob files
+        and abandoned partial uploads. Anything touched within grace_seconds
+        is kept, so an upload that has not been committed yet is never lost."""
+        cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+        cutoff_ts = time.time() - grace_seconds
+        stats = {"blobs": 0, "orphan_files": 0, "partial_uploads": 0, "bytes": 0}
+
+        unreferenced = ImageBlob.query.filter(
+            ImageBlob.ref_count <= 0, ImageBlob.updated_at < cutoff
+        ).all()
+        for blob in unreferenced:
+            path = blob_path(blob.sha256)
+            if os.path.exists(path) and os.path.getmtime(path) >= cutoff_ts:
+                continue  # re-uploaded moments ago, its reference is on the way
+            stats["bytes"] += BlobService._remove(path)
+            delete_blob_previews(blob.sha256)
+            db.session.delete(blob)
+            stats["blobs"] += 1
+        db.session.commit()
+
+        known = {sha256 for (sha256,) in db.session.query(ImageBlob.sha256)}
+        upload_folder = current_app.config["UPLOAD_FOLDER"]
+        for root, _, files in os.walk(os.path.join(upload_folder, BLOB_DIR)):
+            for name in files:
+                path = os.path.join(root, name)
+                if name not in known and os.path.getmtime(path) < cutoff_ts:
+                    stats["bytes"] += BlobService._remove(path)
+                    delete_blob_previews(name)
+                    stats["orphan_files"] += 1
+
+        incoming = os.path.join(upload_folder, INCOMING_DIR)
+        if os.path.isdir(incoming):
+            for name in os.listdir(incoming):
+                path = os.path.join(incoming, name)
+                if os.path.getmtime(path) < cutoff_ts:
+                    stats["bytes"] += BlobService._remove(path)
+                    stats["partial_uploads"] += 1
+        return stats
+
+    @staticmethod
+    def migrate_legacy_files(batch_size: int = 100) -> Dict[str, int]:
+        """Move files stored under per-upload uuid names into the blob store,
+        folding identical files into one blob and renaming the records.
+        Old files are removed only after their batch is committed, so the
+        migration can be interrupted and re-run."""
+        stats = {"migrated": 0, "deduplicated": 0, "missing": 0}
+        last_id = 0
+        while True:
+            batch = (
+                RadiologyImaging.query.filter(RadiologyImaging.id > last_id)
+                .order_by(RadiologyImaging.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            migrated_files = []
+            for imaging in batch:
+                if content_hash(imaging.image_filename):
+                    continue
+                source = image_path(imaging.image_filename)
+                if not source or not os.path.isfile(source):
+                    stats["missing"] += 1
+                    continue
+
+                sha256 = BlobService._hash_file(source)
+                destination = blob_path(sha256)
+                if os.path.exists(destination):
+                    stats["deduplicated"] += 1
+                else:
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    try:
+                        os.link(source, destination)
+                    except OSError:
+                        shutil.copyfile(source, destination)
+
+                migrated_files.append(imaging.image_filename)
+                extension = imaging.image_filename.rsplit(".", 1)[-1]
+                imaging.image_filename = hashed_filename(
+                    imaging.patient_id, sha256, extension
+                )
+                if imaging.image_job:
+                    imaging.image_job.image_filename = imaging.image_filename
+                stats["migrated"] += 1
+
+            db.session.commit()
+            for old_filename in migrated_files:
+                delete_previews(old_filename)
+                BlobService._remove(image_path(old_filename))
+            db.session.expunge_all()
+        return stats
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        chunk_size = current_app.config["UPLOAD_CHUNK_SIZE"]
+        with open(path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        """Remove a file, returning the bytes freed."""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+
+def _after_insert(mapper, connection, target):
+    BlobService.acquire(connection, content_hash(target.image_filename))
+
+
+def _after_delete(mapper, connection, target):
+    BlobService.release(connection, content_hash(target.image_filename))
+
+
+def _after_update(mapper, connection, target):
+    history = inspect(target).attrs.image_filename.history
+    if history.has_changes():
+        for old_filename in history.deleted:
+            BlobService.release(connection, content_hash(old_filename))
+        for new_filename in history.added:
+            BlobService.acquire(connection, content_hash(new_filename))
+
+
+def register_blob_events():
+    """Attach reference-counting listeners to RadiologyImaging (idempotent)."""
+    if not event.contains(RadiologyImaging, "after_insert", _after_insert):
+        event.listen(RadiologyImaging, "after_insert", _after_insert)
+        event.listen(RadiologyImaging, "after_delete", _after_delete)
+        event.listen(RadiologyImaging, "after_update", _after_update)
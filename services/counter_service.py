@@ -0,0 +1,129 @@
+"""
+Counter service maintaining system-wide record counts for the About Us page.
+
+Counts live in the system_counter table and are adjusted inside the same
+transaction as the insert or delete that changes them (once per flush), so
+reading them is a primary-key lookup instead of a full COUNT(*) over each
+table. Pages only ever read the stored values; the counter rows are seeded
+and recounted by db/init.sql, scripts/init_db.py and the reconcile-counters
+command, never on a request.
+"""
+
+from datetime import datetime
+from typing import Dict
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import Session, object_session
+from models import (
+    db,
+    Doctor,
+    Patient,
+    Appointment,
+    LaboratoryResult,
+    RadiologyImaging,
+    SystemCounter,
+)
+from utils.replicas import use_primary
+
+# Counted models; counter names are their table names
+COUNTED_MODELS = [Patient, Appointment, LaboratoryResult, RadiologyImaging, Doctor]
+
+_counter_table = SystemCounter.__table__
+
+
+class CounterService:
+    """Service class for system-wide counters."""
+
+    @staticmethod
+    def adjust(connection, name: str, delta: int):
+        """Add delta to a counter using the caller's connection/transaction.
+        Use this from code paths that bypass ORM events (bulk inserts)."""
+        if delta:
+            connection.execute(
+                update(_counter_table)
+                .where(_counter_table.c.name == name)
+                .values(value=_counter_table.c.value + delta)
+            )
+
+    @staticmethod
+    def reconcile() -> Dict[str, int]:
+        """Recount every counted table and store the exact values."""
+        # Count on the primary: replica counts may lag behind the writes
+        use_primary()
+        now = datetime.utcnow()
+        counts = {}
+        for model in COUNTED_MODELS:
+            name = model.__tablename__
+            counts[name] = db.session.query(func.count(model.id)).scalar()
+            counter = db.session.get(SystemCounter, name)
+            if counter is None:
+                counter = SystemCounter(name=name)
+                db.session.add(counter)
+            counter.value = counts[name]
+            counter.reconciled_at = now
+        db.session.commit()
+        return counts
+
+    @staticmethod
+    def get_counts() -> Dict[str, int]:
+        """Return the stored {table_name: count}; counters not seeded yet
+        read as 0 until reconcile-counters runs."""
+        counts = dict.fromkeys((model.__tablename__ for model in COUNTED_MODELS), 0)
+        counts.update(
+            (counter.name, counter.value) for counter in SystemCounter.query.all()
+        )
+        return counts
+
+
+_PENDING_KEY = "counter_deltas"
+
+
+def _record(connection, target, name: str, delta: int):
+    # Sum the changes of one flush per counter and apply them in _after_flush,
+    # so a flush of many rows costs one UPDATE per counter instead of per row
+    session = object_session(target)
+    if session is None:
+        CounterService.adjust(connection, name, delta)
+        return
+    deltas = session.info.setdefault(_PENDING_KEY, {})
+    deltas[name] = deltas.get(name, 0) + delta
+
+
+def _increment(mapper, connection, target):
+    _record(connection, target, mapper.local_table.name, 1)
+
+
+def _decrement(mapper, connection, target):
+    _record(connection, target, mapper.local_table.name, -1)
+
+
+def _after_flush(session, flush_context):
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if deltas:
+        connection = session.connection()
+        for name, delta in deltas.items():
+            CounterService.adjust(connection, name, delta)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _after_bulk_delete(delete_context):
+    # Query.delete() skips per-row mapper events, so apply its rowcount here
+    name = delete_context.mapper.local_table.name
+    if name in {model.__tablename__ for model in COUNTED_MODELS}:
+        rowcount = delete_context.result.rowcount
+        if rowcount and rowcount > 0:
+            CounterService.adjust(delete_context.session.connection(), name, -rowcount)
+
+
+def register_counter_events():
+    """Attach insert/delete listeners to the counted models (idempotent)."""
+    for model in COUNTED_MODELS:
+        if not event.contains(model, "after_insert", _increment):
+            event.listen(model, "after_insert", _increment)
+            event.listen(model, "after_delete", _decrement)
+    if not event.contains(Session, "after_bulk_delete", _after_bulk_delete):
+        event.listen(Session, "after_bulk_delete", _after_bulk_delete)
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "after_soft_rollback", _after_rollback)
@@ -0,0 +1,77 @@
+"""
+Dashboard service for building and caching each doctor's dashboard data.
+"""
+
+from models import db, Patient, LaboratoryResult, Appointment
+from utils.cache import cache
+
+DASHBOARD_LIMIT = 10
+
+
+class DashboardService:
+    """Service class for dashboard-related operations."""
+
+    @staticmethod
+    def cache_key(doctor_id: int) -> str:
+        return f"dashboard:{doctor_id}"
+
+    @staticmethod
+    def _patient_name(patient: Patient) -> dict:
+        return {"first_name": patient.first_name, "last_name": patient.last_name}
+
+    @staticmethod
+    def load_dashboard_data(doctor_id: int) -> dict:
+        """Query the latest lab results and appointments for a doctor.
+        Rows are flattened to plain dicts so they can be cached between requests."""
+        lab_rows = (
+            db.session.query(LaboratoryResult, Patient)
+            .join(Patient, LaboratoryResult.patient_id == Patient.id)
+            .filter(Patient.doctor_id == doctor_id)
+            .order_by(LaboratoryResult.date.desc())
+            .limit(DASHBOARD_LIMIT)
+            .all()
+        )
+        appointment_rows = (
+            db.session.query(Appointment, Patient)
+            .join(Patient, Appointment.patient_id == Patient.id)
+            .filter(Appointment.doctor_id == doctor_id)
+            .order_by(Appointment.date.desc())
+            .limit(DASHBOARD_LIMIT)
+            .all()
+        )
+
+        lab_results = [
+            (
+                {
+                    "id": lab_result.id,
+                    "test_name": lab_result.test_name,
+                    "result": lab_result.result,
+                    "date": lab_result.date,
+                },
+                DashboardService._patient_name(patient),
+            )
+            for lab_result, patient in lab_rows
+        ]
+        appointments = [
+            {
+                "id": appointment.id,
+                "date": appointment.date,
+                "status": appointment.status,
+                "patient": DashboardService._patient_name(patient),
+            }
+            for appointment, patient in appointment_rows
+        ]
+        return {"lab_results": lab_results, "appointments": appointments}
+
+    @staticmethod
+    def get_dashboard_data(doctor_id: int) -> dict:
+        """Return the doctor's dashboard data, from cache when available."""
+        return cache.get_or_set(
+            DashboardService.cache_key(doctor_id),
+            lambda: DashboardService.load_dashboard_data(doctor_id),
+        )
+
+    @staticmethod
+    def invalidate(doctor_id: int):
+        """Drop the cached dashboard after the doctor's records change."""
+        cache.delete(DashboardService.cache_key(doctor_id))
@@ -3,32 +3,39 @@ Email service for handling email operations in the EHR system.
 """
 
 from flask import render_template, url_for
-from utils.mail_helper import send_email
+from models import Doctor
+from utils.mail_queue import queue_email
 from utils.token_holper import generate_token
 
+CONFIRMATION_TEMPLATE = "email/email_confirmation.html"
+PASSWORD_RESET_TEMPLATE = "email/password_reset_template.html"
+
 
 class EmailService:
     """Service class for email-related operations."""
 
     @staticmethod
     def send_confirmation_email(doctor) -> bool:
-        """Send email confirmation to new doctor."""
+        """Queue email confirmation to new doctor."""
         try:
             token = generate_token(doctor.id, "confirm")
             confirm_url = url_for("auth.confirm_email", token=token, _external=True)
 
             html = render_template(
-                "email/email_confirmation.html",
+                CONFIRMATION_TEMPLATE,
                 last_name=doctor.last_name,
                 confirm_url=confirm_url,
             )
 
-            send_email(
+            # Delivery happens on the background mail queue; the body holds
+            # the token, so it is never stored if delivery fails
+            return queue_email(
                 subject="Confirm your VitalTrack EHR System account",
                 recipients=[doctor.email],
                 html=html,
+                template=CONFIRMATION_TEMPLATE,
+                secret=True,
             )
-            return True
 
         except Exception as e:
             print(f"Failed to send confirmation email: {e}")
@@ -36,22 +43,48 @@ class EmailService:
 
     @staticmethod
     def send_password_reset_email(doctor) -> bool:
-        """Send password reset email to doctor."""
+        """Queue password reset email to doctor."""
         try:
             token = generate_token(doctor.id, "reset_password")
             reset_url = url_for("auth.reset_password", token=token, _external=True)
 
             html = render_template(
-                "email/password_reset_template.html", doctor=doctor, reset_url=reset_url
+                PASSWORD_RESET_TEMPLATE, doctor=doctor, reset_url=reset_url
             )
 
-            send_email(
+            return queue_email(
                 subject="Reset your VitalTrack EHR System password",
                 recipients=[doctor.email],
                 html=html,
+                template=PASSWORD_RESET_TEMPLATE,
+                secret=True,
             )
-            return True
 
         except Exception as e:
             print(f"Failed to send password reset email: {e}")
             return False
+
+    @staticmethod
+    def resend_dead_letter(dead_letter) -> bool:
+        """Queue a dead-lettered email again. Confirmation and password reset
+        emails are rendered anew, with a new token, for the doctor with that
+        address; others are resent as stored. Returns True once queued (or
+        when the email is no longer needed)."""
+        if dead_letter.template in (CONFIRMATION_TEMPLATE, PASSWORD_RESET_TEMPLATE):
+            doctor = Doctor.query.filter_by(email=dead_letter.recipients).first()
+            if doctor is None:
+                return False
+            if dead_letter.template == CONFIRMATION_TEMPLATE:
+                return doctor.email_confirmed or EmailService.send_confirmation_email(
+                    doctor
+                )
+            return EmailService.send_password_reset_email(doctor)
+
+        if dead_letter.html is None:
+            return False
+        return queue_email(
+            subject=dead_letter.subject,
+            recipients=dead_letter.recipients.split(","),
+            html=dead_letter.html,
+            template=dead_letter.template,
+        )
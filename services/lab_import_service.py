@@ -0,0 +1,229 @@
+"""
+Lab import service for bulk loading result files from reference labs.
+
+Files are read line by line (utils/lab_import.py) and never held in memory.
+Patients are resolved through a map of the doctor's patient ids, emails
+and name/birth-date keys fetched with one query up front, so no row costs a
+lookup. Valid rows are collected into batches; each batch is parsed and
+classified like a form-entered result (numeric values, units and automatic
+status), written with one executemany INSERT, counted, indexed for search
+and committed as one transaction. Rows that cannot be imported are written
+to a rejected-rows CSV report with their line number and the reason.
+"""
+
+import csv
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, TextIO
+
+import numpy as np
+from sqlalchemy import func, insert, select
+
+from models import db, LaboratoryResult, LabResultStatusEnum, Patient
+from services.counter_service import CounterService
+from services.dashboard_service import DashboardService
+from services.search_service import SearchService
+from utils.lab_import import parse_date, parse_status, parse_timestamp, read_records
+from utils.lab_rules import lab_rules
+from utils.lab_values import parse_lab_fields
+from utils.patient_index import normalize
+
+# Text columns checked against their column length before inserting
+_TEXT_COLUMNS = ("test_name", "result", "unit", "reference_range")
+
+
+class PatientMap:
+    """Lookup of a doctor's patients by id, email or name and birth date.
+    Emails and names shared by several patients are ambiguous and never
+    match."""
+
+    _AMBIGUOUS = object()
+
+    def __init__(self, rows):
+        self.patients: Dict[int, tuple] = {}  # id -> (email, names, birth date)
+        self.emails: Dict[str, object] = {}
+        self.names: Dict[tuple, object] = {}
+        for patient_id, email, first_name, last_name, date_of_birth in rows:
+            email = email.strip().lower() if email else ""
+            names = (normalize(last_name), normalize(first_name))
+            self.patients[patient_id] = (email, names, date_of_birth)
+            if email:
+                self._add(self.emails, email, patient_id)
+            self._add(self.names, (*names, date_of_birth), patient_id)
+
+    def _add(self, mapping: Dict, key, patient_id: int):
+        mapping[key] = self._AMBIGUOUS if key in mapping else patient_id
+
+    def _check(self, patient_id: int, fields: Dict[str, str]):
+        """Reject a patient id whose patient is not the one the record's
+        email, name or birth date describe."""
+        email, (last_name, first_name), date_of_birth = self.patients[patient_id]
+        if fields["email"] and fields["email"].lower() != email:
+            raise ValueError(f"patient {patient_id} has a different email")
+        if (fields["last_name"] and normalize(fields["last_name"]) != last_name) or (
+            fields["first_name"] and normalize(fields["first_name"]) != first_name
+        ):
+            raise ValueError(f"patient {patient_id} has a different name")
+        if (
+            fields["date_of_birth"]
+            and parse_date(fields["date_of_birth"]) != date_of_birth
+        ):
+            raise ValueError(f"patient {patient_id} has a different date of birth")
+
+    def resolve(self, fields: Dict[str, str]) -> int:
+        """Patient id for a record's patient fields. Raises ValueError."""
+        if fields["patient_id"]:
+            try:
+                patient_id = int(fields["patient_id"])
+            except ValueError:
+                patient_id = None
+            if patient_id not in self.patients:
+                raise ValueError(f"unknown patient {fields['patient_id']!r}")
+            self._check(patient_id, fields)
+            return patient_id
+
+        if fields["email"]:
+            found = self.emails.get(fields["email"].lower())
+        elif fields["last_name"] and fields["date_of_birth"]:
+            key = (
+                normalize(fields["last_name"]),
+                normalize(fields["first_name"]),
+                parse_date(fields["date_of_birth"]),
+            )
+            found = self.names.get(key)
+        else:
+            raise ValueError("no patient id, email or name and date of birth")
+        if found is self._AMBIGUOUS:
+            raise ValueError("patient matches more than one record")
+        if found is None:
+            raise ValueError("unknown patient")
+        return found
+
+
+class LabImportService:
+    """Service class for bulk lab result imports."""
+
+    @staticmethod
+    def load_patient_map(doctor_id: int) -> PatientMap:
+        """A doctor's patients in one query."""
+        return PatientMap(
+            db.session.execute(
+                select(
+                    Patient.id,
+                    Patient.email,
+                    Patient.first_name,
+                    Patient.last_name,
+                    Patient.date_of_birth,
+                ).where(Patient.doctor_id == doctor_id)
+            )
+        )
+
+    @staticmethod
+    def build_mapping(fields: Dict[str, str], patients: PatientMap) -> Dict:
+        """Insert values for one record (without the parsed and classified
+        columns, which are filled in per batch). Raises ValueError."""
+        patient_id = patients.resolve(fields)
+        if not fields["test_name"]:
+            raise ValueError("test_name is required")
+        if not fields["result"]:
+            raise ValueError("result is required")
+        if not fields["date"]:
+            raise ValueError("date is required")
+        for name in _TEXT_COLUMNS:
+            length = LaboratoryResult.__table__.c[name].type.length
+            if len(fields[name]) > length:
+                raise ValueError(f"{name} longer than {length} characters")
+        status = parse_status(fields["status"])
+        return {
+            "patient_id": patient_id,
+            "test_name": fields["test_name"],
+            "date": parse_timestamp(fields["date"]),
+            "result": fields["result"],
+            "unit": fields["unit"] or None,
+            "reference_range": fields["reference_range"] or None,
+            "status": LabResultStatusEnum(status) if status else None,
+            # No status in the file: classify from the value, as the form does
+            "status_auto": status is None,
+            "notes": fields["notes"] or None,
+        }
+
+    @staticmethod
+    def insert_batch(mappings: List[Dict]):
+        """Parse, classify and insert one batch of mappings, and commit."""
+        for mapping in mappings:
+            mapping.update(
+                parse_lab_fields(
+                    mapping["result"], mapping["reference_range"], mapping["unit"]
+                )
+            )
+        classified = lab_rules.classify(
+            [mapping["test_name"] for mapping in mappings],
+            [mapping["unit_normalized"] for mapping in mappings],
+            np.array([m["value_numeric"] for m in mappings], dtype=np.float64),
+            np.array([m["reference_low"] for m in mappings], dtype=np.float64),
+            np.array([m["reference_high"] for m in mappings], dtype=np.float64),
+        ).tolist()
+
+        created_at = datetime.utcnow()
+        for mapping, status in zip(mappings, classified):
+            if mapping["status_auto"]:
+                mapping["status"] = LabResultStatusEnum(status) if status else None
+            mapping["created_at"] = mapping["updated_at"] = created_at
+
+        # Read in the batch's transaction, before the insert: the rows above
+        # it that this transaction sees afterwards are its own
+        after_id = db.session.scalar(select(func.max(LaboratoryResult.id))) or 0
+        # ORM bulk INSERT: one executemany statement, no per-object events
+        db.session.execute(insert(LaboratoryResult), mappings)
+        connection = db.session.connection()
+        CounterService.adjust(connection, "laboratory_result", len(mappings))
+        SearchService.index_bulk_lab_results(connection, after_id)
+        db.session.commit()
+
+    @staticmethod
+    def import_lines(
+        lines: Iterable[str],
+        doctor_id: int,
+        batch_size: int = 1000,
+        rejects: Optional[TextIO] = None,
+        file_format: Optional[str] = None,
+    ) -> Dict:
+        """Import a CSV or HL7 file given as text lines for doctor_id's
+        patients. Rejected rows are written as CSV (line,
+        reason, original fields) to rejects. Returns counts and timing."""
+        started = time.perf_counter()
+        patients = LabImportService.load_patient_map(doctor_id)
+        report = csv.writer(rejects) if rejects is not None else None
+        stats = {"read": 0, "imported": 0, "rejected": 0, "batches": 0}
+        batch: List[Dict] = []
+
+        def flush():
+            LabImportService.insert_batch(batch)
+            stats["imported"] += len(batch)
+            stats["batches"] += 1
+            batch.clear()
+
+        for line_number, fields, raw in read_records(lines, file_format):
+            stats["read"] += 1
+            try:
+                mapping = LabImportService.build_mapping(fields, patients)
+            except ValueError as e:
+                stats["rejected"] += 1
+                if report is not None:
+                    if stats["rejected"] == 1:
+                        report.writerow(["line", "reason", "record"])
+                    report.writerow([line_number, str(e), *raw])
+                continue
+            batch.append(mapping)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        if stats["imported"]:
+            DashboardService.invalidate(doctor_id)
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        stats["rows_per_second"] = (
+            round(stats["read"] / stats["seconds"]) if stats["seconds"] else 0
+        )
+        return stats
@@ -0,0 +1,283 @@
+"""
+Lab service for typed lab values, status classification and trend
+analytics.
+
+Every lab result carries numeric columns parsed from its free-text result,
+reference range and unit (utils/lab_values.py). They are filled in by a
+before-save mapper event, and backfilled for existing rows in batches of
+bulk UPDATEs. Results whose status is automatic (status_auto) are then
+classified by the rule engine (utils/lab_rules.py) in the same event;
+historical rows are reclassified in id-ordered chunks with one UPDATE per
+resulting status. Trends read one patient's series for a test through the
+(patient_id, test_name, date) index as plain column tuples and compute
+deltas, rolling means and range flags on NumPy arrays.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import event, or_, select, update
+
+from models import db, LaboratoryResult, LabResultStatusEnum, LabStatusRule
+from utils.lab_rules import lab_rules
+from utils.lab_values import PARSER_VERSION, parse_lab_fields
+
+
+class LabService:
+    """Service class for lab value parsing, classification and trends."""
+
+    @staticmethod
+    def backfill_parsed_values(batch_size: int = 1000) -> int:
+        """Parse result/reference_range/unit for rows never parsed (or parsed
+        by an older parser version). Walks the table by id, reading only the
+        text columns, and writes each batch with one executemany UPDATE.
+        Returns the number of rows updated."""
+        updated = 0
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(
+                    LaboratoryResult.id,
+                    LaboratoryResult.result,
+                    LaboratoryResult.reference_range,
+                    LaboratoryResult.unit,
+                )
+                .where(
+                    LaboratoryResult.id > last_id,
+                    or_(
+                        LaboratoryResult.parse_version.is_(None),
+                        LaboratoryResult.parse_version < PARSER_VERSION,
+                    ),
+                )
+                .order_by(LaboratoryResult.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            # ORM bulk UPDATE by primary key: one statement, many parameter sets
+            db.session.execute(
+                update(LaboratoryResult),
+                [
+                    {
+                        "id": row.id,
+                        **parse_lab_fields(row.result, row.reference_range, row.unit),
+                    }
+                    for row in rows
+                ],
+            )
+            db.session.commit()
+            updated += len(rows)
+        return updated
+
+    @staticmethod
+    def reclassify_statuses(
+        batch_size: int = 1000, override_manual: bool = False
+    ) -> Dict[str, int]:
+        """Re-run the status rules over numeric results whose status is
+        automatic or unset (or every numeric result with override_manual,
+        which also makes their status automatic from then on). Automatic
+        statuses of results without a numeric value are cleared.
+
+        The table is walked in id order one chunk at a time, reading only
+        the columns the rules need; each chunk is classified in one
+        vectorized pass and written with one UPDATE ... WHERE id IN (...)
+        per resulting status, then committed. Returns counts of rows
+        scanned and updated."""
+        stats = {"scanned": 0, "updated": 0}
+        lab_rules.invalidate()
+        last_id = 0
+        while True:
+            query = select(
+                LaboratoryResult.id,
+                LaboratoryResult.test_name,
+                LaboratoryResult.unit_normalized,
+                LaboratoryResult.value_numeric,
+                LaboratoryResult.reference_low,
+                LaboratoryResult.reference_high,
+                LaboratoryResult.status,
+                LaboratoryResult.status_auto,
+            ).where(
+                LaboratoryResult.id > last_id,
+                # Automatic statuses of results with no numeric value (any
+                # longer) are cleared rather than left as they were
+                or_(
+                    LaboratoryResult.value_numeric.is_not(None),
+                    LaboratoryResult.status_auto.is_(True),
+                ),
+            )
+            if not override_manual:
+                query = query.where(
+                    or_(
+                        LaboratoryResult.status_auto.is_(True),
+                        LaboratoryResult.status.is_(None),
+                    )
+                )
+            rows = db.session.execute(
+                query.order_by(LaboratoryResult.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            ids, names, units, values, lows, highs, current, auto = zip(*rows)
+            classified = lab_rules.classify(
+                names,
+                units,
+                np.array(values, dtype=np.float64),
+                np.array(lows, dtype=np.float64),
+                np.array(highs, dtype=np.float64),
+            ).tolist()
+
+            # Group ids by their new status; rows already automatic with the
+            # same status are left alone
+            changes: Dict[Optional[str], list] = {}
+            for row_id, status, old_status, is_auto in zip(
+                ids, classified, current, auto
+            ):
+                new_status = status or None
+                if not is_auto or new_status != (old_status and old_status.value):
+                    changes.setdefault(new_status, []).append(row_id)
+
+            for status, changed_ids in changes.items():
+                db.session.execute(
+                    update(LaboratoryResult)
+                    .where(LaboratoryResult.id.in_(changed_ids))
+                    .values(
+                        status=LabResultStatusEnum(status) if status else None,
+                        status_auto=True,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                stats["updated"] += len(changed_ids)
+            db.session.commit()
+            stats["scanned"] += len(rows)
+        return stats
+
+    @staticmethod
+    def get_trend(patient_id: int, test_name: str, window: int = 3) -> Dict:
+        """Numeric series of one test for a patient, oldest first, with
+        per-point deltas, a rolling mean over `window` points and
+        out-of-range flags, plus summary statistics. Results whose text is
+        not numeric are left out and counted in "skipped"."""
+        rows = db.session.execute(
+            select(
+                LaboratoryResult.date,
+                LaboratoryResult.value_numeric,
+                LaboratoryResult.reference_low,
+                LaboratoryResult.reference_high,
+                LaboratoryResult.unit_normalized,
+            )
+            .where(
+                LaboratoryResult.patient_id == patient_id,
+                LaboratoryResult.test_name == test_name,
+            )
+            .order_by(LaboratoryResult.date, LaboratoryResult.id)
+        ).all()
+
+        numeric = [row for row in rows if row.value_numeric is not None]
+        trend = {
+            "patient_id": patient_id,
+            "test_name": test_name,
+            "units": sorted(
+                {row.unit_normalized for row in numeric if row.unit_normalized}
+            ),
+            "skipped": len(rows) - len(numeric),
+            "points": [],
+            "summary": None,
+        }
+        if not numeric:
+            return trend
+
+        dates = [row.date for row in numeric]
+        values = np.fromiter((row.value_numeric for row in numeric), dtype=np.float64)
+        low = np.array([row.reference_low for row in numeric], dtype=np.float64)
+        high = np.array([row.reference_high for row in numeric], dtype=np.float64)
+        days = np.array([(d - dates[0]).total_seconds() / 86400 for d in dates])
+
+        deltas = np.diff(values, prepend=np.nan)
+        window = max(1, window)
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        index = np.arange(1, len(values) + 1)
+        start = np.maximum(index - window, 0)
+        rolling_mean = (cumulative[index] - cumulative[start]) / (index - start)
+        # Missing bounds (NaN) never flag: comparisons with NaN are False
+        below = values < low
+        above = values > high
+
+        # Convert once to Python lists rather than per element; NaN (the only
+        # value not equal to itself) becomes None
+        flags = np.where(below, "LOW", np.where(above, "HIGH", "")).tolist()
+        trend["points"] = [
+            {
+                "date": date.isoformat(),
+                "value": value,
+                "delta": None if delta != delta else delta,
+                "rolling_mean": mean,
+                "reference_low": None if bound_low != bound_low else bound_low,
+                "reference_high": None if bound_high != bound_high else bound_high,
+                "flag": flag or None,
+            }
+            for date, value, delta, mean, bound_low, bound_high, flag in zip(
+                dates,
+                values.tolist(),
+                deltas.tolist(),
+                rolling_mean.tolist(),
+                low.tolist(),
+                high.tolist(),
+                flags,
+            )
+        ]
+
+        slope = None
+        if len(values) > 1 and days[-1] > days[0]:
+            slope = float(np.polyfit(days, values, 1)[0])
+        trend["summary"] = {
+            "count": int(values.size),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "mean": float(values.mean()),
+            "latest": float(values[-1]),
+            "change": float(values[-1] - values[0]),
+            "slope_per_day": slope,
+            "out_of_range": int(np.count_nonzero(below | above)),
+        }
+        return trend
+
+
+def _parse_fields(mapper, connection, target):
+    for column, value in parse_lab_fields(
+        target.result, target.reference_range, target.unit
+    ).items():
+        setattr(target, column, value)
+
+
+def _classify_status(mapper, connection, target):
+    # Runs after _parse_fields, so the typed columns are current
+    if target.status_auto:
+        status = lab_rules.classify_one(
+            target.test_name,
+            target.unit_normalized,
+            target.value_numeric,
+            target.reference_low,
+            target.reference_high,
+            connection,
+        )
+        target.status = LabResultStatusEnum(status) if status else None
+
+
+def _invalidate_rules(mapper, connection, target):
+    lab_rules.invalidate()
+
+
+def register_lab_events():
+    """Parse lab result text into typed columns and classify automatic
+    statuses on every insert/update; reload the rules when one is saved
+    (idempotent)."""
+    if not event.contains(LaboratoryResult, "before_insert", _parse_fields):
+        for name in ("before_insert", "before_update"):
+            event.listen(LaboratoryResult, name, _parse_fields)
+            event.listen(LaboratoryResult, name, _classify_status)
+        for name in ("after_insert", "after_update", "after_delete"):
+            event.listen(LabStatusRule, name, _invalidate_rules)
@@ -3,7 +3,8 @@ Patient service layer for handling patient-related business logic.
 """
 
 from datetime import datetime
-from typing import Tuple, List, Optional
+from typing import Dict, Mapping, Tuple, List, Optional
+from sqlalchemy import func
 from models import (
     db,
     Patient,
@@ -12,9 +13,22 @@ from models import (
     GenderEnum,
     AlcoholConsumptionEnum,
     DrugUseEnum,
+    Appointment,
+    LaboratoryResult,
+    RadiologyImaging,
+    MedicalHistory,
+    Allergy,
 )
 from flask import request, current_app
 
+# Attribute name set on each patient -> model whose rows are counted per patient
+RECORD_COUNT_MODELS = {
+    "appointment_count": Appointment,
+    "lab_result_count": LaboratoryResult,
+    "radiology_result_count": RadiologyImaging,
+    "medical_history_count": MedicalHistory,
+}
+
 
 class PatientService:
     """Service class for patient-related operations."""
@@ -24,24 +38,127 @@ class PatientService:
         """Find patient by ID and doctor ID."""
         return Patient.query.filter_by(id=patient_id, doctor_id=doctor_id).first()
 
+    @staticmethod
+    def get_selected_patient(patient_id, doctor_id: int) -> Optional[Patient]:
+        """Resolve a patient_id from a form or query string to the doctor's
+        patient, or None if it is missing or invalid. Forms show only this
+        patient and look others up through the typeahead endpoint."""
+        try:
+            return PatientService.find_patient_by_id(int(patient_id), doctor_id)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def get_record_counts(patient_ids: List[int]) -> Dict[int, Dict[str, int]]:
+        """Count related records for many patients in a single query.
+        Return {patient_id: {"appointment_count": n, ...}}."""
+        if not patient_ids:
+            return {}
+
+        # One grouped subquery per related table, outer-joined onto patient
+        subqueries = {
+            attr: db.session.query(
+                model.patient_id.label("patient_id"),
+                func.count(model.id).label("record_count"),
+            )
+            .filter(model.patient_id.in_(patient_ids))
+            .group_by(model.patient_id)
+            .subquery()
+            for attr, model in RECORD_COUNT_MODELS.items()
+        }
+
+        query = db.session.query(
+            Patient.id,
+            *[
+                func.coalesce(sq.c.record_count, 0).label(attr)
+                for attr, sq in subqueries.items()
+            ],
+        )
+        for sq in subqueries.values():
+            query = query.outerjoin(sq, sq.c.patient_id == Patient.id)
+
+        rows = query.filter(Patient.id.in_(patient_ids)).all()
+        return {
+            row.id: {attr: getattr(row, attr) for attr in RECORD_COUNT_MODELS}
+            for row in rows
+        }
+
+    @staticmethod
+    def get_recent_medical_histories(
+        patient_ids: List[int], limit: int = 3
+    ) -> Dict[int, List[Tuple[MedicalHistory, Allergy]]]:
+        """Fetch the latest `limit` medical histories (with allergy) per patient
+        using a single ROW_NUMBER() window query."""
+        if not patient_ids:
+            return {}
+
+        ranked = (
+            db.session.query(
+                MedicalHistory.id.label("history_id"),
+                func.row_number()
+                .over(
+                    partition_by=MedicalHistory.patient_id,
+                    order_by=(MedicalHistory.date.desc(), MedicalHistory.id.desc()),
+                )
+                .label("row_number"),
+            )
+            .filter(MedicalHistory.patient_id.in_(patient_ids))
+            .subquery()
+        )
+
+        rows = (
+            db.session.query(MedicalHistory, Allergy)
+            .join(ranked, ranked.c.history_id == MedicalHistory.id)
+            .join(Allergy, MedicalHistory.allergy_id == Allergy.id)
+            .filter(ranked.c.row_number <= limit)
+            .order_by(MedicalHistory.patient_id, MedicalHistory.date.desc())
+            .all()
+        )
+
+        histories = {patient_id: [] for patient_id in patient_ids}
+        for history, allergy in rows:
+            histories[history.patient_id].append((history, allergy))
+        return histories
+
+    @staticmethod
+    def attach_record_summaries(patients: List[Patient]) -> List[Patient]:
+        """Set record counts and recent medical histories on each patient.
+        Runs a constant number of queries regardless of how many patients."""
+        patient_ids = [p.id for p in patients]
+        counts = PatientService.get_record_counts(patient_ids)
+        histories = PatientService.get_recent_medical_histories(patient_ids)
+
+        for patient in patients:
+            patient_counts = counts.get(patient.id, {})
+            for attr in RECORD_COUNT_MODELS:
+                setattr(patient, attr, patient_counts.get(attr, 0))
+            patient.recent_medical_histories = histories.get(patient.id, [])
+        return patients
+
     @staticmethod
     def parse_patient_form() -> Tuple[dict, List[str]]:
         """Parse and validate patient form data. Returns (data_dict, errors_list)."""
-        first_name = request.form.get("first_name", "").strip().capitalize()
-        last_name = request.form.get("last_name", "").strip().capitalize()
-        email = request.form.get("email", "").strip().lower()
-        age = request.form.get("age", "").strip()
-        gender = request.form.get("gender", "").strip().lower()
-        date_of_birth = request.form.get("date_of_birth", "").strip()
-        phone_number = request.form.get("phone_number", "").strip()
-        address = request.form.get("address", "").strip()
-        emergency_contact = request.form.get("emergency_contact", "").strip()
-        smoking_status = request.form.get("smoking_status") is not None
-        alcohol_use = request.form.get("alcohol_use", "").strip()
-        drug_use = request.form.get("drug_use", "").strip()
+        return PatientService.parse_patient_data(request.form)
+
+    @staticmethod
+    def parse_patient_data(form: Mapping[str, str]) -> Tuple[dict, List[str]]:
+        """Parse and validate patient fields given as form-style strings (a
+        present smoking_status means yes). Returns (data_dict, errors_list)."""
+        first_name = form.get("first_name", "").strip().capitalize()
+        last_name = form.get("last_name", "").strip().capitalize()
+        email = form.get("email", "").strip().lower()
+        age = form.get("age", "").strip()
+        gender = form.get("gender", "").strip().lower()
+        date_of_birth = form.get("date_of_birth", "").strip()
+        phone_number = form.get("phone_number", "").strip()
+        address = form.get("address", "").strip()
+        emergency_contact = form.get("emergency_contact", "").strip()
+        smoking_status = form.get("smoking_status") is not None
+        alcohol_use = form.get("alcohol_use", "").strip()
+        drug_use = form.get("drug_use", "").strip()
         occupation = (
-            request.form.get("occupation", "").strip().capitalize()
-            if request.form.get("occupation")
+            form.get("occupation", "").strip().capitalize()
+            if form.get("occupation")
             else ""
         )
 
@@ -101,42 +218,9 @@ class PatientService:
 
         try:
             if not patient:
-                # Create new patient
-                patient = Patient(
-                    first_name=data["first_name"].capitalize(),
-                    last_name=data["last_name"].capitalize(),
-                    email=data["email"].lower() if data["email"] else None,
-                    age=data["age"],
-                    gender=data["gender"],
-                    date_of_birth=data["date_of_birth"],
-                    doctor_id=doctor_id,
-                )
+                patient = Patient(doctor_id=doctor_id)
                 db.session.add(patient)
-                db.session.commit()  # commit first to get patient.id
-            else:
-                # Update existing patient
-                patient.first_name = data["first_name"].capitalize()
-                patient.last_name = data["last_name"].capitalize()
-                patient.email = data["email"].lower() if data["email"] else None
-                patient.age = data["age"]
-                patient.gender = data["gender"]
-                patient.date_of_birth = data["date_of_birth"]
-
-            # Save demographics & social history
-            PatientService.save_demographics(
-                patient,
-                data["phone_number"],
-                data["address"],
-                data["emergency_contact"],
-            )
-            PatientService.save_social_history(
-                patient,
-                data["smoking_status"],
-                data["alcohol_use"],
-                data["drug_use"],
-                data["occupation"],
-            )
-
+            PatientService.apply_patient_data(patient, data)
             db.session.commit()
             return patient, []
 
@@ -144,6 +228,32 @@ class PatientService:
             db.session.rollback()
             return None, [str(e)]
 
+    @staticmethod
+    def apply_patient_data(patient: Patient, data: dict):
+        """Copy parsed patient data onto a new or existing patient, including
+        demographics and social history. Nothing is flushed; a new patient's
+        related rows get its id through the relationships at flush time."""
+        patient.first_name = data["first_name"].capitalize()
+        patient.last_name = data["last_name"].capitalize()
+        patient.email = data["email"].lower() if data["email"] else None
+        patient.age = data["age"]
+        patient.gender = data["gender"]
+        patient.date_of_birth = data["date_of_birth"]
+
+        PatientService.save_demographics(
+            patient,
+            data["phone_number"],
+            data["address"],
+            data["emergency_contact"],
+        )
+        PatientService.save_social_history(
+            patient,
+            data["smoking_status"],
+            data["alcohol_use"],
+            data["drug_use"],
+            data["occupation"],
+        )
+
     @staticmethod
     def save_demographics(
         patient: Patient, phone_number: str, address: str, emergency_contact: str
@@ -0,0 +1,268 @@
+"""
+Patient transfer service for bulk import and streaming export.
+
+Imports read CSV (header row) or NDJSON (one JSON object per line) files
+line by line, validate each row with the same rules as the patient form and
+build Patient objects with their DemographicInfo and SocialHistory rows.
+Each batch is added to the session and written with a single flush, which
+lets SQLAlchemy insert the batch's rows table by table instead of patient by
+patient, then committed. Rows that fail validation, or match a patient the
+doctor already has (same name and birth date), go to a rejected-rows report.
+
+Exports select plain columns (no ORM objects in the identity map) in keyset
+batches by patient id, one query per batch, so a practice of any size is
+written out in constant memory as it is sent, whether or not the driver
+has server-side cursors.
+"""
+
+import csv
+import io
+import json
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from sqlalchemy import select
+
+from models import db, DemographicInfo, Patient, SocialHistory
+from services.dashboard_service import DashboardService
+from services.patient_service import PatientService
+from utils.patient_index import normalize
+
+# Columns of the import/export formats, in export order (id is export only)
+FIELDS = (
+    "first_name",
+    "last_name",
+    "email",
+    "age",
+    "gender",
+    "date_of_birth",
+    "phone_number",
+    "address",
+    "emergency_contact",
+    "smoking_status",
+    "alcohol_use",
+    "drug_use",
+    "occupation",
+)
+
+_TRUE = {"1", "true", "yes", "y", "on"}
+
+
+def _read_csv(lines: Iterable[str]) -> Iterator[tuple]:
+    reader = csv.DictReader(lines)
+    if reader.fieldnames:
+        reader.fieldnames = [
+            "_".join(n.strip().lower().split()) for n in reader.fieldnames
+        ]
+    for row in reader:
+        if any((value or "").strip() for value in row.values()):
+            yield reader.line_num, row, list(row.values())
+
+
+def _read_ndjson(lines: Iterable[str]) -> Iterator[tuple]:
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        if not isinstance(row, dict):
+            yield line_number, None, [line.strip()]
+            continue
+        yield line_number, row, [line.strip()]
+
+
+def read_patient_rows(lines: Iterable[str], file_format: Optional[str] = None):
+    """Yield (line number, row dict or None if unreadable, raw record),
+    detecting NDJSON from a first line starting with "{"."""
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+    first = first.lstrip("\ufeff")
+    file_format = file_format or ("ndjson" if first.lstrip().startswith("{") else "csv")
+
+    def rest():
+        yield first
+        yield from lines
+
+    reader = _read_ndjson if file_format == "ndjson" else _read_csv
+    yield from reader(rest())
+
+
+def _form_values(row: Dict) -> Dict[str, str]:
+    """A file row as the form-style strings parse_patient_data expects."""
+    form = {}
+    for name in FIELDS:
+        value = row.get(name)
+        if value is None or value == "":
+            continue
+        if name == "smoking_status":
+            # A checkbox: present means yes
+            if value is True or str(value).strip().lower() in _TRUE:
+                form[name] = "on"
+            continue
+        form[name] = str(value)
+    return form
+
+
+class PatientTransferService:
+    """Service class for bulk patient import and export."""
+
+    @staticmethod
+    def existing_keys(doctor_id: int) -> set:
+        """(last name, first name, birth date) keys of the doctor's patients."""
+        rows = db.session.execute(
+            select(Patient.last_name, Patient.first_name, Patient.date_of_birth).where(
+                Patient.doctor_id == doctor_id
+            )
+        )
+        return {
+            (normalize(last_name), normalize(first_name), date_of_birth)
+            for last_name, first_name, date_of_birth in rows
+        }
+
+    @staticmethod
+    def import_lines(
+        lines: Iterable[str],
+        doctor_id: int,
+        batch_size: int = 500,
+        rejects: Optional[TextIO] = None,
+        file_format: Optional[str] = None,
+    ) -> Dict:
+        """Create patients for doctor_id from a CSV or NDJSON file given as
+        text lines. Rejected rows are written as CSV (line, reason, original
+        record) to rejects. Returns counts and timing."""
+        started = time.perf_counter()
+        known = PatientTransferService.existing_keys(doctor_id)
+        report = csv.writer(rejects) if rejects is not None else None
+        stats = {"read": 0, "imported": 0, "rejected": 0, "batches": 0}
+        batch: List[Patient] = []
+
+        def reject(line_number, reason, raw):
+            stats["rejected"] += 1
+            if report is not None:
+                if stats["rejected"] == 1:
+                    report.writerow(["line", "reason", "record"])
+                report.writerow([line_number, reason, *raw])
+
+        def flush():
+            db.session.add_all(batch)
+            db.session.flush()
+            db.session.commit()
+            # Drop the committed objects (and, by cascade, their demographics
+            # and social history) so memory stays flat across batches
+            for patient in batch:
+                db.session.expunge(patient)
+            stats["imported"] += len(batch)
+            stats["batches"] += 1
+            batch.clear()
+
+        for line_number, row, raw in read_patient_rows(lines, file_format):
+            stats["read"] += 1
+            if row is None:
+                reject(line_number, "not a JSON object", raw)
+                continue
+            try:
+                data, errors = PatientService.parse_patient_data(_form_values(row))
+            except ValueError as e:
+                data, errors = None, [str(e)]
+            if errors:
+                reject(line_number, "; ".join(errors), raw)
+                continue
+            key = (
+                normalize(data["last_name"]),
+                normalize(data["first_name"]),
+                data["date_of_birth"],
+            )
+            if key in known:
+                reject(line_number, "patient already exists", raw)
+                continue
+            known.add(key)
+
+            patient = Patient(doctor_id=doctor_id)
+            PatientService.apply_patient_data(patient, data)
+            batch.append(patient)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        DashboardService.invalidate(doctor_id)
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        stats["rows_per_second"] = (
+            round(stats["read"] / stats["seconds"]) if stats["seconds"] else 0
+        )
+        return stats
+
+    @staticmethod
+    def export_rows(doctor_id: int, batch_size: int = 1000) -> Iterator[Dict]:
+        """The doctor's patients with demographics and social history as
+        flat dicts in id order, fetched batch_size rows at a time."""
+        query = (
+            select(
+                Patient.id,
+                Patient.first_name,
+                Patient.last_name,
+                Patient.email,
+                Patient.age,
+                Patient.gender,
+                Patient.date_of_birth,
+                DemographicInfo.phone_number,
+                DemographicInfo.address,
+                DemographicInfo.emergency_contact,
+                SocialHistory.smoking_status,
+                SocialHistory.alcohol_use,
+                SocialHistory.drug_use,
+                SocialHistory.occupation,
+            )
+            .outerjoin(DemographicInfo, DemographicInfo.patient_id == Patient.id)
+            .outerjoin(SocialHistory, SocialHistory.patient_id == Patient.id)
+            .where(Patient.doctor_id == doctor_id)
+            .order_by(Patient.id)
+            .limit(batch_size)
+        )
+        last_id = 0
+        while True:
+            rows = db.session.execute(query.where(Patient.id > last_id)).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            for row in rows:
+                record = row._asdict()
+                for name in ("gender", "alcohol_use", "drug_use"):
+                    if record[name] is not None:
+                        record[name] = record[name].value
+                record["date_of_birth"] = record["date_of_birth"].isoformat()
+                record["smoking_status"] = bool(record["smoking_status"])
+                yield record
+
+    @staticmethod
+    def export_csv(rows: Iterable[Dict], chunk_rows: int = 500) -> Iterator[str]:
+        """CSV text for export rows, yielded in chunks of chunk_rows rows."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(("id",) + FIELDS)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(
+                [row["id"]]
+                + ["" if row[name] is None else row[name] for name in FIELDS]
+            )
+            if count % chunk_rows == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    @staticmethod
+    def export_ndjson(rows: Iterable[Dict], chunk_rows: int = 500) -> Iterator[str]:
+        """NDJSON text for export rows, yielded in chunks of chunk_rows rows."""
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(row, ensure_ascii=False) + "\n")
+            if len(lines) == chunk_rows:
+                yield "".join(lines)
+                lines.clear()
+        if lines:
+            yield "".join(lines)
@@ -0,0 +1,151 @@
+"""
+Reminder service for emailing patients about upcoming appointments.
+
+Due appointments are read in keyset pages along the appointment date index,
+each page is sent through the bulk email path, and its delivered reminders
+are recorded in appointment_reminder and committed before the next page is
+read, so the job can be re-run safely.
+"""
+
+from collections import defaultdict, deque
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import and_, exists, insert, select
+
+from models import (
+    db,
+    Appointment,
+    AppointmentReminder,
+    AppointmentStatusEnum,
+    Doctor,
+    Patient,
+)
+from utils.mail_helper import BulkSendReport, send_bulk_email
+from utils.pagination import KeysetSort
+
+REMINDER_SUBJECT = "Reminder: your upcoming VitalTrack appointment"
+REMINDER_TEMPLATE = "email/appointment_reminder.html"
+
+# Page order of due_appointments_query
+_ORDER = KeysetSort("date", (Appointment.date, Appointment.id))
+
+
+class ReminderService:
+    """Service class for appointment reminder operations."""
+
+    @staticmethod
+    def due_appointments_query(day: date):
+        """Scheduled appointments on `day` for patients with an email address
+        that have not been reminded for that date yet. Selects plain columns
+        so paging does not build ORM objects."""
+        start = datetime.combine(day, time.min)
+        already_sent = exists().where(
+            and_(
+                AppointmentReminder.appointment_id == Appointment.id,
+                AppointmentReminder.appointment_date == Appointment.date,
+            )
+        )
+        return (
+            select(
+                Appointment.id,
+                Appointment.date,
+                Appointment.appointment_type,
+                Patient.first_name,
+                Patient.last_name,
+                Patient.email,
+                Doctor.last_name.label("doctor_last_name"),
+            )
+            .join(Patient, Appointment.patient_id == Patient.id)
+            .join(Doctor, Appointment.doctor_id == Doctor.id)
+            .where(
+                Appointment.date >= start,
+                Appointment.date < start + timedelta(days=1),
+                Appointment.status == AppointmentStatusEnum.SCHEDULED,
+                Patient.email.isnot(None),
+                Patient.email != "",
+                ~already_sent,
+            )
+            .order_by(Appointment.date, Appointment.id)
+        )
+
+    @staticmethod
+    def send_appointment_reminders(
+        day: Optional[date] = None, batch_size: Optional[int] = None
+    ) -> BulkSendReport:
+        """Email reminders for the scheduled appointments on `day` (default
+        tomorrow). Returns the combined report of all batches."""
+        day = day or date.today() + timedelta(days=1)
+        batch_size = batch_size or current_app.config["MAIL_BULK_BATCH_SIZE"]
+
+        total = BulkSendReport()
+        query = ReminderService.due_appointments_query(day).limit(batch_size)
+        last = None
+        try:
+            while True:
+                page = query if last is None else query.where(_ORDER.seek(last))
+                rows = db.session.execute(page).all()
+                if not rows:
+                    break
+                last = (rows[-1].date, rows[-1].id)
+                report = send_bulk_email(
+                    REMINDER_SUBJECT,
+                    REMINDER_TEMPLATE,
+                    [(row.email, ReminderService._context(row)) for row in rows],
+                    batch_size=batch_size,
+                )
+                ReminderService._record_sent(rows, report)
+                db.session.commit()
+                total.sent.extend(report.sent)
+                total.failed.extend(report.failed)
+                total.batches += report.batches
+                total.elapsed_seconds += report.elapsed_seconds
+        finally:
+            db.session.rollback()
+        return total
+
+    @staticmethod
+    def _context(row) -> dict:
+        appointment_type = row.appointment_type
+        return {
+            "first_name": row.first_name,
+            "last_name": row.last_name,
+            "doctor_last_name": row.doctor_last_name,
+            "date": row.date,
+            "appointment_type": (
+                appointment_type.value.replace("_", " ").title()
+                if appointment_type
+                else None
+            ),
+        }
+
+    @staticmethod
+    def _record_sent(rows, report: BulkSendReport):
+        """Insert reminder rows for the delivered messages of one page, in
+        the session; the caller commits them before reading the next page so
+        a crash mid-run does not lose what was already sent."""
+        if not report.sent:
+            return
+
+        # Messages go out in row order, so match sent recipients back in order.
+        # Two appointments sharing an address in one batch with only one of
+        # them delivered may be attributed to the earlier one.
+        pending = defaultdict(deque)
+        for row in rows:
+            pending[row.email].append(row)
+
+        now = datetime.utcnow()
+        values = []
+        for recipient in report.sent:
+            row = pending[recipient].popleft()
+            values.append(
+                {
+                    "appointment_id": row.id,
+                    "appointment_date": row.date,
+                    "recipient": recipient,
+                    "sent_at": now,
+                }
+            )
+
+        db.session.execute(insert(AppointmentReminder.__table__), values)
@@ -0,0 +1,351 @@
+"""
+Search service for full-text search across a doctor's records.
+
+Patients, lab results, medical history and radiology imaging each get one
+row in search_document, written by mapper events inside the same transaction
+as the record itself (documents for new records are inserted together at the
+end of each flush). MySQL searches it through a FULLTEXT index with
+MATCH ... AGAINST; SQLite (development and tests) mirrors it into an FTS5
+table maintained by triggers and ranks with bm25. Either way a search is one
+indexed lookup instead of leading-wildcard LIKE scans over every table.
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import (
+    DDL,
+    column,
+    delete,
+    event,
+    func,
+    insert,
+    literal,
+    literal_column,
+    select,
+    table,
+    text,
+    update,
+)
+from sqlalchemy.orm import Session, object_session
+
+from models import (
+    db,
+    Allergy,
+    LaboratoryResult,
+    MedicalHistory,
+    Patient,
+    RadiologyImaging,
+    SearchDocument,
+)
+
+_documents = SearchDocument.__table__
+
+# entity_type value -> label shown on the search page
+ENTITY_TYPES = {
+    "patient": "Patients",
+    "lab_result": "Lab results",
+    "medical_history": "Medical history",
+    "imaging": "Imaging",
+}
+
+MAX_TERMS = 10
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+# SQLite FTS5 index over search_document, kept in sync by triggers
+_SQLITE_FTS_DDL = [
+    DDL(statement).execute_if(dialect="sqlite")
+    for statement in (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_document_fts USING fts5("
+        "title, body, content='search_document', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS search_document_ai "
+        "AFTER INSERT ON search_document "
+        "BEGIN INSERT INTO search_document_fts(rowid, title, body) "
+        "VALUES (new.id, new.title, new.body); END",
+        "CREATE TRIGGER IF NOT EXISTS search_document_ad "
+        "AFTER DELETE ON search_document "
+        "BEGIN INSERT INTO search_document_fts(search_document_fts, rowid, title, body) "
+        "VALUES ('delete', old.id, old.title, old.body); END",
+        "CREATE TRIGGER IF NOT EXISTS search_document_au "
+        "AFTER UPDATE ON search_document "
+        "BEGIN INSERT INTO search_document_fts(search_document_fts, rowid, title, body) "
+        "VALUES ('delete', old.id, old.title, old.body); "
+        "INSERT INTO search_document_fts(rowid, title, body) "
+        "VALUES (new.id, new.title, new.body); END",
+    )
+]
+_SQLITE_FTS_DROP = DDL("DROP TABLE IF EXISTS search_document_fts").execute_if(
+    dialect="sqlite"
+)
+_fts = table("search_document_fts", column("rowid"))
+
+
+def _patient_document(connection, patient: Patient) -> Dict:
+    return {
+        "patient_id": patient.id,
+        "title": f"{patient.first_name} {patient.last_name}",
+        "body": patient.email or "",
+        "date": None,
+    }
+
+
+def _lab_result_document(connection, result: LaboratoryResult) -> Dict:
+    return {
+        "patient_id": result.patient_id,
+        "title": result.test_name,
+        "body": result.notes or "",
+        "date": result.date,
+    }
+
+
+def _medical_history_document(connection, history: MedicalHistory) -> Dict:
+    allergy = connection.scalar(
+        select(Allergy.name).where(Allergy.id == history.allergy_id)
+    )
+    return {
+        "patient_id": history.patient_id,
+        "title": allergy or "Medical history",
+        "body": history.description,
+        "date": history.date,
+    }
+
+
+def _imaging_document(connection, imaging: RadiologyImaging) -> Dict:
+    return {
+        "patient_id": imaging.patient_id,
+        "title": imaging.name,
+        "body": imaging.modality or "",
+        "date": imaging.date,
+    }
+
+
+# model -> (entity_type, builder returning the document's column values)
+_SOURCES = {
+    Patient: ("patient", _patient_document),
+    LaboratoryResult: ("lab_result", _lab_result_document),
+    MedicalHistory: ("medical_history", _medical_history_document),
+    RadiologyImaging: ("imaging", _imaging_document),
+}
+
+
+class SearchService:
+    """Service class for the full-text search index."""
+
+    @staticmethod
+    def document(connection, target) -> Dict:
+        """Column values of the search document for a record."""
+        entity_type, build = _SOURCES[type(target)]
+        values = build(connection, target)
+        values["title"] = (values["title"] or "")[:255]
+        values["updated_at"] = datetime.utcnow()
+        values["entity_type"] = entity_type
+        values["entity_id"] = target.id
+        return values
+
+    @staticmethod
+    def index(connection, target):
+        """Insert or refresh the search document for a record."""
+        values = SearchService.document(connection, target)
+        entity_type = values.pop("entity_type")
+        values.pop("entity_id")
+        result = connection.execute(
+            update(_documents)
+            .where(
+                _documents.c.entity_type == entity_type,
+                _documents.c.entity_id == target.id,
+            )
+            .values(**values)
+        )
+        if result.rowcount == 0:
+            connection.execute(
+                insert(_documents).values(
+                    entity_type=entity_type, entity_id=target.id, **values
+                )
+            )
+
+    @staticmethod
+    def remove(connection, target):
+        """Delete the search document for a record (and, for a patient, every
+        document belonging to them)."""
+        entity_type, _ = _SOURCES[type(target)]
+        if entity_type == "patient":
+            condition = _documents.c.patient_id == target.id
+        else:
+            condition = (_documents.c.entity_type == entity_type) & (
+                _documents.c.entity_id == target.id
+            )
+        connection.execute(delete(_documents).where(condition))
+
+    @staticmethod
+    def index_bulk_lab_results(connection, after_id: int) -> int:
+        """Index lab results written by a bulk INSERT (which skips mapper
+        events). Call it in the inserting transaction with the highest lab
+        result id that transaction read before inserting: its consistent
+        read of the ids above that returns its own rows and no other
+        writer's. Returns the number of documents written."""
+        results = LaboratoryResult.__table__
+        rows = connection.execute(
+            select(
+                results.c.id,
+                results.c.patient_id,
+                results.c.test_name,
+                results.c.notes,
+                results.c.date,
+            ).where(results.c.id > after_id)
+        ).all()
+        if rows:
+            now = datetime.utcnow()
+            connection.execute(
+                insert(_documents),
+                [
+                    {
+                        "entity_type": "lab_result",
+                        "entity_id": row.id,
+                        "patient_id": row.patient_id,
+                        "title": row.test_name,
+                        "body": row.notes or "",
+                        "date": row.date,
+                        "updated_at": now,
+                    }
+                    for row in rows
+                ],
+            )
+        return len(rows)
+
+    @staticmethod
+    def rebuild(batch_size: int = 500) -> Dict[str, int]:
+        """Re-index every searchable record, e.g. after a bulk import that
+        bypassed the ORM. Returns the number of documents per entity type."""
+        counts = {}
+        for model, (entity_type, _) in _SOURCES.items():
+            counts[entity_type] = 0
+            last_id = 0
+            while True:
+                batch = (
+                    model.query.filter(model.id > last_id)
+                    .order_by(model.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                connection = db.session.connection()
+                for record in batch:
+                    SearchService.index(connection, record)
+                counts[entity_type] += len(batch)
+                db.session.commit()
+                db.session.expunge_all()
+
+        if db.engine.dialect.name == "sqlite":
+            db.session.execute(
+                text(
+                    "INSERT INTO search_document_fts(search_document_fts) "
+                    "VALUES ('rebuild')"
+                )
+            )
+            db.session.commit()
+        return counts
+
+    @staticmethod
+    def terms(query_text: str) -> List[str]:
+        """Split user input into at most MAX_TERMS lowercase word tokens,
+        dropping any full-text operator characters."""
+        return [term.lower() for term in _TERM.findall(query_text or "")][:MAX_TERMS]
+
+    @staticmethod
+    def search(doctor_id: int, terms: List[str], entity_type: Optional[str] = None):
+        """Build a query over the doctor's search documents matching every
+        term (as a prefix). Returns (query, score) where query yields
+        (SearchDocument, Patient) rows and score is a relevance expression,
+        higher is better, for ordering."""
+        query = (
+            db.session.query(SearchDocument, Patient)
+            .join(Patient, SearchDocument.patient_id == Patient.id)
+            .filter(Patient.doctor_id == doctor_id)
+        )
+        if entity_type in ENTITY_TYPES:
+            query = query.filter(SearchDocument.entity_type == entity_type)
+
+        dialect = db.engine.dialect.name
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import match
+
+            score = match(
+                SearchDocument.title,
+                SearchDocument.body,
+                against=" ".join(f"+{term}*" for term in terms),
+            ).in_boolean_mode()
+            query = query.filter(score > 0)
+        elif dialect == "sqlite":
+            fts_query = " ".join(f'"{term}"*' for term in terms)
+            query = query.join(_fts, _fts.c.rowid == SearchDocument.id).filter(
+                text("search_document_fts MATCH :fts_query").bindparams(
+                    fts_query=fts_query
+                )
+            )
+            # bm25 is lower for better matches; titles weigh more than bodies
+            score = -func.bm25(literal_column("search_document_fts"), 5.0, 1.0)
+        else:
+            # No full-text index on other backends: substring match, unranked
+            for term in terms:
+                query = query.filter(
+                    SearchDocument.title.ilike(f"%{term}%")
+                    | SearchDocument.body.ilike(f"%{term}%")
+                )
+            score = literal(0)
+        return query, score
+
+
+_PENDING_KEY = "search_documents_pending"
+
+
+def _after_insert(mapper, connection, target):
+    # A new record has no document yet: queue it, and insert everything the
+    # flush created with one executemany statement in _after_flush
+    session = object_session(target)
+    if session is None:
+        SearchService.index(connection, target)
+        return
+    session.info.setdefault(_PENDING_KEY, []).append(
+        SearchService.document(connection, target)
+    )
+
+
+def _after_update(mapper, connection, target):
+    SearchService.index(connection, target)
+
+
+def _after_delete(mapper, connection, target):
+    SearchService.remove(connection, target)
+
+
+def _after_flush(session, flush_context):
+    documents = session.info.pop(_PENDING_KEY, None)
+    if documents:
+        session.connection().execute(insert(_documents), documents)
+
+
+def _after_rollback(session, previous_transaction):
+    # A failed flush leaves documents queued for rows that were never written
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_search_events():
+    """Attach index-maintenance listeners to the searchable models and the
+    SQLite FTS5 DDL to search_document (idempotent)."""
+    for model in _SOURCES:
+        if not event.contains(model, "after_insert", _after_insert):
+            event.listen(model, "after_insert", _after_insert)
+            event.listen(model, "after_update", _after_update)
+            event.listen(model, "after_delete", _after_delete)
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "after_soft_rollback", _after_rollback)
+
+    if not event.contains(_documents, "before_drop", _SQLITE_FTS_DROP):
+        for ddl in _SQLITE_FTS_DDL:
+            event.listen(_documents, "after_create", ddl)
+        event.listen(_documents, "before_drop", _SQLITE_FTS_DROP)
@@ -0,0 +1,137 @@
+"""
+Statistics service for the list pages of the EHR system.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import case, exists, func
+from models import (
+    db,
+    Patient,
+    Appointment,
+    LaboratoryResult,
+    MedicalHistory,
+    GenderEnum,
+    AppointmentStatusEnum,
+)
+
+# Age bucket label -> inclusive upper bound in whole years (None = no bound)
+AGE_GROUPS = {"0-18": 18, "19-35": 35, "36-50": 50, "51-65": 65, "65+": None}
+
+
+class StatsService:
+    """Service class computing list statistics with SQL aggregates."""
+
+    @staticmethod
+    def _count_if(condition):
+        """SUM(CASE WHEN condition THEN 1 ELSE 0 END)."""
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    @staticmethod
+    def appointment_stats(doctor_id: int, now: Optional[datetime] = None) -> dict:
+        """Count a doctor's appointments by status and upcoming in one query."""
+        now = now or datetime.now()
+        count_if = StatsService._count_if
+        row = (
+            db.session.query(
+                func.count(Appointment.id).label("total"),
+                count_if(Appointment.date > now).label("upcoming"),
+                *[
+                    count_if(Appointment.status == status).label(status.value)
+                    for status in AppointmentStatusEnum
+                ],
+            )
+            .filter(Appointment.doctor_id == doctor_id)
+            .one()
+        )
+
+        return {
+            "total_appointments": row.total,
+            "upcoming_appointments": row.upcoming,
+            "completed_appointments": row.completed,
+            "scheduled_appointments": row.scheduled,
+            "cancelled_appointments": row.cancelled,
+            "no_show_appointments": row.no_show,
+        }
+
+    @staticmethod
+    def lab_result_stats(doctor_id: int, now: Optional[datetime] = None) -> dict:
+        """Count a doctor's lab results, recent results and test types with a
+        single query grouped by test name."""
+        now = now or datetime.now()
+        # Matches the previous "(now - date).days <= 7" check
+        recent_since = now - timedelta(days=8)
+        rows = (
+            db.session.query(
+                LaboratoryResult.test_name,
+                func.count(LaboratoryResult.id).label("total"),
+                StatsService._count_if(LaboratoryResult.date > recent_since).label(
+                    "recent"
+                ),
+            )
+            .join(Patient, LaboratoryResult.patient_id == Patient.id)
+            .filter(Patient.doctor_id == doctor_id)
+            .group_by(LaboratoryResult.test_name)
+            .order_by(LaboratoryResult.test_name)
+            .all()
+        )
+
+        test_types = [row.test_name for row in rows]
+        return {
+            "total_results": sum(row.total for row in rows),
+            "recent_results": sum(row.recent for row in rows),
+            "test_types_count": len(test_types),
+            "test_types": test_types,
+        }
+
+    @staticmethod
+    def _age_group_expression(today: date):
+        """CASE expression mapping date_of_birth to an AGE_GROUPS label.
+        Bounds are turned into birth-date cutoffs so no date math runs per row."""
+        whens = []
+        label = None
+        for label, upper in AGE_GROUPS.items():
+            if upper is None:
+                break
+            # (today - dob).days // 365 <= upper  <=>  dob > today - (upper+1)*365d
+            cutoff = today - timedelta(days=(upper + 1) * 365)
+            whens.append((Patient.date_of_birth > cutoff, label))
+        return case(*whens, else_=label)
+
+    @staticmethod
+    def patient_stats(doctor_id: int, today: Optional[date] = None) -> dict:
+        """Count a doctor's patients by gender and age group, and how many have
+        a medical history, with a single grouped query."""
+        today = today or date.today()
+        age_group = StatsService._age_group_expression(today).label("age_group")
+        has_history = exists().where(MedicalHistory.patient_id == Patient.id)
+
+        rows = (
+            db.session.query(
+                Patient.gender,
+                age_group,
+                func.count(Patient.id).label("total"),
+                StatsService._count_if(has_history).label("with_history"),
+            )
+            .filter(Patient.doctor_id == doctor_id)
+            .group_by(Patient.gender, age_group)
+            .all()
+        )
+
+        by_gender: Dict[GenderEnum, int] = {gender: 0 for gender in GenderEnum}
+        age_groups = {label: 0 for label in AGE_GROUPS}
+        for row in rows:
+            by_gender[row.gender] = by_gender.get(row.gender, 0) + row.total
+            age_groups[row.age_group] += row.total
+
+        total_patients = sum(row.total for row in rows)
+        male_patients = by_gender[GenderEnum.MALE]
+        female_patients = by_gender[GenderEnum.FEMALE]
+        return {
+            "total_patients": total_patients,
+            "male_patients": male_patients,
+            "female_patients": female_patients,
+            "other_patients": total_patients - male_patients - female_patients,
+            "age_groups": age_groups,
+            "patients_with_history": sum(row.with_history for row in rows),
+        }
@@ -0,0 +1,45 @@
+"""
+Content-addressed storage layout for radiology files.
+
+Each distinct file is stored once under UPLOAD_FOLDER/blobs/<ab>/<sha256>,
+where <ab> is the first two hex digits of its SHA-256. Records keep a logical
+image_filename of the form patient_<id>/<sha256>.<ext>: the patient folder is
+still used for access checks and the extension for the content type, while
+the hash locates the shared blob. Files uploaded before the blob store keep
+their original patient_<id>/<uuid>.<ext> paths until migrated.
+"""
+
+import os
+import re
+from typing import Optional
+
+from flask import current_app
+from werkzeug.security import safe_join
+
+BLOB_DIR = "blobs"
+
+_HASHED_NAME = re.compile(r"^patient_\d+/([0-9a-f]{64})\.[A-Za-z0-9]+$")
+
+
+def content_hash(image_filename: str) -> Optional[str]:
+    """SHA-256 encoded in a blob-backed image_filename, None for legacy names."""
+    match = _HASHED_NAME.match(image_filename or "")
+    return match.group(1) if match else None
+
+
+def hashed_filename(patient_id: int, sha256: str, extension: str) -> str:
+    return f"patient_{patient_id}/{sha256}.{extension.lower()}"
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(
+        current_app.config["UPLOAD_FOLDER"], BLOB_DIR, sha256[:2], sha256
+    )
+
+
+def image_path(image_filename: str) -> Optional[str]:
+    """Filesystem path of an image, or None if the name is not a safe path."""
+    sha256 = content_hash(image_filename)
+    if sha256:
+        return blob_path(sha256)
+    return safe_join(current_app.config["UPLOAD_FOLDER"], image_filename)
@@ -0,0 +1,191 @@
+"""
+Caching utilities for the EHR system.
+
+`cache` is a small pluggable key/value cache with hit/miss counters. The
+backend is chosen by CACHE_BACKEND:
+
+- "memory" (default): per-process LRU with TTL expiry
+- "redis": a local Redis-compatible server at CACHE_REDIS_URL, shared by
+  all worker processes (requires the optional `redis` package)
+- "null": caching disabled, every lookup is a miss
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+class NullCacheBackend:
+    """Backend that stores nothing."""
+
+    def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, key: str, value: Any, ttl: int):
+        pass
+
+    def delete(self, key: str):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class MemoryCacheBackend:
+    """Thread-safe in-process LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Backend storing pickled values in a Redis-compatible server."""
+
+    def __init__(self, url: str, prefix: str = "vitaltrack:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "CACHE_BACKEND=redis requires the 'redis' package (pip install redis)"
+            ) from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: int):
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+
+    def delete(self, key: str):
+        self._client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*"))
+
+
+class Cache:
+    """Cache front-end that counts hits, misses and invalidations."""
+
+    def __init__(self):
+        self.backend = NullCacheBackend()
+        self.default_ttl = 60
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def init_app(self, app):
+        backend = app.config.get("CACHE_BACKEND", "memory")
+        self.default_ttl = app.config.get("CACHE_DEFAULT_TTL", 60)
+
+        if backend == "memory":
+            self.backend = MemoryCacheBackend(app.config.get("CACHE_MAX_ENTRIES", 1024))
+        elif backend == "redis":
+            self.backend = RedisCacheBackend(app.config["CACHE_REDIS_URL"])
+        elif backend == "null":
+            self.backend = NullCacheBackend()
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"Cache get failed for {key}: {e}")
+            value = None
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        try:
+            self.backend.set(key, value, ttl or self.default_ttl)
+        except Exception as e:
+            print(f"Cache set failed for {key}: {e}")
+
+    def get_or_set(
+        self, key: str, loader: Callable[[], Any], ttl: Optional[int] = None
+    ):
+        """Return the cached value for key, calling loader() to fill it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            print(f"Cache delete failed for {key}: {e}")
+        self._count("invalidations")
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get_stats(self) -> dict:
+        """Counters for this process plus the backend's current entry count."""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        try:
+            stats["entries"] = len(self.backend)
+        except Exception:
+            stats["entries"] = None
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+
+cache = Cache()
+
+
+def init_cache(app):
+    cache.init_app(app)
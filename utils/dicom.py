@@ -0,0 +1,172 @@
+"""
+DICOM helpers for radiology ingestion.
+
+The header is parsed once with pixel data deferred, so only the metadata is
+read into memory. For uncompressed transfer syntaxes the pixel data is then
+memory-mapped straight from the file with NumPy and decimated to roughly the
+preview size before windowing, so a large study is never loaded whole.
+Compressed syntaxes fall back to pydicom's decoders.
+
+pydicom and numpy are optional: without them DICOM uploads are stored and
+served as before, but get no metadata or preview.
+"""
+
+from typing import Optional, Tuple
+
+DICOM_MAGIC = b"DICM"
+
+# Common modality codes offered in the radiology search filter
+DICOM_MODALITIES = {
+    "CR": "Computed Radiography",
+    "CT": "Computed Tomography",
+    "DX": "Digital Radiography",
+    "MG": "Mammography",
+    "MR": "Magnetic Resonance",
+    "NM": "Nuclear Medicine",
+    "PT": "PET",
+    "RF": "Radio Fluoroscopy",
+    "US": "Ultrasound",
+    "XA": "X-Ray Angiography",
+    "OT": "Other",
+}
+
+# RadiologyImaging columns filled from the header by read_dicom; NULL for
+# every other format
+DICOM_COLUMNS = (
+    "modality",
+    "study_instance_uid",
+    "series_instance_uid",
+    "image_rows",
+    "image_columns",
+)
+
+# Transfer syntaxes whose pixel data is stored as raw little/big endian words
+_UNCOMPRESSED_SYNTAXES = {
+    "1.2.840.10008.1.2": "<",  # Implicit VR Little Endian
+    "1.2.840.10008.1.2.1": "<",  # Explicit VR Little Endian
+    "1.2.840.10008.1.2.2": ">",  # Explicit VR Big Endian (retired)
+}
+
+_PIXEL_DATA_TAG = 0x7FE00010
+
+
+def is_dicom(path: str) -> bool:
+    """True if the file has the DICOM Part 10 preamble marker."""
+    try:
+        with open(path, "rb") as handle:
+            handle.seek(128)
+            return handle.read(4) == DICOM_MAGIC
+    except OSError:
+        return False
+
+
+def _imports():
+    try:
+        import numpy
+        import pydicom
+    except ImportError as e:
+        raise RuntimeError(
+            "DICOM support requires the 'pydicom' and 'numpy' packages "
+            "(pip install pydicom numpy)"
+        ) from e
+    return numpy, pydicom
+
+
+def _first(value, default=None):
+    """First value of a possibly multi-valued DICOM element."""
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except TypeError:
+        pass
+    except ValueError:
+        return default
+    try:
+        return float(value[0])
+    except (TypeError, ValueError, IndexError):
+        return default
+
+
+def _read_frame(path: str, ds, max_edge: int):
+    """First frame as a NumPy array, memory-mapped and decimated when the
+    pixel data is uncompressed."""
+    numpy, _ = _imports()
+    rows, columns = int(ds.Rows), int(ds.Columns)
+    samples = int(ds.get("SamplesPerPixel", 1))
+    step = max(1, max(rows, columns) // (max_edge * 2))
+
+    transfer_syntax = str(ds.file_meta.get("TransferSyntaxUID", ""))
+    pixel_element = ds.get_item(_PIXEL_DATA_TAG)
+    byte_order = _UNCOMPRESSED_SYNTAXES.get(transfer_syntax)
+    offset = getattr(pixel_element, "value_tell", None)
+
+    if byte_order and offset is not None and int(ds.BitsAllocated) in (8, 16, 32):
+        kind = "i" if int(ds.get("PixelRepresentation", 0)) else "u"
+        dtype = numpy.dtype(f"{byte_order}{kind}{int(ds.BitsAllocated) // 8}")
+        if samples == 1:
+            shape = (rows, columns)
+        elif int(ds.get("PlanarConfiguration", 0)) == 0:
+            shape = (rows, columns, samples)
+        else:
+            shape = (samples, rows, columns)
+        frame = numpy.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+        if samples > 1 and shape[0] == samples:
+            frame = numpy.moveaxis(frame, 0, -1)
+    else:
+        pixels = ds.pixel_array
+        frame = pixels[0] if int(ds.get("NumberOfFrames", 1)) > 1 else pixels
+
+    # Only the decimated rows/columns are paged in from the memory map
+    return numpy.ascontiguousarray(frame[::step, ::step])
+
+
+def window_level(
+    pixels, center: Optional[float], width: Optional[float], invert: bool = False
+):
+    """Map stored values to 8 bits with the DICOM linear VOI LUT function,
+    vectorized over the whole frame. Without a window in the header the
+    0.5-99.5 percentile range of the image is used."""
+    numpy, _ = _imports()
+    values = pixels.astype(numpy.float32, copy=False)
+    if not width or width < 1:
+        low, high = numpy.percentile(values, (0.5, 99.5))
+        center, width = (low + high) / 2, max(high - low, 1.0)
+
+    scaled = ((values - (center - 0.5)) / (width - 1) + 0.5) * 255.0
+    numpy.clip(scaled, 0, 255, out=scaled)
+    result = scaled.astype(numpy.uint8)
+    return 255 - result if invert else result
+
+
+def read_dicom(path: str, max_edge: int) -> Tuple[dict, object]:
+    """Parse a DICOM file. Returns (metadata, 8-bit pixel array no larger
+    than about twice max_edge on its longest side)."""
+    numpy, pydicom = _imports()
+    ds = pydicom.dcmread(path, defer_size="1 KB")
+
+    metadata = {
+        "modality": str(ds.get("Modality", "")).strip()[:16] or None,
+        "study_instance_uid": str(ds.get("StudyInstanceUID", "")).strip() or None,
+        "series_instance_uid": str(ds.get("SeriesInstanceUID", "")).strip() or None,
+        "image_rows": int(ds.Rows),
+        "image_columns": int(ds.Columns),
+    }
+
+    frame = _read_frame(path, ds, max_edge)
+    if frame.ndim == 3:
+        # Colour (RGB) images are already display values
+        return metadata, frame.astype(numpy.uint8, copy=False)
+
+    slope = _first(ds.get("RescaleSlope"), 1.0)
+    intercept = _first(ds.get("RescaleIntercept"), 0.0)
+    if slope != 1.0 or intercept != 0.0:
+        frame = frame.astype(numpy.float32) * slope + intercept
+
+    pixels = window_level(
+        frame,
+        _first(ds.get("WindowCenter")),
+        _first(ds.get("WindowWidth")),
+        invert=str(ds.get("PhotometricInterpretation", "")) == "MONOCHROME1",
+    )
+    return metadata, pixels
@@ -1,10 +1,127 @@
 """
 File handling utilities for the EHR system.
+
+Uploaded files are streamed to disk as the request body is parsed:
+`UploadRequest` hands Werkzeug's form parser a `HashingUploadFile`, which
+writes each chunk straight into UPLOAD_FOLDER/.incoming, hashes it with
+SHA-256 on the way and aborts with 413 as soon as MAX_FILE_SIZE is passed.
+Saving an upload is then an atomic rename into the blob store (see
+utils/blob_store.py), so memory use per upload stays bounded and the bytes
+are written only once.
+
+Bulk import endpoints (IMPORT_UPLOAD_LIMITS) take much larger files: theirs
+are spooled to IMPORT_UPLOAD_FOLDER instead, under their own size limit.
 """
 
+import hashlib
 import os
-import uuid
-from flask import current_app
+import tempfile
+from dataclasses import dataclass
+from flask import current_app, Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from utils.blob_store import blob_path, content_hash, hashed_filename
+from utils.image_previews import delete_previews
+from utils.metrics import UPLOAD_BYTES, UPLOAD_SIZE
+
+INCOMING_DIR = ".incoming"
+
+# Endpoints taking uploads other than radiology images -> config key of
+# their file size limit
+IMPORT_UPLOAD_LIMITS = {
+    "lab_results.import_lab_results": "LAB_IMPORT_MAX_SIZE",
+    "patients.import_patients": "PATIENT_IMPORT_MAX_SIZE",
+}
+# Room for the other form fields on top of the file size limit
+FORM_OVERHEAD = 1024 * 1024
+
+
+@dataclass
+class StoredFile:
+    filename: str  # relative to UPLOAD_FOLDER, e.g. patient_3/<uuid>.png
+    sha256: str
+    size: int
+
+
+class HashingUploadFile:
+    """Writable/readable temp file that hashes and size-checks every write.
+    The temp file is removed on close unless it was moved into place."""
+
+    def __init__(self, directory: str, max_size: int, kind: str = "radiology"):
+        os.makedirs(directory, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(
+            dir=directory, prefix="upload-", suffix=".part", delete=False
+        )
+        self.path = self._file.name
+        self.max_size = max_size
+        self.kind = kind
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._committed = False
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.max_size and self.size > self.max_size:
+            # The parser drops this object when the error propagates, so
+            # remove the partial file now
+            self.close()
+            raise RequestEntityTooLarge(
+                f"File exceeds the {self.max_size // (1024 * 1024)} MB upload limit."
+            )
+        self._hash.update(data)
+        UPLOAD_BYTES.labels(self.kind).inc(len(data))
+        return self._file.write(data)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def commit(self, destination: str):
+        """Atomically move the finished upload to its final path."""
+        self._file.flush()
+        self._file.close()
+        os.replace(self.path, destination)
+        self._committed = True
+        UPLOAD_SIZE.observe(self.size)
+
+    def close(self):
+        self._file.close()
+        if not self._committed:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, name):
+        # read/readline/seek/tell etc. go to the underlying file
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Request class that streams file uploads through HashingUploadFile
+    instead of Werkzeug's spooled temporary files, with the spool folder and
+    size limit of the endpoint they are posted to."""
+
+    @property
+    def max_content_length(self):
+        size_key = IMPORT_UPLOAD_LIMITS.get(self.endpoint)
+        if size_key:
+            return current_app.config[size_key] + FORM_OVERHEAD
+        return super().max_content_length
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        size_key = IMPORT_UPLOAD_LIMITS.get(self.endpoint)
+        if size_key:
+            return HashingUploadFile(
+                current_app.config["IMPORT_UPLOAD_FOLDER"],
+                current_app.config[size_key],
+                kind="import",
+            )
+        return HashingUploadFile(
+            os.path.join(current_app.config["UPLOAD_FOLDER"], INCOMING_DIR),
+            current_app.config["MAX_FILE_SIZE"],
+        )
 
 
 def allowed_file(filename: str) -> bool:
@@ -16,40 +133,69 @@ def allowed_file(filename: str) -> bool:
     )
 
 
-def generate_unique_filename(filename: str) -> str | None:
-    """Generate unique filename to prevent conflicts."""
-    if filename == "":
+def store_uploaded_file(file, patient_id: int) -> StoredFile | None:
+    """Store an uploaded file in the content-addressed blob store and return
+    its patient-scoped name with its SHA-256 and size. A file whose content
+    is already stored is not written again."""
+    if not (file and allowed_file(file.filename)):
         return None
 
-    file_extension = ""
-    if "." in filename:
-        file_extension = "." + filename.rsplit(".", 1)[1].lower()
+    upload = file.stream
+    if not isinstance(upload, HashingUploadFile):
+        # Not parsed by UploadRequest (e.g. an in-memory FileStorage):
+        # copy it through a HashingUploadFile in fixed-size chunks
+        upload = HashingUploadFile(
+            os.path.join(current_app.config["UPLOAD_FOLDER"], INCOMING_DIR),
+            current_app.config["MAX_FILE_SIZE"],
+        )
+        try:
+            for chunk in iter(
+                lambda: file.stream.read(current_app.config["UPLOAD_CHUNK_SIZE"]), b""
+            ):
+                upload.write(chunk)
+        except Exception:
+            upload.close()
+            raise
+
+    sha256 = upload.sha256
+    destination = blob_path(sha256)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if os.path.exists(destination):
+        # Duplicate content: drop the new copy, and refresh the blob's mtime
+        # so the garbage collector treats it as recently used
+        upload.close()
+        os.utime(destination)
+    else:
+        upload.commit(destination)
 
-    unique_filename = str(uuid.uuid4()) + file_extension
-    return unique_filename
+    extension = file.filename.rsplit(".", 1)[1]
+    return StoredFile(
+        hashed_filename(patient_id, sha256, extension), sha256, upload.size
+    )
 
 
 def save_uploaded_file(file, patient_id: int) -> str | None:
     """Create patient-specific subdirectory and save uploaded file and return filename."""
-    if file and allowed_file(file.filename):
-        filename = generate_unique_filename(file.filename)
-        if filename:
-            patient_dir = os.path.join(
-                current_app.config["UPLOAD_FOLDER"], f"patient_{patient_id}"
-            )
-            os.makedirs(patient_dir, exist_ok=True)
+    stored = store_uploaded_file(file, patient_id)
+    return stored.filename if stored else None
+
 
-            filepath = os.path.join(patient_dir, filename)
-            file.save(filepath)
-            return f"patient_{patient_id}/{filename}"
-    return None
+def image_access_key(doctor_id: int, image_filename: str) -> str:
+    """Cache key of a doctor's access check for an image file; delete it
+    when the record pointing at the file goes away."""
+    return f"image_access:{doctor_id}:{image_filename}"
 
 
 def delete_image_file(image_filename: str) -> bool:
-    """Delete image file from filesystem. Return True if deleted successfully,
-    False otherwise."""
+    """Delete image file and its previews from filesystem. Return True if deleted
+    successfully, False otherwise. Blob-backed files may be shared, so they are
+    only released here and removed by the blob garbage collector once no
+    record references them."""
+    if image_filename and content_hash(image_filename):
+        return True
     if image_filename:
         try:
+            delete_previews(image_filename)
             filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], image_filename)
             if os.path.exists(filepath):
                 os.remove(filepath)
@@ -0,0 +1,185 @@
+"""
+Background image processing for radiology uploads.
+
+Decoding, validating and downscaling an upload (up to MAX_FILE_SIZE, possibly
+a large TIFF) is CPU-bound, so it runs in a ProcessPoolExecutor instead of the
+request worker. Each radiology record has one row in image_job tracking the
+state of its current file; pages show the record as "processing" until the
+job is READY. The pool is started lazily in each process and uses the spawn
+start method, so workers never inherit database or SMTP sockets.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Optional
+
+from flask import current_app
+
+from models import db, ImageJob, ImageJobStatusEnum, RadiologyImaging
+from utils.blob_store import image_path
+from utils.dicom import DICOM_COLUMNS
+from utils.image_previews import build_previews, preview_targets
+
+
+class ImageJobRunner:
+    """Runs radiology preview jobs on a pool of worker processes."""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get("IMAGE_JOBS_ENABLED", True)
+        self.max_workers = app.config.get("IMAGE_JOB_WORKERS") or os.cpu_count() or 1
+        atexit.register(self.shutdown)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Return this process's pool, creating it on first use (once per fork)."""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """Forget a broken pool so the next job starts a fresh one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def submit(self, imaging: RadiologyImaging) -> ImageJob:
+        """Mark the record's current image as processing and hand it to the
+        pool. Commits the job row; returns without waiting for the result."""
+        job = imaging.image_job or ImageJob(radiology_imaging=imaging)
+        job.image_filename = imaging.image_filename
+        job.status = ImageJobStatusEnum.PROCESSING
+        job.error = None
+        job.attempts = (job.attempts or 0) + 1
+        db.session.add(job)
+        db.session.commit()
+
+        job_id, image_filename = job.id, job.image_filename
+        args = (
+            image_path(image_filename),
+            preview_targets(image_filename),
+            current_app.config["IMAGE_PREVIEW_FORMAT"],
+            current_app.config["IMAGE_PREVIEW_QUALITY"],
+        )
+
+        if self.enabled:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(build_previews, *args)
+            except (BrokenProcessPool, RuntimeError) as e:
+                print(f"Image pool unavailable, processing inline: {e}")
+                self._discard_executor(executor)
+            else:
+                future.add_done_callback(
+                    lambda done: self._on_done(job_id, image_filename, executor, done)
+                )
+                return job
+
+        # Pool disabled or unusable: do the work in this request
+        try:
+            info, error = build_previews(*args), None
+        except Exception as e:
+            info, error = None, e
+        self._finish(job_id, image_filename, info, error)
+        return job
+
+    def requeue_stale(self, max_age_seconds: int, include_failed: bool = False) -> int:
+        """Resubmit jobs stuck in PROCESSING for longer than max_age_seconds
+        (e.g. the process that owned them was restarted), optionally along
+        with failed ones. Returns the number of jobs submitted."""
+        statuses = [ImageJobStatusEnum.PROCESSING]
+        if include_failed:
+            statuses.append(ImageJobStatusEnum.FAILED)
+        cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+        stale = (
+            RadiologyImaging.query.join(ImageJob)
+            .filter(ImageJob.status.in_(statuses), ImageJob.updated_at < cutoff)
+            .all()
+        )
+        for imaging in stale:
+            self.submit(imaging)
+        return len(stale)
+
+    def index_dicom(self) -> int:
+        """Submit jobs for DICOM records whose header has not been parsed yet
+        (e.g. uploaded before metadata indexing). Returns the number submitted."""
+        pending = RadiologyImaging.query.filter(
+            RadiologyImaging.modality.is_(None),
+            db.or_(
+                RadiologyImaging.image_filename.ilike("%.dcm"),
+                RadiologyImaging.image_filename.ilike("%.dicom"),
+            ),
+        ).all()
+        for imaging in pending:
+            self.submit(imaging)
+        return len(pending)
+
+    def _on_done(self, job_id: int, image_filename: str, executor, future):
+        """Record a finished job. Runs on the pool's result thread."""
+        try:
+            info, error = future.result(), None
+        except Exception as e:
+            info, error = None, e
+            if isinstance(e, BrokenProcessPool):
+                self._discard_executor(executor)
+
+        with self.app.app_context():
+            try:
+                self._finish(job_id, image_filename, info, error)
+            finally:
+                db.session.remove()
+
+    def _finish(self, job_id: int, image_filename: str, info, error):
+        try:
+            job = db.session.get(ImageJob, job_id)
+            # Skip if the record was deleted or a newer file was uploaded since
+            if job is None or job.image_filename != image_filename:
+                return
+            if error is None:
+                job.status = ImageJobStatusEnum.READY
+                job.width, job.height = info["width"], info["height"]
+                # Header fields parsed once by the worker become searchable
+                # columns on the record; a file that is not DICOM clears them
+                dicom = info.get("dicom") or {}
+                for column in DICOM_COLUMNS:
+                    setattr(job.radiology_imaging, column, dicom.get(column))
+            else:
+                print(f"Image job {job_id} for {image_filename} failed: {error}")
+                job.status = ImageJobStatusEnum.FAILED
+                job.error = f"{type(error).__name__}: {error}"[:500]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to record image job {job_id}: {e}")
+
+
+image_jobs = ImageJobRunner()
+
+
+def init_image_jobs(app):
+    image_jobs.init_app(app)
+
+
+def submit_image_job(imaging: RadiologyImaging) -> ImageJob:
+    return image_jobs.submit(imaging)
@@ -0,0 +1,192 @@
+"""
+Radiology image preview utilities for the EHR system.
+
+Originals stay untouched in UPLOAD_FOLDER. Downscaled derivatives (one per
+size in IMAGE_PREVIEW_SIZES, encoded as IMAGE_PREVIEW_FORMAT) are written to
+PREVIEW_FOLDER, keyed by content hash for blob-backed files and by the
+patient_X/ path for older ones, so pages can show small images instead of
+multi-megabyte originals. Previews are built right after upload and, for
+anything missing (older uploads, new sizes), lazily on first request; the
+files on disk act as the cache.
+"""
+
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+from utils.blob_store import content_hash, image_path
+from utils.dicom import is_dicom, read_dicom
+
+PREVIEW_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+
+# Raised for uploads that are not decodable images (RuntimeError also covers
+# DICOM files when pydicom is not installed)
+PREVIEW_ERRORS = (
+    UnidentifiedImageError,
+    OSError,
+    ValueError,
+    AttributeError,
+    KeyError,
+    RuntimeError,
+    Image.DecompressionBombError,
+)
+
+
+def preview_filename(image_filename: str, size: str) -> str:
+    """Relative preview path for an upload, e.g. ab/<sha256>_thumb.webp for
+    blob-backed files (shared like the blob) or patient_3/<uuid>_thumb.webp."""
+    image_format = current_app.config["IMAGE_PREVIEW_FORMAT"]
+    sha256 = content_hash(image_filename)
+    stem = f"{sha256[:2]}/{sha256}" if sha256 else image_filename.rsplit(".", 1)[0]
+    return f"{stem}_{size}.{PREVIEW_EXTENSIONS[image_format]}"
+
+
+def preview_path(image_filename: str, size: str) -> str:
+    return os.path.join(
+        current_app.config["PREVIEW_FOLDER"], preview_filename(image_filename, size)
+    )
+
+
+def _load_image(image: Image.Image, largest: int) -> Image.Image:
+    """Normalise an opened image to 8-bit RGB/L for web encoding."""
+    # For JPEGs, let the decoder downscale by a power of two while reading
+    image.draft(image.mode, (largest, largest))
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode in ("I;16", "I;16B", "I;16L", "I", "F"):
+        # 16-bit and float scans (common in TIFF radiology exports): stretch
+        # the used range onto 0-255 instead of clipping
+        image = image.convert("I") if image.mode != "F" else image
+        low, high = image.getextrema()
+        scale = 255.0 / (high - low) if high > low else 1.0
+        image = image.point(lambda value: (value - low) * scale).convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    return image
+
+
+def _save_atomic(image: Image.Image, destination: str, image_format: str, quality: int):
+    """Encode to a temporary file and rename it into place, so concurrent
+    readers never see a half-written preview."""
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(destination), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            image.save(
+                handle,
+                image_format,
+                quality=quality,
+                optimize=image_format == "JPEG",
+            )
+        os.replace(temp_path, destination)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+
+def build_previews(
+    source: str, targets: List[Tuple[int, str]], image_format: str, quality: int
+) -> dict:
+    """Decode `source` once and write a preview for each (edge, destination)
+    pair, downscaling from the largest edge to the smallest. Does not touch
+    the Flask app, so it can run in a worker process. Raises if the file is
+    not a decodable image; returns the original's width, height and mode,
+    plus the parsed header for DICOM files."""
+    targets = sorted(targets, reverse=True)
+    if is_dicom(source):
+        # Header fields go back to the caller to be stored as indexed columns
+        metadata, pixels = read_dicom(source, targets[0][0])
+        _write_previews(Image.fromarray(pixels), targets, image_format, quality)
+        return {
+            "width": metadata["image_columns"],
+            "height": metadata["image_rows"],
+            "mode": "DICOM",
+            "dicom": metadata,
+        }
+
+    with Image.open(source) as original:
+        info = {
+            "width": original.width,
+            "height": original.height,
+            "mode": original.mode,
+        }
+        image = _load_image(original, targets[0][0])
+        _write_previews(image, targets, image_format, quality)
+    return info
+
+
+def _write_previews(image: Image.Image, targets, image_format: str, quality: int):
+    for edge, destination in targets:
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        _save_atomic(image, destination, image_format, quality)
+
+
+def preview_targets(image_filename: str, sizes=None) -> List[Tuple[int, str]]:
+    """(edge, destination) pairs for the given size names (default: all)."""
+    configured = current_app.config["IMAGE_PREVIEW_SIZES"]
+    return [
+        (configured[size], preview_path(image_filename, size))
+        for size in (sizes or configured)
+    ]
+
+
+def generate_previews(image_filename: str, sizes=None) -> bool:
+    """Build previews of an upload in this process. Returns False if the
+    file cannot be decoded as an image."""
+    try:
+        build_previews(
+            image_path(image_filename),
+            preview_targets(image_filename, sizes),
+            current_app.config["IMAGE_PREVIEW_FORMAT"],
+            current_app.config["IMAGE_PREVIEW_QUALITY"],
+        )
+        return True
+    except PREVIEW_ERRORS as e:
+        print(f"Could not build previews for {image_filename}: {e}")
+        return False
+
+
+def get_preview(image_filename: str, size: str) -> Optional[str]:
+    """Relative preview path for serving, building it on a cache miss.
+    Returns None if the size or path is invalid or the original is not decodable."""
+    if size not in current_app.config["IMAGE_PREVIEW_SIZES"]:
+        return None
+    if image_path(image_filename) is None:
+        return None
+    if not os.path.exists(preview_path(image_filename, size)):
+        if not generate_previews(image_filename, [size]):
+            return None
+    return preview_filename(image_filename, size)
+
+
+def delete_previews(image_filename: str):
+    """Remove every preview of an upload."""
+    _delete_files(
+        preview_path(image_filename, size)
+        for size in current_app.config["IMAGE_PREVIEW_SIZES"]
+    )
+
+
+def delete_blob_previews(sha256: str):
+    """Remove every preview of a blob-store file, given its content hash."""
+    image_format = current_app.config["IMAGE_PREVIEW_FORMAT"]
+    _delete_files(
+        os.path.join(
+            current_app.config["PREVIEW_FOLDER"],
+            sha256[:2],
+            f"{sha256}_{size}.{PREVIEW_EXTENSIONS[image_format]}",
+        )
+        for size in current_app.config["IMAGE_PREVIEW_SIZES"]
+    )
+
+
+def _delete_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error deleting preview: {e}")
@@ -0,0 +1,70 @@
+"""
+Rejected-rows reports for bulk imports started from the web UI.
+
+An import writes the rows it could not load to a CSV report in
+IMPORT_REPORT_FOLDER named <kind>-import-<doctor id>-<random hex>.csv, so a
+doctor can download the reports of their own imports and nobody else's.
+"""
+
+import csv
+import io
+import os
+import uuid
+from typing import List
+
+from flask import abort, current_app, send_from_directory
+
+PREVIEW_ROWS = 50  # rejected rows shown on the result page
+
+
+def _folder() -> str:
+    return os.path.abspath(current_app.config["IMPORT_REPORT_FOLDER"])
+
+
+def new_report(kind: str, doctor_id: int) -> str:
+    """Name of a new report for one of the doctor's imports."""
+    os.makedirs(_folder(), exist_ok=True)
+    return f"{kind}-import-{doctor_id}-{uuid.uuid4().hex}.csv"
+
+
+def report_path(report_name: str) -> str:
+    return os.path.join(_folder(), report_name)
+
+
+def read_report_preview(report_name: str, limit: int = PREVIEW_ROWS) -> List[List[str]]:
+    """The first rows of a report, without its header."""
+    rows = []
+    with open(report_path(report_name), newline="", encoding="utf-8") as report:
+        reader = csv.reader(report)
+        next(reader, None)
+        for row in reader:
+            if len(rows) == limit:
+                break
+            rows.append(row)
+    return rows
+
+
+def discard_report(report_name: str):
+    try:
+        os.remove(report_path(report_name))
+    except FileNotFoundError:
+        pass
+
+
+def send_report(kind: str, doctor_id: int, report_name: str):
+    """Download response for a report, or 404 if it is not the doctor's."""
+    if not report_name.startswith(f"{kind}-import-{doctor_id}-"):
+        abort(404)
+    return send_from_directory(
+        _folder(), report_name, as_attachment=True, mimetype="text/csv"
+    )
+
+
+def upload_lines(file) -> io.TextIOWrapper:
+    """Text lines of an uploaded file (already on disk, see UploadRequest).
+    Lines split on \\r as well, so HL7 segments come out one by one; call
+    detach() when done so the upload is closed by the request as usual."""
+    file.stream.seek(0)
+    return io.TextIOWrapper(
+        file.stream, encoding="utf-8-sig", errors="replace", newline=""
+    )
@@ -0,0 +1,230 @@
+"""
+Readers for lab result files sent by reference laboratories.
+
+Two formats are understood, detected from the first line:
+
+* CSV with a header row. Columns (case-insensitive, any order): the patient
+  as patient_id, email, or first_name + last_name + date_of_birth; then
+  test_name, date, result, unit, reference_range, status, notes.
+* HL7 v2 ORU messages. PID identifies the patient by name and birth date
+  (PID-5, PID-7); PID-3 is the lab's own patient number, not ours, and is
+  ignored. OBR-7 gives the observation time and each OBX is one result
+  (OBX-3 test, OBX-5 value, OBX-6 unit, OBX-7 range, OBX-8 flags, OBX-14
+  time); NTE segments after an OBX become its notes.
+
+Readers take an iterable of text lines and yield one (line number, fields,
+raw record) tuple per result without holding the file in memory. Field
+values are stripped strings ("" when missing); validation happens in the
+importer so bad rows can be reported with a reason.
+"""
+
+import csv
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+FIELDS = (
+    "patient_id",
+    "email",
+    "first_name",
+    "last_name",
+    "date_of_birth",
+    "test_name",
+    "date",
+    "result",
+    "unit",
+    "reference_range",
+    "status",
+    "notes",
+)
+
+# Accepted CSV header spellings -> field
+HEADER_ALIASES = {
+    "patient": "patient_id",
+    "patient_email": "email",
+    "dob": "date_of_birth",
+    "birth_date": "date_of_birth",
+    "test": "test_name",
+    "test_date": "date",
+    "collected": "date",
+    "value": "result",
+    "units": "unit",
+    "range": "reference_range",
+    "flag": "status",
+    "comment": "notes",
+}
+
+# Status words and HL7 abnormal flags (OBX-8) -> LabResultStatusEnum value
+STATUS_CODES = {
+    "normal": "normal",
+    "abnormal": "abnormal",
+    "high": "high",
+    "low": "low",
+    "critical": "critical",
+    "pending": "pending",
+    "n": "normal",
+    "a": "abnormal",
+    "h": "high",
+    "l": "low",
+    "hh": "critical",
+    "ll": "critical",
+    "aa": "critical",
+}
+
+Record = Tuple[int, Dict[str, str], List[str]]
+
+
+def detect_format(first_line: str) -> str:
+    """File format of a file starting with this line: "hl7" for an MSH
+    segment, otherwise "csv"."""
+    return "hl7" if first_line.lstrip("\ufeff").startswith("MSH") else "csv"
+
+
+def read_records(lines: Iterable[str], file_format: Optional[str] = None):
+    """Yield (line number, fields, raw record) for every result in lines,
+    detecting the format from the first line unless given."""
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+    first = first.lstrip("\ufeff")
+    file_format = file_format or detect_format(first)
+
+    def rest():
+        yield first
+        yield from lines
+
+    reader = read_hl7 if file_format == "hl7" else read_csv
+    yield from reader(rest())
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Record]:
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = []
+    for name in header:
+        key = "_".join(name.strip().lower().split())
+        columns.append(HEADER_ALIASES.get(key, key))
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        fields = dict.fromkeys(FIELDS, "")
+        for column, cell in zip(columns, row):
+            if column in fields:
+                fields[column] = cell.strip()
+        yield reader.line_num, fields, row
+
+
+def _unescape(text: str, separators: str) -> str:
+    """Decode the HL7 escape sequences for the delimiters."""
+    if "\\" not in text:
+        return text
+    field, component, repetition, escape, subcomponent = separators
+    for code, char in (
+        ("F", field),
+        ("S", component),
+        ("R", repetition),
+        ("T", subcomponent),
+        ("E", escape),
+    ):
+        text = text.replace(f"{escape}{code}{escape}", char)
+    return text
+
+
+def read_hl7(lines: Iterable[str]) -> Iterator[Record]:
+    separators = "|^~\\&"
+    patient = dict.fromkeys(("first_name", "last_name", "date_of_birth"), "")
+    observed = ""
+    pending: Optional[Record] = None
+
+    def field(segment: List[str], index: int, component: int = 0) -> str:
+        if index >= len(segment):
+            return ""
+        parts = segment[index].split(separators[1])
+        value = parts[component] if component < len(parts) else ""
+        return _unescape(value, separators).strip()
+
+    line_number = 0
+    for line in lines:
+        # Segments end in \r; files may also use \n or \r\n between them
+        for text in line.replace("\r\n", "\r").replace("\n", "\r").split("\r"):
+            if not text.strip():
+                continue
+            line_number += 1
+            segment_type = text[:3]
+            if segment_type == "MSH":
+                separators = text[3] + text[4:8]
+                segment = [segment_type, text[3]] + text[4:].split(text[3])
+            else:
+                segment = text.split(separators[0])
+
+            if segment_type == "NTE" and pending is not None:
+                note = field(segment, 3)
+                notes = pending[1]["notes"]
+                pending[1]["notes"] = f"{notes}\n{note}" if notes else note
+                pending[2].append(text)
+                continue
+            if pending is not None:
+                yield pending
+                pending = None
+
+            if segment_type == "PID":
+                patient = {
+                    "last_name": field(segment, 5, 0),
+                    "first_name": field(segment, 5, 1),
+                    "date_of_birth": field(segment, 7),
+                }
+                observed = ""
+            elif segment_type == "OBR":
+                observed = field(segment, 7)
+            elif segment_type == "OBX":
+                fields = dict.fromkeys(FIELDS, "")
+                fields.update(patient)
+                fields.update(
+                    test_name=field(segment, 3, 1) or field(segment, 3, 0),
+                    result=field(segment, 5),
+                    unit=field(segment, 6),
+                    reference_range=field(segment, 7),
+                    status=field(segment, 8),
+                    date=field(segment, 14) or observed,
+                )
+                # Preliminary results without a flag are still pending
+                if not fields["status"] and field(segment, 11) == "P":
+                    fields["status"] = "pending"
+                pending = (line_number, fields, [text])
+    if pending is not None:
+        yield pending
+
+
+def parse_timestamp(text: str) -> datetime:
+    """ISO 8601 ("2026-01-12", "2026-01-12 08:30", "2026-01-12T08:30:00")
+    or HL7 TS ("20260112", "202601120830", "20260112083000+0100") text as
+    a naive datetime. Raises ValueError for anything else."""
+    text = text.strip()
+    if text.isdigit() or (len(text) > 8 and text[:8].isdigit()):
+        digits = text.split("+")[0].split("-")[0].split(".")[0]
+        formats = {8: "%Y%m%d", 12: "%Y%m%d%H%M", 14: "%Y%m%d%H%M%S"}
+        if len(digits) in formats:
+            return datetime.strptime(digits, formats[len(digits)])
+        raise ValueError(f"invalid timestamp {text!r}")
+    try:
+        value = datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"invalid timestamp {text!r}") from None
+    return value.replace(tzinfo=None)
+
+
+def parse_date(text: str) -> date:
+    return parse_timestamp(text).date()
+
+
+def parse_status(text: str) -> Optional[str]:
+    """LabResultStatusEnum value for a status word or HL7 flag, None when
+    blank. Raises ValueError for anything else."""
+    if not text:
+        return None
+    try:
+        return STATUS_CODES[text.strip().lower()]
+    except KeyError:
+        raise ValueError(f"unknown status {text!r}") from None
@@ -0,0 +1,211 @@
+"""
+Rule engine that classifies numeric lab results as normal, low, high or
+critical.
+
+Rules live in the lab_status_rule table, one per test name. A rule's
+low/high bounds take precedence over the reference range typed on the
+result, and its critical limits mark CRITICAL values; when the rule names a
+unit it only applies to results in that (normalized) unit, so a glucose
+rule in mg/dL is never compared against mmol/L values. Results without a
+matching rule are classified against their own reference range.
+
+The rule table is small, so each process holds it compiled into a dict
+keyed by normalized test name and reloads it after LAB_RULES_TTL seconds
+(or when a rule is saved in this process). Classification works on NumPy
+arrays so a batch of thousands of results is classified with a handful of
+vectorized comparisons; a single result is just a batch of one.
+"""
+
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+
+from models import db, LabStatusRule
+
+# Classification results, matching LabResultStatusEnum values; "" means the
+# result cannot be classified (not numeric, or no bounds to compare with)
+CRITICAL, LOW, HIGH, NORMAL, UNCLASSIFIED = "critical", "low", "high", "normal", ""
+
+
+class CompiledRule(NamedTuple):
+    """A rule with missing bounds as NaN (comparisons with NaN are False)."""
+
+    unit: Optional[str]
+    low: float
+    high: float
+    critical_low: float
+    critical_high: float
+
+
+def rule_key(test_name: Optional[str]) -> str:
+    """Lookup key for a test name: case-insensitive, whitespace collapsed."""
+    return " ".join((test_name or "").casefold().split())
+
+
+def _nan(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+def compile_rules(rows) -> Dict[str, CompiledRule]:
+    """Rule dict from (test_name, unit, low, high, critical_low,
+    critical_high) rows."""
+    return {
+        rule_key(test_name): CompiledRule(
+            unit, _nan(low), _nan(high), _nan(critical_low), _nan(critical_high)
+        )
+        for test_name, unit, low, high, critical_low, critical_high in rows
+    }
+
+
+def classify(
+    rules: Dict[str, CompiledRule],
+    test_names: Sequence[Optional[str]],
+    units: Sequence[Optional[str]],
+    values: np.ndarray,
+    reference_low: np.ndarray,
+    reference_high: np.ndarray,
+) -> np.ndarray:
+    """Classify many results at once. values and the reference bounds are
+    float arrays with NaN for missing; returns an array of classification
+    strings in the same order.
+
+    Results the parser gives no numeric value (utils/lab_values.py) are
+    never classified, whatever their reference range; run these cases with
+    ``python -m doctest utils/lab_rules.py``:
+
+    >>> from utils.lab_values import parse_lab_fields
+    >>> def status(result, reference_range, rules={}):
+    ...     fields = parse_lab_fields(result, reference_range, None)
+    ...     return str(classify(
+    ...         rules, ["Test"], [None],
+    ...         np.array([_nan(fields["value_numeric"])]),
+    ...         np.array([_nan(fields["reference_low"])]),
+    ...         np.array([_nan(fields["reference_high"])]),
+    ...     )[0])
+    >>> status("0.3", "0.5-5"), status("7", "0.5-5"), status("2", "0.5-5")
+    ('low', 'high', 'normal')
+    >>> status("<0.5", "0.5-5"), status("<0.1", "< 200")
+    ('', '')
+    >>> status(">1000", "0.5-5"), status("> 5", "0.5-5")
+    ('', '')
+    >>> status("1:160", "<1:40"), status("1:20", "<1:40"), status("160", "<1:40")
+    ('', '', '')
+    >>> status("2+", "0-1"), status("1+", "Negative")
+    ('', '')
+    >>> rules = compile_rules([("Test", None, 1, 2, 0.5, 10)])
+    >>> status("<0.5", "", rules), status(">1000", "", rules)
+    ('', '')
+    >>> status("20", "", rules), status("0.8", "", rules)
+    ('critical', 'low')
+    """
+    count = len(values)
+    if not count:
+        return np.array([], dtype="<U8")
+
+    # Resolve rules once per distinct (test, unit) pair rather than per row.
+    # The pair is joined with a unit separator: NumPy strips trailing NULs
+    pairs = np.array(
+        [f"{rule_key(name)}\x1f{unit or ''}" for name, unit in zip(test_names, units)]
+    )
+    distinct, inverse = np.unique(pairs, return_inverse=True)
+    bounds = np.full((len(distinct), 4), np.nan)
+    for i, pair in enumerate(distinct.tolist()):
+        key, unit = pair.split("\x1f")
+        rule = rules.get(key)
+        if rule is not None and (rule.unit is None or rule.unit == (unit or None)):
+            bounds[i] = rule[1:]
+    rule_low, rule_high, critical_low, critical_high = bounds[inverse].T
+
+    low = np.where(np.isnan(rule_low), reference_low, rule_low)
+    high = np.where(np.isnan(rule_high), reference_high, rule_high)
+    return np.select(
+        [
+            np.isnan(values),
+            (values < critical_low) | (values > critical_high),
+            values < low,
+            values > high,
+            ~np.isnan(low) | ~np.isnan(high),
+        ],
+        [UNCLASSIFIED, CRITICAL, LOW, HIGH, NORMAL],
+        default=UNCLASSIFIED,
+    )
+
+
+class LabRuleEngine:
+    """Process-wide cache of the compiled rule table."""
+
+    def __init__(self):
+        self.ttl = 300
+        self._rules: Optional[Dict[str, CompiledRule]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get("LAB_RULES_TTL", 300)
+
+    def rules(self, connection=None) -> Dict[str, CompiledRule]:
+        """The compiled rules, reloaded when stale. Pass the flush's
+        connection when called from a mapper event."""
+        with self._lock:
+            if (
+                self._rules is not None
+                and time.monotonic() - self._loaded_at < self.ttl
+            ):
+                return self._rules
+        rows = (connection if connection is not None else db.session).execute(
+            select(
+                LabStatusRule.test_name,
+                LabStatusRule.unit,
+                LabStatusRule.low,
+                LabStatusRule.high,
+                LabStatusRule.critical_low,
+                LabStatusRule.critical_high,
+            )
+        )
+        compiled = compile_rules(rows)
+        with self._lock:
+            self._rules = compiled
+            self._loaded_at = time.monotonic()
+        return compiled
+
+    def classify(
+        self, test_names, units, values, reference_low, reference_high, connection=None
+    ) -> np.ndarray:
+        return classify(
+            self.rules(connection),
+            test_names,
+            units,
+            np.asarray(values, dtype=np.float64),
+            np.asarray(reference_low, dtype=np.float64),
+            np.asarray(reference_high, dtype=np.float64),
+        )
+
+    def classify_one(
+        self, test_name, unit, value, reference_low, reference_high, connection=None
+    ) -> str:
+        """Classification of a single result (values may be None)."""
+        return str(
+            self.classify(
+                [test_name],
+                [unit],
+                [_nan(value)],
+                [_nan(reference_low)],
+                [_nan(reference_high)],
+                connection,
+            )[0]
+        )
+
+    def invalidate(self):
+        """Reload the rules on next use, e.g. after a rule was edited."""
+        with self._lock:
+            self._rules = None
+
+
+lab_rules = LabRuleEngine()
+
+
+def init_lab_rules(app):
+    lab_rules.init_app(app)
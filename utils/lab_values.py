@@ -0,0 +1,132 @@
+"""
+Parsing of free-text lab result fields into typed values.
+
+Results, reference ranges and units are entered as text ("5.4", "1,200",
+"3.5 - 5.0", "< 200", "mg/dl"). These helpers turn them into a float value,
+low/high reference bounds and a canonical unit spelling so results can be
+compared and trended numerically. Text that is not numeric ("Positive",
+"Normal") parses to None, and so do results that are not a plain
+measurement: values outside the assay's range ("<0.5", ">1000"), titers
+and ratios ("1:160") and semi-quantitative grades ("2+"). Read as numbers
+they would be trended and classified as if they were exact (a titer of
+1:160 is not 1.0), so they are left as text for the clinician.
+"""
+
+import re
+from typing import Dict, Optional, Tuple
+
+# Bump when parsing rules change so the backfill job re-parses old rows
+PARSER_VERSION = 2
+
+_NUMBER = r"[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:[.,]\d+)?"
+_VALUE = re.compile(rf"^\s*({_NUMBER})\s*(.*)", re.DOTALL)
+# What may not follow a result's number: a ratio or titer ("1:160", "1/40")
+# or a dipstick grade ("2+")
+_NOT_A_VALUE = re.compile(r"^(?:[:/]\s*\d|\+)")
+# A ratio anywhere in a reference range ("<1:40", "1:20 - 1:80")
+_RATIO = re.compile(r"\d\s*[:/]\s*\d")
+_RANGE = re.compile(rf"^\s*({_NUMBER})\s*(?:-|–|—|to)\s*({_NUMBER})")
+_UPPER = re.compile(rf"^\s*(?:<=?|≤|up to)\s*({_NUMBER})", re.IGNORECASE)
+_LOWER = re.compile(rf"^\s*(?:>=?|≥)\s*({_NUMBER})")
+
+# Lowercased, space-free spellings -> canonical unit
+UNIT_ALIASES = {
+    "mg/dl": "mg/dL",
+    "g/dl": "g/dL",
+    "g/l": "g/L",
+    "mg/l": "mg/L",
+    "ng/ml": "ng/mL",
+    "pg/ml": "pg/mL",
+    "mmol/l": "mmol/L",
+    "mol/l": "mol/L",
+    "umol/l": "µmol/L",
+    "µmol/l": "µmol/L",
+    "μmol/l": "µmol/L",
+    "nmol/l": "nmol/L",
+    "pmol/l": "pmol/L",
+    "meq/l": "mEq/L",
+    "u/l": "U/L",
+    "iu/l": "U/L",
+    "miu/l": "mU/L",
+    "mu/l": "mU/L",
+    "uiu/ml": "mU/L",
+    "µiu/ml": "mU/L",
+    "%": "%",
+    "fl": "fL",
+    "pg": "pg",
+    "x10^9/l": "10^9/L",
+    "10^9/l": "10^9/L",
+    "x10e9/l": "10^9/L",
+    "k/ul": "10^9/L",
+    "x10^3/ul": "10^9/L",
+    "x10^12/l": "10^12/L",
+    "10^12/l": "10^12/L",
+    "m/ul": "10^12/L",
+    "mmhg": "mmHg",
+    "ml/min": "mL/min",
+    "ml/min/1.73m2": "mL/min/1.73m²",
+    "ml/min/1.73m²": "mL/min/1.73m²",
+    "sec": "s",
+    "s": "s",
+}
+
+
+def _to_float(text: str) -> float:
+    if re.fullmatch(r"[-+]?\d{1,3}(?:,\d{3})+(?:\.\d+)?", text):
+        text = text.replace(",", "")  # thousands separators
+    else:
+        text = text.replace(",", ".")  # decimal comma
+    return float(text)
+
+
+def parse_value(text: Optional[str]) -> Optional[float]:
+    """Leading number of a result ("5.4 mg/dL" -> 5.4); None for text,
+    qualified values ("<0.5"), titers ("1:160") and grades ("2+")."""
+    match = _VALUE.match(text or "")
+    if match is None or _NOT_A_VALUE.match(match.group(2)):
+        return None
+    return _to_float(match.group(1))
+
+
+def parse_reference_range(
+    text: Optional[str],
+) -> Tuple[Optional[float], Optional[float]]:
+    """(low, high) bounds of a reference range; either may be None for
+    one-sided ranges ("< 200" -> (None, 200.0)). Titer ranges ("<1:40")
+    have no bounds."""
+    text = text or ""
+    if _RATIO.search(text):
+        return None, None
+    match = _RANGE.match(text)
+    if match:
+        low, high = _to_float(match.group(1)), _to_float(match.group(2))
+        return (low, high) if low <= high else (high, low)
+    match = _UPPER.match(text)
+    if match:
+        return None, _to_float(match.group(1))
+    match = _LOWER.match(text)
+    if match:
+        return _to_float(match.group(1)), None
+    return None, None
+
+
+def normalize_unit(text: Optional[str]) -> Optional[str]:
+    """Canonical spelling of a unit, or the trimmed input if unknown."""
+    if not text or not text.strip():
+        return None
+    key = re.sub(r"\s+", "", text).lower().replace("×", "x")
+    return UNIT_ALIASES.get(key, text.strip()[:20])
+
+
+def parse_lab_fields(
+    result: Optional[str], reference_range: Optional[str], unit: Optional[str]
+) -> Dict:
+    """Typed column values for a lab result's text fields."""
+    low, high = parse_reference_range(reference_range)
+    return {
+        "value_numeric": parse_value(result),
+        "reference_low": low,
+        "reference_high": high,
+        "unit_normalized": normalize_unit(unit),
+        "parse_version": PARSER_VERSION,
+    }
@@ -1,3 +1,9 @@
+import smtplib
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Tuple
+
+from flask import current_app
 from flask_mail import Mail, Message
 
 mail = Mail()
@@ -11,3 +17,103 @@ def send_email(subject: str, recipients: list[str], html: str):
     msg = Message(subject=subject, recipients=recipients)
     msg.html = html
     mail.send(msg)
+
+
+@dataclass
+class BulkSendReport:
+    """Outcome of a send_bulk_email run, with per-recipient failures."""
+
+    sent: list[str] = field(default_factory=list)
+    failed: list[Tuple[str, str]] = field(default_factory=list)  # (recipient, error)
+    batches: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return len(self.sent) + len(self.failed)
+
+    @property
+    def messages_per_second(self) -> float:
+        return len(self.sent) / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class _RateLimiter:
+    """Spaces calls so no more than `rate` happen per second (0 = unlimited)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval
+
+
+def send_bulk_email(
+    subject: str,
+    template: str,
+    messages: Iterable[Tuple[str, dict]],
+    batch_size: Optional[int] = None,
+    rate_limit: Optional[float] = None,
+) -> BulkSendReport:
+    """Send one templated email per (recipient, context) pair.
+
+    The template is loaded and compiled once, each batch of `batch_size`
+    messages shares a single SMTP session, and sending is throttled to
+    `rate_limit` messages per second. `messages` may be a generator, so
+    recipients can be streamed. A failed recipient is recorded and the rest
+    of the batch continues; a dropped connection is reopened once per message.
+    """
+    batch_size = batch_size or current_app.config["MAIL_BULK_BATCH_SIZE"]
+    if rate_limit is None:
+        rate_limit = current_app.config["MAIL_BULK_RATE_LIMIT"]
+
+    compiled = current_app.jinja_env.get_template(template)
+    limiter = _RateLimiter(rate_limit)
+    report = BulkSendReport()
+    started = time.monotonic()
+
+    batch = []
+    for item in messages:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            _send_batch(subject, compiled, batch, limiter, report)
+            batch = []
+    if batch:
+        _send_batch(subject, compiled, batch, limiter, report)
+
+    report.elapsed_seconds = time.monotonic() - started
+    return report
+
+
+def _send_batch(subject, compiled, batch, limiter, report: BulkSendReport):
+    report.batches += 1
+    try:
+        connection = mail.connect().__enter__()
+    except (smtplib.SMTPException, OSError) as e:
+        report.failed.extend((recipient, f"connect: {e}") for recipient, _ in batch)
+        return
+
+    try:
+        for recipient, context in batch:
+            msg = Message(subject=subject, recipients=[recipient])
+            msg.html = compiled.render(**context)
+            limiter.wait()
+            try:
+                try:
+                    connection.send(msg)
+                except smtplib.SMTPServerDisconnected:
+                    connection = mail.connect().__enter__()
+                    connection.send(msg)
+                report.sent.append(recipient)
+            except Exception as e:
+                report.failed.append((recipient, f"{type(e).__name__}: {e}"))
+    finally:
+        try:
+            connection.__exit__(None, None, None)
+        except Exception:
+            pass
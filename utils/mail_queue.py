@@ -0,0 +1,253 @@
+"""
+Background outbound email dispatcher for the EHR system.
+
+Requests call `queue_email(...)`, which only puts the message on a bounded
+in-memory queue. A small pool of worker threads (started lazily in each
+process) keeps one SMTP connection open per worker, retries transient
+failures with exponential backoff and records messages that could not be
+delivered in the email_dead_letter table. Messages queued with secret=True
+(their body holds a live sign-in token) are recorded there by template
+name and recipients only, and are rendered again with a new token when
+resent (EmailService.resend_dead_letter).
+
+For local testing point MAIL_SERVER/MAIL_PORT at a debugging SMTP server,
+e.g. `python -m aiosmtpd -n -l localhost:1025`.
+"""
+
+import atexit
+import os
+import queue
+import smtplib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from flask_mail import BadHeaderError, Message
+
+from models import db, EmailDeadLetter
+from utils.mail_helper import mail, send_email
+from utils.metrics import EMAIL_QUEUE_DEPTH, EMAILS
+
+# Errors that will not go away by retrying the same message
+PERMANENT_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    BadHeaderError,
+    AssertionError,
+)
+
+
+@dataclass
+class EmailJob:
+    subject: str
+    recipients: List[str]
+    html: str
+    template: Optional[str] = None  # template the body was rendered from
+    secret: bool = False  # the body holds a token: never store it
+    attempts: int = 0
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class MailDispatcher:
+    """Bounded queue of outbound emails drained by a pool of SMTP workers."""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self._queue: Optional[queue.Queue] = None
+        self._workers: List[threading.Thread] = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.stats = {"queued": 0, "sent": 0, "retried": 0, "dead_lettered": 0}
+        self._stats_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get("MAIL_QUEUE_ENABLED", True)
+        self.num_workers = app.config.get("MAIL_QUEUE_WORKERS", 2)
+        self.max_size = app.config.get("MAIL_QUEUE_MAXSIZE", 1000)
+        self.max_attempts = app.config.get("MAIL_MAX_ATTEMPTS", 5)
+        self.retry_base_delay = app.config.get("MAIL_RETRY_BASE_DELAY", 2.0)
+        self.retry_max_delay = app.config.get("MAIL_RETRY_MAX_DELAY", 60.0)
+        self.idle_timeout = app.config.get("MAIL_CONNECTION_IDLE_TIMEOUT", 30.0)
+        atexit.register(self.shutdown)
+
+    def _count(self, counter: str):
+        with self._stats_lock:
+            self.stats[counter] += 1
+        EMAILS.labels(counter).inc()
+
+    def _ensure_started(self):
+        """Start the worker pool in the current process (once per fork)."""
+        if self._pid == os.getpid() and self._workers:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._workers:
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self._workers = [
+                threading.Thread(
+                    target=self._worker_loop, name=f"mail-worker-{i}", daemon=True
+                )
+                for i in range(self.num_workers)
+            ]
+            for worker in self._workers:
+                worker.start()
+
+    def enqueue(
+        self,
+        subject: str,
+        recipients: List[str],
+        html: str,
+        template: Optional[str] = None,
+        secret: bool = False,
+    ) -> bool:
+        """Queue an email for background delivery. Returns False if the queue
+        is full. When the queue is disabled the email is sent synchronously."""
+        if not self.enabled:
+            send_email(subject=subject, recipients=recipients, html=html)
+            return True
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(
+                EmailJob(subject, list(recipients), html, template, secret)
+            )
+        except queue.Full:
+            print(f"Mail queue full, dropping email to {recipients}")
+            EMAILS.labels("dropped").inc()
+            return False
+        self._count("queued")
+        EMAIL_QUEUE_DEPTH.set(self.depth())
+        return True
+
+    def depth(self) -> int:
+        """Number of emails waiting to be sent in this process."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def shutdown(self, timeout: float = 10.0):
+        """Let workers drain the queue, then stop them."""
+        if not self._workers or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while self.depth() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stopping.set()
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+        self._workers = []
+
+    def _retry_delay(self, attempts: int) -> float:
+        return min(self.retry_base_delay * 2 ** (attempts - 1), self.retry_max_delay)
+
+    def _worker_loop(self):
+        with self.app.app_context():
+            connection = None
+            last_used = 0.0
+            while not self._stopping.is_set():
+                try:
+                    job = self._queue.get(timeout=1.0)
+                except queue.Empty:
+                    # Do not hold an idle SMTP session open indefinitely
+                    if connection and time.monotonic() - last_used > self.idle_timeout:
+                        connection = self._close(connection)
+                    continue
+
+                EMAIL_QUEUE_DEPTH.set(self.depth())
+                try:
+                    connection = self._deliver(job, connection)
+                    last_used = time.monotonic()
+                finally:
+                    self._queue.task_done()
+            self._close(connection)
+
+    def _deliver(self, job: EmailJob, connection):
+        """Send one job, retrying with backoff. Returns the (possibly
+        reopened) connection for the next job."""
+        while True:
+            job.attempts += 1
+            try:
+                if connection is None:
+                    connection = self._open()
+                message = Message(subject=job.subject, recipients=job.recipients)
+                message.html = job.html
+                connection.send(message)
+                self._count("sent")
+                return connection
+            except PERMANENT_ERRORS as e:
+                self._dead_letter(job, e)
+                return connection
+            except (smtplib.SMTPException, OSError) as e:
+                # Connection is suspect after any SMTP/socket error
+                connection = self._close(connection)
+                if job.attempts >= self.max_attempts or self._stopping.is_set():
+                    self._dead_letter(job, e)
+                    return connection
+                self._count("retried")
+                time.sleep(self._retry_delay(job.attempts))
+            except Exception as e:
+                self._dead_letter(job, e)
+                return connection
+
+    def _open(self):
+        connection = mail.connect()
+        connection.__enter__()
+        return connection
+
+    def _close(self, connection):
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception:
+                pass
+        return None
+
+    def _dead_letter(self, job: EmailJob, error: Exception):
+        self._count("dead_lettered")
+        print(
+            f"Giving up on email to {job.recipients} after {job.attempts} attempts: {error}"
+        )
+        try:
+            db.session.add(
+                EmailDeadLetter(
+                    subject=job.subject,
+                    recipients=",".join(job.recipients),
+                    template=job.template,
+                    html=None if job.secret else job.html,
+                    error=f"{type(error).__name__}: {error}"[:1000],
+                    attempts=job.attempts,
+                )
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to record dead-lettered email: {e}")
+        finally:
+            db.session.remove()
+
+
+mail_queue = MailDispatcher()
+
+
+def init_mail_queue(app):
+    mail_queue.init_app(app)
+
+
+def queue_email(
+    subject: str,
+    recipients: list[str],
+    html: str,
+    template: Optional[str] = None,
+    secret: bool = False,
+) -> bool:
+    return mail_queue.enqueue(
+        subject=subject,
+        recipients=recipients,
+        html=html,
+        template=template,
+        secret=secret,
+    )
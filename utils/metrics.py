@@ -0,0 +1,147 @@
+"""
+Prometheus metrics for the EHR system, served in text format on /metrics.
+
+* vitaltrack_http_request_duration_seconds{blueprint,endpoint,method,status}:
+  request latency histogram (time to the response headers)
+* vitaltrack_http_requests_in_flight{blueprint}
+* vitaltrack_db_pool_checkout_wait_seconds{bind}: time spent waiting for a
+  pooled database connection, and vitaltrack_db_connections_in_use{bind}
+* vitaltrack_email_queue_depth and vitaltrack_emails_total{outcome}
+* vitaltrack_upload_bytes_total{kind} ("radiology" or "import") and
+  vitaltrack_upload_size_bytes (per stored radiology file)
+
+Every process keeps its own values. Under gunicorn, gunicorn.conf.py sets
+PROMETHEUS_MULTIPROC_DIR so workers write them to a shared directory and a
+scrape of any worker returns the totals of all of them (prometheus_client's
+multiprocess mode).
+"""
+
+import os
+import time
+from typing import Tuple
+
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+REQUEST_LATENCY = Histogram(
+    "vitaltrack_http_request_duration_seconds",
+    "Time to handle a request, by endpoint and response status.",
+    ["blueprint", "endpoint", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "vitaltrack_http_requests_in_flight",
+    "Requests being handled.",
+    ["blueprint"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "vitaltrack_db_pool_checkout_wait_seconds",
+    "Time waiting to check a connection out of the pool.",
+    ["bind"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10),
+)
+DB_CONNECTIONS_IN_USE = Gauge(
+    "vitaltrack_db_connections_in_use",
+    "Pooled database connections checked out.",
+    ["bind"],
+    multiprocess_mode="livesum",
+)
+EMAIL_QUEUE_DEPTH = Gauge(
+    "vitaltrack_email_queue_depth",
+    "Emails waiting in the background mail queue.",
+    multiprocess_mode="livesum",
+)
+EMAILS = Counter(
+    "vitaltrack_emails_total",
+    "Emails handled by the mail queue, by outcome.",
+    ["outcome"],
+)
+UPLOAD_BYTES = Counter(
+    "vitaltrack_upload_bytes_total",
+    "Bytes of uploaded files received, by kind of upload.",
+    ["kind"],
+)
+UPLOAD_SIZE = Histogram(
+    "vitaltrack_upload_size_bytes",
+    "Size of each stored radiology upload.",
+    buckets=(16e3, 64e3, 256e3, 1e6, 2.5e6, 5e6, 10e6, 25e6),
+)
+
+
+def _instrument_pool(pool, bind: str):
+    """Time every checkout of pool, including pools that replace it when
+    the engine is disposed."""
+    do_get, recreate = pool._do_get, pool.recreate
+
+    def timed_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(bind).observe(time.perf_counter() - started)
+
+    pool._do_get = timed_get
+    pool.recreate = lambda: _instrument_pool(recreate(), bind)
+    return pool
+
+
+def _count_connections(engine, bind: str):
+    in_use = DB_CONNECTIONS_IN_USE.labels(bind)
+    event.listen(engine, "checkout", lambda *args: in_use.inc())
+    event.listen(engine, "checkin", lambda *args: in_use.dec())
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.labels(request.blueprint or "app").inc()
+
+
+def _after_request(response):
+    started = g.get("metrics_started")
+    if started is not None and request.endpoint != "main.metrics":
+        REQUEST_LATENCY.labels(
+            request.blueprint or "app",
+            request.endpoint or "<unmatched>",
+            request.method,
+            str(response.status_code),
+        ).observe(time.perf_counter() - started)
+    return response
+
+
+def _teardown_request(error=None):
+    if g.pop("metrics_started", None) is not None:
+        REQUESTS_IN_FLIGHT.labels(request.blueprint or "app").dec()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """The metrics in Prometheus text format, and its content type."""
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_metrics(app):
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    with app.app_context():
+        for key, engine in app.extensions["sqlalchemy"].engines.items():
+            bind = key or "primary"
+            _instrument_pool(engine.pool, bind)
+            _count_connections(engine, bind)
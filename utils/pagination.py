@@ -0,0 +1,215 @@
+"""
+Keyset (seek) pagination utilities for the EHR system.
+
+List views page through a doctor's records by remembering the sort key of the
+last row shown instead of using OFFSET, so every page costs the same index
+range scan no matter how deep into the history it is.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+from sqlalchemy.engine import Row
+
+
+class KeysetSort:
+    """An ordering over unique columns, e.g. (date, id) or (last_name, first_name, id).
+    The final column must be unique so the ordering is total."""
+
+    def __init__(self, label: str, columns: Sequence, descending: bool = False):
+        self.label = label
+        self.columns = list(columns)
+        self.descending = descending
+
+    def order_by(self, reverse: bool = False) -> List:
+        """Return ORDER BY clauses, optionally flipped for backwards paging."""
+        descending = self.descending != reverse
+        return [c.desc() if descending else c.asc() for c in self.columns]
+
+    def seek(self, values: Sequence, reverse: bool = False):
+        """Build the row-value predicate `key > values` (or `<`) expanded into
+        OR/AND terms so MySQL can use the composite index range."""
+        descending = self.descending != reverse
+        terms = []
+        for i, column in enumerate(self.columns):
+            equal_prefix = [self.columns[j] == values[j] for j in range(i)]
+            step = column < values[i] if descending else column > values[i]
+            terms.append(and_(*equal_prefix, step))
+        return or_(*terms)
+
+    def key_of(self, row) -> List:
+        """Extract this sort's key values from a result row or ORM object."""
+        entity = row[0] if isinstance(row, Row) else row
+        return [getattr(entity, column.key) for column in self.columns]
+
+
+class KeysetPage:
+    """One page of results plus the cursors needed to move to its neighbours."""
+
+    def __init__(
+        self,
+        items: List,
+        per_page: int,
+        sort_key: str,
+        next_cursor: Optional[str],
+        prev_cursor: Optional[str],
+        base_args: Dict[str, str],
+    ):
+        self.items = items
+        self.per_page = per_page
+        self.sort_key = sort_key
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.base_args = base_args
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+    def url_args(self, **overrides) -> Dict[str, Any]:
+        """Current query-string arguments with paging cursors replaced."""
+        args = dict(self.base_args)
+        args.update({k: v for k, v in overrides.items() if v is not None})
+        return args
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Serialize sort-key values into an opaque URL-safe cursor."""
+    encoded = []
+    for value in values:
+        if isinstance(value, datetime):
+            encoded.append({"dt": value.isoformat()})
+        elif isinstance(value, date):
+            encoded.append({"d": value.isoformat()})
+        else:
+            encoded.append(value)
+    raw = json.dumps(encoded, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> Optional[List]:
+    """Parse a cursor produced by encode_cursor. Return None if it is invalid."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        encoded = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(encoded, list) or len(encoded) != size:
+            return None
+        values = []
+        for value in encoded:
+            if isinstance(value, dict) and "dt" in value:
+                values.append(datetime.fromisoformat(value["dt"]))
+            elif isinstance(value, dict) and "d" in value:
+                values.append(date.fromisoformat(value["d"]))
+            else:
+                values.append(value)
+    except (ValueError, TypeError, KeyError):
+        return None
+    return values
+
+
+def get_page_args(
+    sorts: Dict[str, KeysetSort],
+) -> Tuple[str, int, Optional[str], Optional[str]]:
+    """Read sort, per_page and cursor arguments from the current request.
+    Returns (sort_key, per_page, after, before) with per_page clamped to the
+    configured maximum and unknown sort keys replaced by the default (first) one."""
+    sort_key = request.args.get("sort", "")
+    if sort_key not in sorts:
+        sort_key = next(iter(sorts))
+
+    default_per_page = current_app.config["PER_PAGE"]
+    max_per_page = current_app.config["MAX_PER_PAGE"]
+    try:
+        per_page = int(request.args.get("per_page", default_per_page))
+    except ValueError:
+        per_page = default_per_page
+    per_page = max(1, min(per_page, max_per_page))
+
+    after = request.args.get("after") or None
+    before = request.args.get("before") or None
+    return sort_key, per_page, after, before
+
+
+def paginate_keyset(query, sorts: Dict[str, KeysetSort]) -> KeysetPage:
+    """Apply keyset pagination from the request arguments to `query` and
+    return a KeysetPage. Fetches at most per_page + 1 rows."""
+    sort_key, per_page, after, before = get_page_args(sorts)
+    sort = sorts[sort_key]
+
+    reverse = False
+    cursor_values = None
+    if before:
+        cursor_values = decode_cursor(before, len(sort.columns))
+        reverse = cursor_values is not None
+    if cursor_values is None and after:
+        cursor_values = decode_cursor(after, len(sort.columns))
+
+    if cursor_values is not None:
+        query = query.filter(sort.seek(cursor_values, reverse=reverse))
+
+    rows = (
+        query.order_by(None).order_by(*sort.order_by(reverse)).limit(per_page + 1).all()
+    )
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if reverse:
+        rows.reverse()
+
+    if reverse:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, cursor_values is not None
+
+    next_cursor = encode_cursor(sort.key_of(rows[-1])) if rows and has_next else None
+    prev_cursor = encode_cursor(sort.key_of(rows[0])) if rows and has_prev else None
+
+    base_args = {k: v for k, v in request.args.items() if k not in ("after", "before")}
+    base_args["sort"] = sort_key
+    base_args["per_page"] = per_page
+
+    return KeysetPage(rows, per_page, sort_key, next_cursor, prev_cursor, base_args)
+
+
+def paginate_offset(query, sorts: Dict[str, KeysetSort], max_results: int) -> KeysetPage:
+    """Page through results by position instead of by key, for orderings that
+    are not a stored column (e.g. full-text relevance). Cursors carry the row
+    offset, and paging stops at max_results so OFFSET stays bounded. Returns
+    a KeysetPage so the same pagination controls can be used."""
+    sort_key, per_page, after, before = get_page_args(sorts)
+    cursor = decode_cursor(before or after or "", 1)
+    offset = cursor[0] if cursor and isinstance(cursor[0], int) else 0
+    offset = max(0, min(offset, max_results - per_page))
+
+    limit = min(per_page + 1, max_results - offset)
+    rows = (
+        query.order_by(None)
+        .order_by(*sorts[sort_key].order_by())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    next_cursor = encode_cursor([offset + per_page]) if has_next else None
+    prev_cursor = encode_cursor([max(0, offset - per_page)]) if offset else None
+
+    base_args = {k: v for k, v in request.args.items() if k not in ("after", "before")}
+    base_args["sort"] = sort_key
+    base_args["per_page"] = per_page
+
+    return KeysetPage(rows, per_page, sort_key, next_cursor, prev_cursor, base_args)
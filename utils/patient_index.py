@@ -0,0 +1,231 @@
+"""
+In-memory prefix index for patient typeahead lookups.
+
+Each doctor's roster is held as a sorted list of (name key, patient id)
+entries, with one key in "last first" and one in "first last" order, so a
+prefix of either name is found with a binary search (bisect) and a short
+forward scan instead of loading the whole roster. A doctor's index is built
+from the database on first lookup and then updated entry by entry when a
+patient is created, edited or deleted (applied after the transaction
+commits). Changes committed while an index is being built are queued and
+replayed onto it, so a patient saved during the roster query is not lost.
+Indexes are per process, so they are also rebuilt once they are older than
+PATIENT_INDEX_TTL seconds to pick up changes made by other workers.
+"""
+
+import itertools
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from models import db, Patient
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse whitespace for matching."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def _name_keys(first_name: str, last_name: str) -> Tuple[str, str]:
+    first, last = normalize(first_name), normalize(last_name)
+    return f"{last} {first}", f"{first} {last}"
+
+
+class _DoctorIndex:
+    """Sorted name keys for one doctor's patients."""
+
+    def __init__(self, rows):
+        self.built_at = time.monotonic()
+        # patient id -> (first_name, last_name, date_of_birth)
+        self.patients: Dict[int, Tuple[str, str, Optional[date]]] = {}
+        self.keys: List[Tuple[str, int]] = []
+        for patient_id, first_name, last_name, date_of_birth in rows:
+            self.patients[patient_id] = (first_name, last_name, date_of_birth)
+            for key in _name_keys(first_name, last_name):
+                self.keys.append((key, patient_id))
+        self.keys.sort()
+
+    def add(self, patient_id: int, first_name, last_name, date_of_birth):
+        self.remove(patient_id)
+        self.patients[patient_id] = (first_name, last_name, date_of_birth)
+        for key in _name_keys(first_name, last_name):
+            insort(self.keys, (key, patient_id))
+
+    def remove(self, patient_id: int):
+        entry = self.patients.pop(patient_id, None)
+        if entry is None:
+            return
+        for key in _name_keys(entry[0], entry[1]):
+            position = bisect_left(self.keys, (key, patient_id))
+            if position < len(self.keys) and self.keys[position] == (key, patient_id):
+                del self.keys[position]
+
+    def search(self, prefix: str, limit: int) -> List[int]:
+        """Ids of patients with a name key starting with prefix, in key order."""
+        found = []
+        position = bisect_left(self.keys, (prefix,))
+        while position < len(self.keys) and len(found) < limit:
+            key, patient_id = self.keys[position]
+            if not key.startswith(prefix):
+                break
+            if patient_id not in found:
+                found.append(patient_id)
+            position += 1
+        return found
+
+
+class PatientPrefixIndex:
+    """Per-doctor typeahead indexes for this process."""
+
+    def __init__(self):
+        self.ttl = 300
+        self._doctors: Dict[int, _DoctorIndex] = {}
+        self._lock = threading.Lock()
+        # Builds in progress -> changes committed since they started
+        self._builds: Dict[int, List] = {}
+        self._build_ids = itertools.count()
+
+    def init_app(self, app):
+        self.ttl = app.config.get("PATIENT_INDEX_TTL", 300)
+
+    def _get(self, doctor_id: int) -> _DoctorIndex:
+        with self._lock:
+            index = self._doctors.get(doctor_id)
+            if index is not None and time.monotonic() - index.built_at < self.ttl:
+                return index
+            build_id = next(self._build_ids)
+            self._builds[build_id] = []
+        try:
+            # On a new connection, so the roster is read after the build was
+            # registered rather than from the request's earlier snapshot
+            with db.engine.connect() as connection:
+                rows = connection.execute(
+                    db.select(
+                        Patient.id,
+                        Patient.first_name,
+                        Patient.last_name,
+                        Patient.date_of_birth,
+                    ).where(Patient.doctor_id == doctor_id)
+                ).all()
+            index = _DoctorIndex(rows)
+        except Exception:
+            with self._lock:
+                self._builds.pop(build_id)
+            raise
+        with self._lock:
+            # Replay what committed during the query; changes the query
+            # already saw are applied again with the same values
+            missed = self._builds.pop(build_id)
+            for action, patient_id, changed_doctor_id, fields in missed:
+                index.remove(patient_id)
+                if action == "upsert" and changed_doctor_id == doctor_id:
+                    index.add(patient_id, *fields)
+            self._doctors[doctor_id] = index
+        return index
+
+    def search(self, doctor_id: int, text: str, limit: int = 10) -> List[Dict]:
+        """Patients of the doctor whose "first last" or "last first" name
+        starts with text, as dicts ready for JSON."""
+        index = self._get(doctor_id)
+        with self._lock:
+            patient_ids = index.search(normalize(text), limit)
+            return [
+                patient_summary(patient_id, *index.patients[patient_id])
+                for patient_id in patient_ids
+            ]
+
+    def apply(self, changes: List[Tuple[str, int, Optional[int], tuple]]):
+        """Apply committed ("upsert" | "delete", patient_id, doctor_id, fields)
+        changes to the indexes that are loaded, and queue them for the
+        builds in progress; other doctors are built fresh on their next
+        lookup anyway."""
+        with self._lock:
+            for missed in self._builds.values():
+                missed.extend(changes)
+            for action, patient_id, doctor_id, fields in changes:
+                # Drop the old entry wherever it is (the doctor may have changed)
+                for index in self._doctors.values():
+                    index.remove(patient_id)
+                if action == "upsert" and doctor_id in self._doctors:
+                    self._doctors[doctor_id].add(patient_id, *fields)
+
+    def invalidate(self, doctor_id: Optional[int] = None):
+        """Forget one doctor's index (or all), e.g. after a bulk import."""
+        with self._lock:
+            if doctor_id is None:
+                self._doctors.clear()
+            else:
+                self._doctors.pop(doctor_id, None)
+
+
+def patient_summary(patient_id, first_name, last_name, date_of_birth) -> Dict:
+    label = f"{first_name} {last_name}"
+    if date_of_birth:
+        label += f" (DOB: {date_of_birth.strftime('%Y-%m-%d')})"
+    return {
+        "id": patient_id,
+        "first_name": first_name,
+        "last_name": last_name,
+        "date_of_birth": date_of_birth.isoformat() if date_of_birth else None,
+        "label": label,
+    }
+
+
+patient_index = PatientPrefixIndex()
+
+_PENDING_KEY = "patient_index_changes"
+
+
+def _record(target, action: str):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, []).append(
+            (
+                action,
+                target.id,
+                target.doctor_id,
+                (target.first_name, target.last_name, target.date_of_birth),
+            )
+        )
+
+
+def _after_insert(mapper, connection, target):
+    _record(target, "upsert")
+
+
+def _after_update(mapper, connection, target):
+    _record(target, "upsert")
+
+
+def _after_delete(mapper, connection, target):
+    _record(target, "delete")
+
+
+def _after_commit(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        patient_index.apply(changes)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_patient_index(app):
+    """Configure the index and attach the listeners that keep it current
+    (idempotent)."""
+    patient_index.init_app(app)
+    if not event.contains(Patient, "after_insert", _after_insert):
+        event.listen(Patient, "after_insert", _after_insert)
+        event.listen(Patient, "after_update", _after_update)
+        event.listen(Patient, "after_delete", _after_delete)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", _after_rollback)
@@ -0,0 +1,226 @@
+"""
+Per-request SQL instrumentation.
+
+Cursor events on every engine time each statement a request runs. For each
+request this records the number of statements, the total time spent in the
+database and the slowest statements, and flags a statement shape (the SQL
+with whitespace and IN lists normalized) that ran SQL_N_PLUS_ONE_THRESHOLD or
+more times as a likely N+1: one query per row of an earlier result.
+
+* Statements slower than SLOW_QUERY_MS are logged as they finish, and likely
+  N+1 shapes once per request.
+* With SQL_STATS_HEADER, or in debug mode, responses carry an X-SQL-Stats
+  header and a Server-Timing "db" entry shown by browser dev tools.
+* /sql_stats returns this worker process's totals per endpoint and its
+  slowest statements as JSON.
+"""
+
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+SLOWEST_KEPT = 10  # slowest statements kept per process
+SHAPES_KEPT = 10  # likely N+1 shapes kept per endpoint
+STATEMENT_CHARS = 500  # statements are truncated to this many characters
+
+_SPACE = re.compile(r"\s+")
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_IN_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+
+
+def statement_shape(statement: str) -> str:
+    """The statement with whitespace collapsed and lists of placeholders
+    reduced to one, so statements differing only in IN list length match."""
+    return _IN_LIST.sub("(?)", _SPACE.sub(" ", statement).strip())
+
+
+class RequestQueries:
+    """The statements one request executed."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Dict[str, List] = {}  # shape -> [count, seconds]
+        self.slowest: List[Tuple[float, str]] = []
+
+    def add(self, statement: str, seconds: float, keep: int = 5):
+        self.count += 1
+        self.seconds += seconds
+        shape = statement_shape(statement)
+        totals = self.shapes.setdefault(shape, [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        if len(self.slowest) < keep or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, shape))
+            self.slowest.sort(reverse=True)
+            del self.slowest[keep:]
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """(shape, count) of the shapes run at least threshold times."""
+        return sorted(
+            (
+                (shape, totals[0])
+                for shape, totals in self.shapes.items()
+                if totals[0] >= threshold
+            ),
+            key=lambda item: -item[1],
+        )
+
+
+class QueryStats:
+    """Engine listeners plus per-endpoint totals for this process."""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.header = False
+        self.slow_query_ms = 500.0
+        self.n_plus_one_threshold = 5
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict] = {}
+        self._slowest: List[Dict] = []
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get("SQL_STATS_ENABLED", True)
+        self.header = app.config.get("SQL_STATS_HEADER", False)
+        self.slow_query_ms = app.config.get("SLOW_QUERY_MS", 500.0)
+        self.n_plus_one_threshold = app.config.get("SQL_N_PLUS_ONE_THRESHOLD", 5)
+        if not self.enabled:
+            return
+        with app.app_context():
+            for engine in app.extensions["sqlalchemy"].engines.values():
+                if not event.contains(engine, "after_cursor_execute", _after_execute):
+                    event.listen(engine, "before_cursor_execute", _before_execute)
+                    event.listen(engine, "after_cursor_execute", _after_execute)
+        app.after_request(self._after_request)
+
+    def statement_finished(self, statement: str, seconds: float):
+        if self.slow_query_ms and seconds * 1000 >= self.slow_query_ms:
+            where = request.endpoint if has_request_context() else "background"
+            print(
+                f"Slow query ({seconds * 1000:.1f} ms) in {where}: "
+                f"{statement_shape(statement)[:STATEMENT_CHARS]}"
+            )
+        if has_request_context():
+            queries = g.get("sql_queries")
+            if queries is None:
+                queries = g.sql_queries = RequestQueries()
+            queries.add(statement, seconds)
+
+    def _after_request(self, response):
+        queries: Optional[RequestQueries] = g.pop("sql_queries", None)
+        if queries is None:
+            return response
+        endpoint = request.endpoint or "<unmatched>"
+        repeated = queries.repeated(self.n_plus_one_threshold)
+        if repeated:
+            shape, count = repeated[0]
+            print(
+                f"Likely N+1 in {endpoint}: {len(repeated)} statement(s) repeated, "
+                f"e.g. {count}x {shape[:STATEMENT_CHARS]}"
+            )
+        self._record(endpoint, queries, repeated)
+
+        if self.header or current_app.debug:
+            milliseconds = queries.seconds * 1000
+            response.headers["X-SQL-Stats"] = (
+                f"queries={queries.count}; time_ms={milliseconds:.1f}; "
+                f"n_plus_one={len(repeated)}"
+            )
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={milliseconds:.1f};desc="{queries.count} queries"',
+            )
+        return response
+
+    def _record(self, endpoint: str, queries: RequestQueries, repeated):
+        with self._lock:
+            totals = self._endpoints.setdefault(
+                endpoint,
+                {
+                    "requests": 0,
+                    "queries": 0,
+                    "db_seconds": 0.0,
+                    "max_queries": 0,
+                    "n_plus_one_requests": 0,
+                    "n_plus_one": {},
+                },
+            )
+            totals["requests"] += 1
+            totals["queries"] += queries.count
+            totals["db_seconds"] += queries.seconds
+            totals["max_queries"] = max(totals["max_queries"], queries.count)
+            if repeated:
+                totals["n_plus_one_requests"] += 1
+                shapes = totals["n_plus_one"]
+                for shape, count in repeated:
+                    if shape in shapes or len(shapes) < SHAPES_KEPT:
+                        shapes[shape] = max(shapes.get(shape, 0), count)
+
+            for seconds, shape in queries.slowest:
+                if len(self._slowest) == SLOWEST_KEPT and (
+                    seconds * 1000 <= self._slowest[-1]["ms"]
+                ):
+                    break
+                self._slowest.append(
+                    {
+                        "ms": round(seconds * 1000, 2),
+                        "endpoint": endpoint,
+                        "statement": shape[:STATEMENT_CHARS],
+                    }
+                )
+                self._slowest.sort(key=lambda item: -item["ms"])
+                del self._slowest[SLOWEST_KEPT:]
+
+    def snapshot(self) -> Dict:
+        """Per-endpoint totals and the slowest statements, for /sql_stats."""
+        with self._lock:
+            endpoints = {}
+            for endpoint, totals in self._endpoints.items():
+                requests = totals["requests"]
+                endpoints[endpoint] = {
+                    "requests": requests,
+                    "queries": totals["queries"],
+                    "queries_per_request": round(totals["queries"] / requests, 2),
+                    "max_queries": totals["max_queries"],
+                    "db_ms_per_request": round(
+                        totals["db_seconds"] * 1000 / requests, 2
+                    ),
+                    "n_plus_one_requests": totals["n_plus_one_requests"],
+                    "n_plus_one": dict(totals["n_plus_one"]),
+                }
+            return {
+                "enabled": self.enabled,
+                "slow_query_ms": self.slow_query_ms,
+                "n_plus_one_threshold": self.n_plus_one_threshold,
+                "endpoints": endpoints,
+                "slowest": list(self._slowest),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._slowest.clear()
+
+
+query_stats = QueryStats()
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is not None:
+        query_stats.statement_finished(statement, time.perf_counter() - started)
+
+
+def init_query_stats(app):
+    query_stats.init_app(app)
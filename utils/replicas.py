@@ -0,0 +1,161 @@
+"""
+Read-replica routing for read-only views.
+
+DB_REPLICA_URIS lists read replicas of the primary database; each becomes an
+engine in SQLALCHEMY_BINDS ("replica1", "replica2", ...). On GET requests to
+views decorated with @use_replica, db.session (a RoutingSession) sends plain
+SELECT statements to one healthy replica per request, picked round-robin.
+Everything else stays on the primary:
+
+* flushes, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE and raw SQL text;
+* every statement of a request after it has written anything, or after
+  use_primary() was called;
+* for REPLICA_PIN_SECONDS after a doctor's request wrote to the database,
+  all of their requests, so they read their own changes while the replicas
+  catch up.
+
+Each replica is checked with SELECT 1 at most every REPLICA_HEALTH_INTERVAL
+seconds and skipped while the check fails; a dropped connection during a
+query marks it down at once. With no healthy replica, reads use the primary.
+"""
+
+import logging
+import threading
+import time
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger(__name__)
+
+PIN_KEY = "db_primary_until"  # Flask session key: read from the primary until
+
+
+class ReplicaRouter:
+    """Round-robin choice among the healthy replica engines."""
+
+    def __init__(self):
+        self.app = None
+        self.keys: List[str] = []
+        self.health_interval = 10
+        self.pin_seconds = 5
+        self._next = 0
+        self._lock = threading.Lock()
+        self._health: Dict[str, Tuple[bool, float]] = {}
+
+    def init_app(self, app):
+        self.app = app
+        self.keys = [
+            key
+            for key in app.config.get("SQLALCHEMY_BINDS") or {}
+            if key.startswith("replica")
+        ]
+        self.health_interval = app.config.get("REPLICA_HEALTH_INTERVAL", 10)
+        self.pin_seconds = app.config.get("REPLICA_PIN_SECONDS", 5)
+        if not self.keys:
+            return
+        with app.app_context():
+            engines = app.extensions["sqlalchemy"].engines
+            for key in self.keys:
+                event.listen(engines[key], "handle_error", self._error_handler(key))
+        app.after_request(self._pin_after_write)
+
+    def _error_handler(self, key: str):
+        def handle_error(context):
+            if context.is_disconnect:
+                logger.warning("Replica %s disconnected, reading from others", key)
+                self._health[key] = (False, time.monotonic())
+
+        return handle_error
+
+    def healthy(self, key: str, engine) -> bool:
+        """Whether a replica answered its last health check, re-checking it
+        when that is older than health_interval."""
+        now = time.monotonic()
+        healthy, checked_at = self._health.get(key, (True, None))
+        if checked_at is not None and now - checked_at < self.health_interval:
+            return healthy
+        try:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            healthy = True
+        except SQLAlchemyError as e:
+            logger.warning("Replica %s failed its health check: %s", key, e)
+            healthy = False
+        self._health[key] = (healthy, now)
+        return healthy
+
+    def pick(self, engines) -> Optional[str]:
+        """The next healthy replica's bind key, or None if there is none."""
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.keys)
+        for offset in range(len(self.keys)):
+            key = self.keys[(start + offset) % len(self.keys)]
+            if self.healthy(key, engines[key]):
+                return key
+        return None
+
+    def replica_for_request(self, engines) -> Optional[str]:
+        """Bind key the current request reads from, None for the primary."""
+        if not g.get("db_use_replica") or g.get("db_primary") or g.get("db_wrote"):
+            return None
+        if "db_replica" not in g:
+            g.db_replica = self.pick(engines)
+        return g.db_replica
+
+    def _pin_after_write(self, response):
+        if g.get("db_wrote") and self.pin_seconds:
+            session[PIN_KEY] = time.time() + self.pin_seconds
+        return response
+
+
+replicas = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """db.session: reads of @use_replica views go to a replica, the rest to
+    the bind Flask-SQLAlchemy picks (the primary)."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or getattr(clause, "is_dml", False):
+                g.db_wrote = True
+            elif (
+                isinstance(clause, Select)
+                and clause._for_update_arg is None
+                and replicas.keys
+            ):
+                key = replicas.replica_for_request(self._db.engines)
+                if key is not None:
+                    return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_replica(view):
+    """Let a read-only view's GET requests read from a replica (place it
+    below @login_required)."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method == "GET" and session.get(PIN_KEY, 0) <= time.time():
+            g.db_use_replica = True
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def use_primary():
+    """Send the rest of the current request's statements to the primary,
+    e.g. before reading values that are about to be written back."""
+    if has_request_context():
+        g.db_primary = True
+
+
+def init_replicas(app):
+    replicas.init_app(app)
@@ -0,0 +1,28 @@
+"""
+WSGI entry point for production servers.
+
+On Linux (and in Docker) serve it with pre-forked gunicorn workers:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Where gunicorn is not available (Windows), run it on waitress instead, one
+process with WEB_THREADS request threads:
+
+    python wsgi.py
+
+`python app.py` starts Flask's development server and is for local use only.
+"""
+
+import os
+
+from app import app  # noqa: F401  (the WSGI callable servers load)
+
+if __name__ == "__main__":
+    from waitress import serve
+
+    serve(
+        app,
+        host=os.getenv("FLASK_HOST", "0.0.0.0"),
+        port=int(os.getenv("FLASK_PORT", 5000)),
+        threads=app.config["WEB_THREADS"],
+    )